@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+"""
+异步会话下响应缓存对事件循环的影响基准
+
+使用aiosqlite异步会话（与DB_ASYNC=true相同），把响应缓存后端换成每次读写都阻塞指定毫秒数的缓存
+（模拟变慢的Redis，redis-py的调用是阻塞的），在持续请求文章详情和分类接口的同时，
+统计健康检查接口（不访问缓存和数据库）的响应延迟：缓存读写阻塞事件循环时，健康检查也要排队等待
+
+使用方法：
+    python benchmarks/bench_async_cache.py                         # 缓存每次读写阻塞20毫秒
+    python benchmarks/bench_async_cache.py --cache-latency 50 --concurrency 16 --duration 5
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("TESTING", "True")
+os.environ.setdefault("SEARCH_INDEX_PATH", ":memory:")
+# 不连接Redis，速率限制直接放行
+os.environ.setdefault("RATE_LIMIT_FALLBACK", "open")
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import Base, create_async_session_factory, get_db, get_db_session
+from main import app
+from services.cache_service import MemoryCacheBackend, response_cache
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+class SlowCacheBackend(MemoryCacheBackend):
+    """每次读写都阻塞指定时间的缓存后端"""
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+
+    def get(self, key):
+        time.sleep(self.latency)
+        return super().get(key)
+
+    def set(self, key, value, ttl):
+        time.sleep(self.latency)
+        super().set(key, value, ttl)
+
+
+def seed(db_path: str) -> int:
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    category = models.Category(name="基准", slug="bench")
+    session.add(category)
+    session.flush()
+    article = models.Article(
+        title="基准文章", slug="bench-article", markdown_content="内容", html_content="<p>内容</p>",
+        preview="内容", is_published=True, category_id=category.id,
+    )
+    session.add(article)
+    session.commit()
+    article_id = article.id
+    session.close()
+    engine.dispose()
+    return article_id
+
+
+async def load(client: httpx.AsyncClient, article_id: int, stop: float, counter: list):
+    paths = [f"/api/article/{article_id}", "/api/category"]
+    index = 0
+    while time.perf_counter() < stop:
+        response = await client.get(paths[index % 2])
+        assert response.status_code == 200, response.status_code
+        counter[0] += 1
+        index += 1
+
+
+async def probe(client: httpx.AsyncClient, stop: float, latencies: list):
+    while time.perf_counter() < stop:
+        start = time.perf_counter()
+        response = await client.get("/")
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+        await asyncio.sleep(0.01)
+
+
+async def main_async(args, article_id: int, session_factory):
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_async_db
+    app.dependency_overrides[get_db_session] = override_get_async_db
+    response_cache.backend = SlowCacheBackend(args.cache_latency / 1000)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        counter = [0]
+        latencies = []
+        stop = time.perf_counter() + args.duration
+        await asyncio.gather(
+            probe(client, stop, latencies),
+            *(load(client, article_id, stop, counter) for _ in range(args.concurrency)),
+        )
+
+    latencies.sort()
+    print(f"缓存读写阻塞 {args.cache_latency} 毫秒，{args.concurrency} 个并发请求，持续 {args.duration} 秒")
+    print(f"文章接口         {counter[0] / args.duration:8.1f} 请求/秒")
+    print(
+        f"健康检查延迟     中位数 {statistics.median(latencies) * 1000:7.1f} 毫秒，"
+        f"P95 {latencies[int(len(latencies) * 0.95)] * 1000:7.1f} 毫秒，最大 {latencies[-1] * 1000:7.1f} 毫秒"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cache-latency", type=float, default=20, help="缓存每次读写阻塞的毫秒数")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        article_id = seed(db_path)
+        async_engine, session_factory = create_async_session_factory(f"sqlite+aiosqlite:///{db_path}")
+        try:
+            asyncio.run(main_async(args, article_id, session_factory))
+        finally:
+            asyncio.run(async_engine.dispose())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+同步黑名单匹配性能基准
+
+生成10万条仓库路径，对比逐条re.search的原实现与合并编译的BlacklistMatcher
+
+使用方法：
+    python benchmarks/bench_blacklist.py                 # 默认10万条路径、20条规则
+    python benchmarks/bench_blacklist.py --paths 200000 --patterns 50
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.path_filter import BlacklistMatcher
+
+WORDS = ["python", "go", "notes", "docs", "backend", "frontend", "drafts", "archive", "private", "images"]
+
+
+def build_paths(rng: random.Random, count: int):
+    """生成/repo下深度1~4的Markdown文件路径"""
+    paths = []
+    for index in range(count):
+        depth = rng.randint(1, 4)
+        directory = "/".join(rng.choice(WORDS) + str(rng.randint(0, 9)) for _ in range(depth))
+        paths.append(f"/repo/{directory}/article{index}.md")
+    return paths
+
+
+def build_patterns(rng: random.Random, count: int):
+    dir_patterns = ["private1", "secret", r"tmp\d+"] + [f"{rng.choice(WORDS)}{i}x" for i in range(count // 2 - 3)]
+    file_patterns = [r"password\.md", "account.md", "secret.*"] + [f"article{i}99\\.md" for i in range(count - len(dir_patterns) - 3)]
+    return dir_patterns, file_patterns
+
+
+def legacy_is_blacklisted(path: str, dir_patterns, file_patterns) -> bool:
+    """原实现：每个路径对每条规则调用一次re.search"""
+    for pattern in dir_patterns:
+        if re.search(pattern, path):
+            return True
+    file_name = os.path.basename(path)
+    for pattern in file_patterns:
+        if re.search(pattern, file_name):
+            return True
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paths", type=int, default=100000)
+    parser.add_argument("--patterns", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    paths = build_paths(rng, args.paths)
+    dir_patterns, file_patterns = build_patterns(rng, args.patterns)
+    print(f"{len(paths)} 条路径，{len(dir_patterns)} 条目录规则，{len(file_patterns)} 条文件规则")
+
+    start = time.perf_counter()
+    legacy_hits = sum(legacy_is_blacklisted(path, dir_patterns, file_patterns) for path in paths)
+    legacy_elapsed = time.perf_counter() - start
+
+    matcher = BlacklistMatcher(dir_patterns, file_patterns)
+    start = time.perf_counter()
+    hits = sum(matcher.match_path(path) is not None for path in paths)
+    elapsed = time.perf_counter() - start
+
+    assert hits == legacy_hits, (hits, legacy_hits)
+    print(f"逐条re.search      命中 {legacy_hits}，耗时 {legacy_elapsed:6.3f} 秒")
+    print(f"BlacklistMatcher   命中 {hits}，耗时 {elapsed:6.3f} 秒（{legacy_elapsed / elapsed:.1f}x）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+评论树构建性能基准
+
+在SQLite文件数据库中为一篇文章生成1万条评论（随机回复已有评论），对比：
+- 逐层懒加载：查询顶层评论后递归访问Comment.replies，每个有回复的评论触发一次查询
+- 一次查询：get_article_comments读取全部已审核评论，通过ID映射在O(n)内构建评论树
+
+使用方法：
+    python benchmarks/bench_comment_tree.py                       # 默认1万条评论
+    python benchmarks/bench_comment_tree.py --comments 50000 --reply-ratio 0.8
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("TESTING", "True")
+os.environ.setdefault("SEARCH_INDEX_PATH", ":memory:")
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Article, Comment
+from services import article_service
+
+
+def seed(session, comments: int, reply_ratio: float) -> int:
+    article = Article(title="热门文章", slug="hot", markdown_content="内容", html_content="")
+    session.add(article)
+    session.flush()
+    rng = random.Random(42)
+    rows = []
+    for comment_id in range(1, comments + 1):
+        parent_id = rng.randint(1, comment_id - 1) if comment_id > 1 and rng.random() < reply_ratio else None
+        rows.append({
+            "id": comment_id,
+            "article_id": article.id,
+            "parent_id": parent_id,
+            "author": f"读者{comment_id % 100}",
+            "content": f"第{comment_id}条评论 " * 5,
+            "is_approved": rng.random() > 0.05,
+        })
+    session.execute(insert(Comment.__table__), rows)
+    session.commit()
+    return article.id
+
+
+def lazy_tree(db, article_id: int):
+    """逐层懒加载回复，作为对比"""
+
+    def serialize(comment):
+        node = article_service.serialize_comment(comment)
+        node["replies"] = [serialize(reply) for reply in comment.replies if reply.is_approved]
+        return node
+
+    roots = (
+        db.query(Comment)
+        .filter(Comment.article_id == article_id, Comment.parent_id.is_(None), Comment.is_approved == True)
+        .order_by(Comment.id)
+        .all()
+    )
+    return [serialize(comment) for comment in roots]
+
+
+def single_query_tree(db, article_id: int):
+    return article_service.get_article_comments(db, article_id, page_size=article_service.COMMENT_MAX_PAGE_SIZE)[0]
+
+
+def measure(engine, session_factory, func, article_id: int):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    session = session_factory()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        start = time.perf_counter()
+        func(session, article_id)
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        session.close()
+    return elapsed, len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--comments", type=int, default=10000)
+    parser.add_argument("--reply-ratio", type=float, default=0.7, help="回复其他评论的比例")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        session = session_factory()
+        article_id = seed(session, args.comments, args.reply_ratio)
+        session.close()
+        print(f"1 篇文章，{args.comments} 条评论，回复比例 {args.reply_ratio}，最大嵌套层数 {article_service.COMMENT_MAX_DEPTH}")
+
+        # 懒加载构建的是完整深度的树，只用于对比查询次数和耗时
+        for name, func in (("逐层懒加载", lazy_tree), ("一次查询", single_query_tree)):
+            elapsed, statement_count = measure(engine, session_factory, func, article_id)
+            print(f"{name:<6} 耗时 {elapsed * 1000:9.1f} 毫秒，SQL语句 {statement_count} 条")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+IP黑名单查找性能基准
+
+生成大量自动拉黑的IP和若干CIDR网段，对比：
+- 原实现：在Python列表中逐个比较（列表无法表示网段，网段用ipaddress逐个判断）
+- IPSet：地址按哈希查找，网段在前缀树中查找
+
+使用方法：
+    python benchmarks/bench_ip_set.py                          # 默认1万个IP、100个网段、10万次查找
+    python benchmarks/bench_ip_set.py --ips 100000 --networks 1000 --lookups 200000
+"""
+
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.ip_set import IPSet
+
+
+def random_ipv4(rng: random.Random) -> str:
+    return str(ipaddress.IPv4Address(rng.getrandbits(32)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ips", type=int, default=10000)
+    parser.add_argument("--networks", type=int, default=100)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    blacklisted = [random_ipv4(rng) for _ in range(args.ips)]
+    networks = [f"{random_ipv4(rng)}/{rng.randint(16, 28)}" for _ in range(args.networks)]
+    # 一半查找命中已拉黑的IP，一半为随机IP
+    lookups = [rng.choice(blacklisted) if rng.random() < 0.5 else random_ipv4(rng) for _ in range(args.lookups)]
+    print(f"{args.ips} 个IP，{args.networks} 个网段，{args.lookups} 次查找")
+
+    parsed_networks = [ipaddress.ip_network(network, strict=False) for network in networks]
+    start = time.perf_counter()
+    legacy_hits = sum(
+        ip in blacklisted or any(ipaddress.ip_address(ip) in network for network in parsed_networks)
+        for ip in lookups
+    )
+    legacy_elapsed = time.perf_counter() - start
+
+    ip_set = IPSet(networks)
+    for ip in blacklisted:
+        ip_set.add(ip, ttl=3600)
+    start = time.perf_counter()
+    hits = sum(ip in ip_set for ip in lookups)
+    elapsed = time.perf_counter() - start
+
+    assert hits == legacy_hits, (hits, legacy_hits)
+    print(f"列表逐个比较  命中 {legacy_hits}，每次查找 {legacy_elapsed / args.lookups * 1e6:8.2f} 微秒")
+    print(f"IPSet         命中 {hits}，每次查找 {elapsed / args.lookups * 1e6:8.2f} 微秒（{legacy_elapsed / elapsed:.0f}x）")
+
+
+if __name__ == "__main__":
+    main()
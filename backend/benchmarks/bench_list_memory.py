@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+文章列表查询内存基准
+
+在SQLite文件数据库中生成正文较长的文章，对比加载整行（含正文和HTML）的原查询与只加载列表所需列的查询，
+统计读取一页文章列表的耗时和内存峰值（tracemalloc）
+
+使用方法：
+    python benchmarks/bench_list_memory.py                      # 默认500篇文章，每篇正文约100KB，每页100篇
+    python benchmarks/bench_list_memory.py --articles 1000 --content-kb 200 --page-size 100
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("TESTING", "True")
+os.environ.setdefault("SEARCH_INDEX_PATH", ":memory:")
+
+from sqlalchemy import create_engine, desc, insert
+from sqlalchemy.orm import joinedload, sessionmaker
+
+from database import Base
+from models import Article, Category
+from services import article_service
+
+
+def seed(session, articles: int, content_kb: int) -> None:
+    category = Category(name="基准", slug="bench")
+    session.add(category)
+    session.flush()
+    content = ("长文章内容 " * 200 + "\n") * (content_kb * 1024 // 2400 + 1)
+    session.execute(insert(Article.__table__), [
+        {
+            "title": f"文章{i}",
+            "slug": f"article-{i}",
+            "markdown_content": content,
+            "html_content": f"<p>{content}</p>",
+            "preview": content[:200],
+            "category_id": category.id,
+        }
+        for i in range(articles)
+    ])
+    session.commit()
+
+
+def legacy_article_list(db, page_size: int):
+    """原实现：加载完整的文章行"""
+    articles = (
+        db.query(Article).options(joinedload(Article.category))
+        .filter(Article.is_published == True)
+        .order_by(desc(Article.create_time))
+        .limit(page_size).all()
+    )
+    return [article_service.serialize_article_list_item(article) for article in articles]
+
+
+def current_article_list(db, page_size: int):
+    return article_service.get_article_list(db, page_size=page_size)[0]
+
+
+def measure(session_factory, func, page_size: int, rounds: int):
+    elapsed = 0.0
+    peak = 0
+    for _ in range(rounds):
+        session = session_factory()
+        tracemalloc.start()
+        start = time.perf_counter()
+        items = func(session, page_size)
+        elapsed += time.perf_counter() - start
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        session.close()
+        assert len(items) == page_size
+    return elapsed / rounds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=500)
+    parser.add_argument("--content-kb", type=int, default=100, help="每篇文章正文的大小（KB）")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        session = session_factory()
+        seed(session, args.articles, args.content_kb)
+        session.close()
+        print(f"{args.articles} 篇文章，正文约 {args.content_kb}KB，每页 {args.page_size} 篇")
+
+        for name, func in (("加载整行", legacy_article_list), ("只加载列表列", current_article_list)):
+            elapsed, peak = measure(session_factory, func, args.page_size, args.rounds)
+            print(f"{name:<8} 平均耗时 {elapsed * 1000:8.1f} 毫秒，内存峰值 {peak / 1024 / 1024:8.2f} MB")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
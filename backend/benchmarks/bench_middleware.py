@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+安全中间件吞吐量基准
+
+直接以ASGI方式调用应用（不经过网络和HTTP服务器），对比每秒可处理的请求数：
+- 不加中间件
+- BaseHTTPMiddleware方式：与改写前相同，通过dispatch/call_next调用同样的检查逻辑
+- 纯ASGI方式：当前的IPMiddleware + RateLimiter
+
+默认使用进程内的Redis替身（只统计中间件本身的开销，并统计每个请求访问Redis的次数），
+传入--redis-url时连接真实的Redis
+
+使用方法：
+    python benchmarks/bench_middleware.py                   # 默认2万个请求
+    python benchmarks/bench_middleware.py --requests 50000 --redis-url redis://localhost:6379/0
+    python benchmarks/bench_middleware.py --sync-batch 10       # 本地令牌桶每10个请求同步一次Redis
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from middlewares import IPMiddleware, RateLimiter
+
+
+class InMemoryRedis:
+    """只实现中间件在请求通过时用到的命令，总是允许请求"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def register_script(self, script):
+        async def limit_script(keys, args):
+            self.calls += 1
+            return [0, args[1] - 1, 0, 0, 1000]
+
+        return limit_script
+
+    async def exists(self, *keys):
+        self.calls += 1
+        return 0
+
+
+class LegacyIPMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, ip_filter: IPMiddleware):
+        super().__init__(app)
+        self.ip_filter = ip_filter
+
+    async def dispatch(self, request, call_next):
+        response = await self.ip_filter.check(request.scope)
+        return response or await call_next(request)
+
+
+class LegacyRateLimiter(BaseHTTPMiddleware):
+    def __init__(self, app, limiter: RateLimiter):
+        super().__init__(app)
+        self.limiter = limiter
+
+    async def dispatch(self, request, call_next):
+        response, headers = await self.limiter.check(request.scope)
+        if response is not None:
+            return response
+        response = await call_next(request)
+        for name, value in headers.items():
+            response.headers[name] = value
+        return response
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+
+def build_middlewares(app, redis_url, sync_batch):
+    """按main.py中的顺序：RateLimiter在外层，IPMiddleware在内层"""
+    ip_filter = IPMiddleware(app, redis_url=redis_url, check_auto_blacklist=True)
+    limiter = RateLimiter(
+        ip_filter, redis_url=redis_url or "redis://localhost:6379/0", redis_password=None,
+        rate_limit_per_minute=10 ** 9, burst_limit=10 ** 9, sync_batch=sync_batch,
+    )
+    if not redis_url:
+        limiter.redis_pool = InMemoryRedis()
+        limiter.limit_script = limiter.redis_pool.register_script(limiter.LIMIT_SCRIPTS[limiter.algorithm])
+        ip_filter.redis_pool = limiter.redis_pool
+    return ip_filter, limiter
+
+
+async def run(asgi_app, requests: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/ping", "raw_path": b"/api/ping", "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"bench"), (b"x-forwarded-for", b"1.2.3.4")],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    statuses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await asgi_app(dict(scope), receive, send)
+    elapsed = time.perf_counter() - start
+    assert set(statuses) == {200}, set(statuses)
+    return requests / elapsed
+
+
+async def main_async(args):
+    app = build_app()
+
+    ip_filter, limiter = build_middlewares(app, args.redis_url, args.sync_batch)
+    legacy_ip_filter, legacy_limiter = build_middlewares(app, args.redis_url, args.sync_batch)
+    legacy = LegacyRateLimiter(LegacyIPMiddleware(app, legacy_ip_filter), legacy_limiter)
+
+    stacks = (("不加中间件", app), ("BaseHTTPMiddleware", legacy), ("纯ASGI", limiter))
+    # 预热
+    for _, asgi_app in stacks:
+        await run(asgi_app, min(1000, args.requests))
+    for name, asgi_app in stacks:
+        rps = await run(asgi_app, args.requests)
+        print(f"{name:<20} {rps:10.0f} 请求/秒")
+    if not args.redis_url:
+        redis_client = limiter.redis_pool
+        redis_client.calls = 0
+        await run(limiter, args.requests)
+        print(f"纯ASGI每个请求访问Redis {redis_client.calls / args.requests:.1f} 次")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--redis-url", default=None, help="使用真实的Redis，默认使用进程内替身")
+    parser.add_argument("--sync-batch", type=int, default=1, help="本地令牌桶累计多少个请求后同步到Redis")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""
+限流算法公平性基准
+
+用模拟时钟生成突发负载，对比三种限流实现放行的请求：
+- 原实现：整数秒时间戳，按math.floor(fill_time * rate / 60)填充令牌
+- 令牌桶：毫秒时间戳，令牌按小数连续填充（RATE_LIMIT_ALGORITHM=token_bucket）
+- GCRA：毫秒时间戳，只保存理论到达时间（RATE_LIMIT_ALGORITHM=gcra）
+
+负载场景（每个场景多个客户端，起始时间在秒内随机错开）：
+- 稳定超限：每个客户端每秒1个请求（限额的2倍）
+- 周期突发：每个客户端每10秒在200毫秒内发出20个请求
+
+统计每个客户端放行数与理想放行数之比、Jain公平性指数（1表示完全公平）、任意1秒窗口内最多放行的请求数。
+默认用Python按Lua脚本的逻辑计算，传入--redis-url时两种新算法直接在Redis中执行限流脚本（传入模拟时间）
+
+使用方法：
+    python benchmarks/bench_rate_limit_fairness.py                         # 每分钟30个请求，突发5个
+    python benchmarks/bench_rate_limit_fairness.py --rate 60 --burst 10 --clients 50
+    python benchmarks/bench_rate_limit_fairness.py --redis-url redis://localhost:6379/15
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+from collections import deque
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from middlewares.rate_limiter import ALGORITHM_GCRA, ALGORITHM_TOKEN_BUCKET, RateLimiter
+
+
+def legacy_bucket(state: dict, now_ms: int, rate: int, burst: int) -> bool:
+    """原LIMIT_SCRIPT的逻辑"""
+    now = now_ms // 1000
+    tokens = state.get("tokens", burst)
+    fill_tokens = math.floor(max(0, now - state.get("last_time", 0)) * rate / 60)
+    tokens = min(burst, tokens + fill_tokens)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    state["tokens"] = tokens
+    state["last_time"] = now
+    return allowed
+
+
+def token_bucket(state: dict, now_ms: int, rate: int, burst: int) -> bool:
+    """令牌桶脚本的逻辑"""
+    interval = 60000 / rate
+    tokens = state.get("tokens", burst)
+    tokens = min(burst, tokens + max(0, now_ms - state.get("last_time", now_ms)) / interval)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    state["tokens"] = tokens
+    state["last_time"] = now_ms
+    return allowed
+
+
+def gcra(state: dict, now_ms: int, rate: int, burst: int) -> bool:
+    """GCRA脚本的逻辑"""
+    interval = 60000 / rate
+    tat = max(state.get("tat", now_ms), now_ms)
+    new_tat = tat + interval
+    allowed = new_tat - now_ms <= interval * burst
+    if allowed:
+        state["tat"] = new_tat
+    return allowed
+
+
+class RedisScript:
+    """在Redis中执行限流脚本，now使用模拟时间"""
+
+    def __init__(self, redis_client, algorithm: str):
+        self.redis_client = redis_client
+        self.script = redis_client.register_script(RateLimiter.LIMIT_SCRIPTS[algorithm])
+
+    def __call__(self, state: dict, now_ms: int, rate: int, burst: int) -> bool:
+        key = state.setdefault("key", f"bench_fairness:{id(state)}")
+        verdict = self.script(
+            keys=[key, f"{key}:blacklist", f"{key}:auto_blacklist", f"{key}:counter"],
+            args=[rate, burst, now_ms, 1, 10 ** 9, 60, 0, 0],
+        )[0]
+        return verdict == 0
+
+
+def steady_load(rng: random.Random, clients: int, duration: int):
+    """每个客户端每秒1个请求"""
+    for client in range(clients):
+        phase = rng.randint(0, 999)
+        for second in range(duration):
+            yield second * 1000 + phase, client
+
+
+def burst_load(rng: random.Random, clients: int, duration: int):
+    """每个客户端每10秒在200毫秒内发出20个请求"""
+    for client in range(clients):
+        phase = rng.randint(0, 9999)
+        for start in range(phase, duration * 1000, 10000):
+            for _ in range(20):
+                yield start + rng.randint(0, 199), client
+
+
+def simulate(limit, requests, clients: int, rate: int, burst: int):
+    """按时间顺序执行请求，返回每个客户端的放行时间列表"""
+    states = [{} for _ in range(clients)]
+    allowed = [[] for _ in range(clients)]
+    for now_ms, client in sorted(requests):
+        if limit(states[client], now_ms, rate, burst):
+            allowed[client].append(now_ms)
+    return allowed
+
+
+def ideal_allowed(times, rate: int, burst: int) -> int:
+    """连续填充的理想令牌桶（不受时间精度影响）在该请求序列下应放行的数量"""
+    return len(simulate(token_bucket, [(now_ms, 0) for now_ms in times], 1, rate, burst)[0])
+
+
+def max_per_second(allowed_times) -> int:
+    window = deque()
+    peak = 0
+    for now_ms in allowed_times:
+        window.append(now_ms)
+        while window[0] <= now_ms - 1000:
+            window.popleft()
+        peak = max(peak, len(window))
+    return peak
+
+
+def jain_index(values) -> float:
+    total = sum(values)
+    squares = sum(value * value for value in values)
+    return total * total / (len(values) * squares) if squares else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=int, default=30, help="每分钟允许的请求数")
+    parser.add_argument("--burst", type=int, default=5)
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=int, default=600, help="模拟时长（秒）")
+    parser.add_argument("--redis-url", default=None, help="在Redis中执行新算法的限流脚本")
+    args = parser.parse_args()
+
+    algorithms = [("原实现", legacy_bucket), ("令牌桶", token_bucket), ("GCRA", gcra)]
+    if args.redis_url:
+        import redis
+
+        redis_client = redis.Redis.from_url(args.redis_url)
+        algorithms += [
+            ("令牌桶(Redis)", RedisScript(redis_client, ALGORITHM_TOKEN_BUCKET)),
+            ("GCRA(Redis)", RedisScript(redis_client, ALGORITHM_GCRA)),
+        ]
+
+    print(f"每分钟 {args.rate} 个请求，突发 {args.burst} 个，{args.clients} 个客户端，模拟 {args.duration} 秒")
+    for scenario, load in (("稳定超限", steady_load), ("周期突发", burst_load)):
+        requests = list(load(random.Random(42), args.clients, args.duration))
+        per_client = [[] for _ in range(args.clients)]
+        for now_ms, client in sorted(requests):
+            per_client[client].append(now_ms)
+        ideal = [ideal_allowed(times, args.rate, args.burst) for times in per_client]
+
+        print(f"\n{scenario}：共 {len(requests)} 个请求")
+        print(f"{'算法':<12} {'放行/理想':>10} {'最少/最多':>12} {'公平性指数':>10} {'1秒内最多放行':>14}")
+        for name, limit in algorithms:
+            allowed = simulate(limit, requests, args.clients, args.rate, args.burst)
+            ratios = [len(times) / expected for times, expected in zip(allowed, ideal)]
+            counts = [len(times) for times in allowed]
+            print(
+                f"{name:<12} {sum(counts) / sum(ideal):>10.3f} {min(counts):>5} / {max(counts):<5} "
+                f"{jain_index(ratios):>10.4f} {max(max_per_second(times) for times in allowed):>14}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+全文索引搜索性能基准
+
+使用方法：
+    python benchmarks/bench_search.py                # 默认10万篇文章
+    python benchmarks/bench_search.py --docs 20000   # 指定文章数量
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("TESTING", "True")
+
+from services.search_service import SearchIndex
+
+# 常用汉字池，用于生成随机中文词汇
+CJK_CHARS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处理府研质"
+ENGLISH_WORDS = ["python", "fastapi", "redis", "mysql", "docker", "nginx", "sqlalchemy", "linux",
+                 "kubernetes", "postgres", "asyncio", "pydantic", "uvicorn", "git", "markdown", "vue"]
+QUERIES = ["高频词", "中频词", "低频词", "redis", "fast", "单字", "两个词"]
+
+
+def build_vocabulary(rng: random.Random, size: int = 5000):
+    words = list(ENGLISH_WORDS)
+    while len(words) < size:
+        words.append("".join(rng.choice(CJK_CHARS) for _ in range(rng.choice([2, 2, 3, 4]))))
+    rng.shuffle(words)
+    # 齐普夫分布：排名第k的词出现概率与1/k成正比
+    weights = [1.0 / (rank + 1) for rank in range(len(words))]
+    return words, weights
+
+
+def make_document(rng: random.Random, words, weights, length: int) -> str:
+    picked = rng.choices(words, weights=weights, k=length)
+    return "".join(word + rng.choice(["，", "。", " ", "\n"]) for word in picked)
+
+
+def resolve_queries(words):
+    """将查询占位符映射为词表中不同频率的真实词"""
+    cjk_words = [word for word in words if not word.isascii()]
+    return {
+        "高频词": cjk_words[0],
+        "中频词": cjk_words[200],
+        "低频词": cjk_words[3000],
+        "redis": "redis",
+        "fast": "fast",
+        "单字": cjk_words[50][0],
+        "两个词": f"{cjk_words[10]} {cjk_words[100]}",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100000)
+    parser.add_argument("--length", type=int, default=300, help="每篇文章包含的词数")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    words, weights = build_vocabulary(rng)
+    queries = resolve_queries(words)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(os.path.join(tmp, "bench_index.db"))
+
+        start = time.perf_counter()
+        batch = []
+        for article_id in range(1, args.docs + 1):
+            batch.append((article_id, make_document(rng, words, weights, 5), make_document(rng, words, weights, args.length)))
+            if len(batch) == 1000:
+                index.index_articles(batch)
+                batch = []
+        index.index_articles(batch)
+        print(f"索引 {args.docs} 篇文章耗时 {time.perf_counter() - start:.1f} 秒")
+
+        for label in QUERIES:
+            query = queries[label]
+            # 冷查询：清空结果缓存后第一次查询，需要为全部命中文章打分
+            index._result_cache.clear()
+            start = time.perf_counter()
+            ids, total = index.search(query, limit=10, offset=0)
+            cold = (time.perf_counter() - start) * 1000
+            # 热查询：翻阅前几页，从缓存的排名窗口中切片
+            timings = []
+            for round_index in range(args.rounds):
+                start = time.perf_counter()
+                index.search(query, limit=10, offset=(round_index % 5) * 10)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            print(f"{label}({query})".ljust(20) + f" 命中 {total:>7}  冷查询 {cold:8.2f} ms  "
+                  f"翻页p50 {timings[len(timings) // 2]:6.3f} ms")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
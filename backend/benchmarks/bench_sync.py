@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+全量同步（process_directory）性能基准
+
+在临时目录中生成Markdown仓库，分别使用不同的解析方式执行全量同步并统计耗时
+
+使用方法：
+    python benchmarks/bench_sync.py                          # 默认1万个文件
+    python benchmarks/bench_sync.py --files 2000 --workers 4
+    python benchmarks/bench_sync.py --executors serial,process
+    python benchmarks/bench_sync.py --no-render               # 不渲染HTML，单独统计解析和写入的耗时
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("TESTING", "True")
+os.environ.setdefault("SEARCH_INDEX_PATH", ":memory:")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Article
+from services import github_service, search_service
+
+WORDS = ["python", "fastapi", "redis", "mysql", "docker", "nginx", "sqlalchemy", "linux",
+         "异步", "数据库", "缓存", "索引", "部署", "性能", "中间件", "同步"]
+
+
+def make_markdown(rng: random.Random, index: int, paragraphs: int) -> str:
+    lines = [f"# 文章{index} {rng.choice(WORDS)}", ""]
+    for _ in range(paragraphs):
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(60)))
+        lines.append("")
+    lines.append(" ".join(f"#{rng.choice(WORDS[:8])}" for _ in range(3)))
+    return "\n".join(lines)
+
+
+def build_repo(root: str, files: int, categories: int, paragraphs: int) -> None:
+    rng = random.Random(42)
+    for index in range(files):
+        directory = os.path.join(root, f"category{index % categories}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"article{index}.md"), "w", encoding="utf-8") as f:
+            f.write(make_markdown(rng, index, paragraphs))
+
+
+def run_sync(repo_dir: str, db_path: str, executor_kind: str, workers: int) -> float:
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    search_service.search_index = search_service.SearchIndex(":memory:")
+    github_service.SYNC_EXECUTOR = executor_kind
+    github_service.SYNC_WORKERS = workers
+    try:
+        start = time.perf_counter()
+        github_service.process_directory(repo_dir, session)
+        elapsed = time.perf_counter() - start
+        count = session.query(Article).count()
+        # 仓库没有变化时再次同步，只需检查文件修改时间和大小
+        start = time.perf_counter()
+        github_service.process_directory(repo_dir, session)
+        resync_elapsed = time.perf_counter() - start
+    finally:
+        session.close()
+        engine.dispose()
+    print(f"{executor_kind:<8} workers={workers:<3} 写入 {count} 篇文章，耗时 {elapsed:7.2f} 秒，"
+          f"无变化时再次同步耗时 {resync_elapsed:6.2f} 秒")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=20, help="每个文件包含的段落数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--executors", default="serial,thread,process")
+    parser.add_argument("--no-render", action="store_true", help="同步时不渲染HTML")
+    args = parser.parse_args()
+
+    if args.no_render:
+        # 解析进程以spawn方式启动，重新导入模块时从环境变量读取配置
+        os.environ["MARKDOWN_RENDER"] = "False"
+        github_service.MARKDOWN_RENDER = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo_dir = os.path.join(tmp, "repo")
+        build_repo(repo_dir, args.files, args.categories, args.paragraphs)
+        print(f"生成 {args.files} 个Markdown文件，CPU核数 {os.cpu_count()}")
+
+        for executor_kind in args.executors.split(","):
+            db_path = os.path.join(tmp, f"bench_{executor_kind}.db")
+            run_sync(repo_dir, db_path, executor_kind, args.workers)
+
+
+if __name__ == "__main__":
+    main()
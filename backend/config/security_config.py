@@ -22,6 +22,14 @@ REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
 # 速率限制配置
 RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))  # 默认每分钟60个请求
 BURST_LIMIT = int(os.getenv("BURST_LIMIT", "10"))  # 默认突发请求限制
+RATE_LIMIT_ALGORITHM = os.getenv("RATE_LIMIT_ALGORITHM", "token_bucket")  # 限流算法：token_bucket或gcra
+
+# 本地令牌桶配置（每个worker进程内）
+RATE_LIMIT_LOCAL_MAX_KEYS = int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", "10000"))  # 最多保存的键数，超过时淘汰最久未访问的键
+RATE_LIMIT_SYNC_BATCH = int(os.getenv("RATE_LIMIT_SYNC_BATCH", "10"))  # 累计多少个请求后同步到Redis，1表示每个请求都访问Redis
+RATE_LIMIT_SYNC_INTERVAL = float(os.getenv("RATE_LIMIT_SYNC_INTERVAL", "1"))  # 最长同步间隔（秒），也是Redis失败后的重试间隔
+RATE_LIMIT_FALLBACK = os.getenv("RATE_LIMIT_FALLBACK", "local")  # Redis不可用时：local只用本地令牌桶限流，open不限流
+RATE_LIMIT_FALLBACK_FACTOR = float(os.getenv("RATE_LIMIT_FALLBACK_FACTOR", "1"))  # Redis不可用时本地限额的比例
 
 # 自动黑名单配置
 AUTO_BLACKLIST_THRESHOLD = int(os.getenv("AUTO_BLACKLIST_THRESHOLD", "5"))  # 默认触发限流5次后加入黑名单
@@ -39,6 +47,12 @@ EXEMPT_PATHS = [
     "/openapi.json",  # OpenAPI规范
 ]
 
+# /metrics的访问控制，监控指标不对公网开放，也不豁免速率限制
+# 允许访问的地址（逗号分隔，支持CIDR网段），与直接连接的客户端地址比较，不使用X-Forwarded-For
+METRICS_ALLOWED_IPS = os.getenv("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",")
+# 访问令牌，设置后也允许携带Authorization: Bearer <令牌>的请求访问
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 # 安全配置字典
 SECURITY_CONFIG = {
     "redis_url": REDIS_URL,
@@ -46,7 +60,15 @@ SECURITY_CONFIG = {
     "rate_limit": {
         "per_minute": RATE_LIMIT_PER_MINUTE,
         "burst": BURST_LIMIT,
+        "algorithm": RATE_LIMIT_ALGORITHM,
         "exempt_paths": EXEMPT_PATHS,
+        "local": {
+            "max_keys": RATE_LIMIT_LOCAL_MAX_KEYS,
+            "sync_batch": RATE_LIMIT_SYNC_BATCH,
+            "sync_interval": RATE_LIMIT_SYNC_INTERVAL,
+            "fallback": RATE_LIMIT_FALLBACK,
+            "fallback_factor": RATE_LIMIT_FALLBACK_FACTOR,
+        },
     },
     "ip_filter": {
         "whitelist": IP_WHITELIST,
@@ -56,6 +78,10 @@ SECURITY_CONFIG = {
             "expire": AUTO_BLACKLIST_EXPIRE
         }
     },
+    "metrics": {
+        "allowed_ips": METRICS_ALLOWED_IPS,
+        "token": METRICS_TOKEN,
+    },
 }
 
 # 打印安全配置（调试用）
@@ -76,6 +102,10 @@ def print_security_config():
                 user = auth_part.split(":")[0]
                 config_copy["redis_url"] = f"redis://{user}:****@{parts[1]}"
     
+    # 隐藏监控指标的访问令牌
+    if config_copy.get("metrics", {}).get("token"):
+        config_copy["metrics"] = {**config_copy["metrics"], "token": "****"}
+    
     print(json.dumps(config_copy, indent=2))
 
 if __name__ == "__main__":
@@ -1,18 +1,27 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
 import os
 from dotenv import load_dotenv
 
+from utils.pool_metrics import instrumented_pool_class, register_pool_metrics
+
 # 加载环境变量
 load_dotenv()
 
 # 检查是否在测试环境中
 TESTING = os.getenv("TESTING", "False").lower() in ("true", "1", "t")
 
+# 是否使用异步数据库驱动，开启后文章接口的数据库IO在事件循环中执行，不再占用线程池
+DB_ASYNC = os.getenv("DB_ASYNC", "False").lower() in ("true", "1", "t")
+
 # 如果在测试环境中，使用SQLite内存数据库，否则使用MySQL
 if TESTING:
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///:memory:")
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
 else:
     # 数据库连接配置
     DB_USER = os.getenv("DB_USER", "root")
@@ -23,13 +32,46 @@ else:
     
     # 构建数据库连接URL
     DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    ASYNC_DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# 连接池配置（每个uvicorn worker各自拥有一个连接池，总连接数 = worker数 * (POOL_SIZE + MAX_OVERFLOW)）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# 连接最长存活时间（秒），应小于MySQL的wait_timeout，-1表示不回收
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "3600"))
+# 等待空闲连接的最长时间（秒），超时抛出异常
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# 每次取出连接前是否先执行一次探活查询；关闭后依靠DB_POOL_RECYCLE在服务端断开前回收连接，省去一次往返
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() in ("true", "1", "t")
+
+
+def pool_options(url: str, pool_class) -> dict:
+    """
+    根据配置生成引擎的连接池参数
+    SQLite（测试环境）使用SQLAlchemy默认的连接池，不设置容量参数
+    """
+    if url.startswith("sqlite"):
+        return {"pool_pre_ping": DB_POOL_PRE_PING}
+    return {
+        "poolclass": pool_class,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+# 连接池监控，通过/metrics接口导出
+sync_pool_metrics = register_pool_metrics("sync")
 
 # 创建SQLAlchemy引擎
 engine = create_engine(
     DATABASE_URL,
     echo=False,  # 设置为False以禁止打印SQL语句
-    pool_pre_ping=True  # 自动检测连接是否有效
+    **pool_options(DATABASE_URL, instrumented_pool_class(QueuePool, sync_pool_metrics))
 )
+sync_pool_metrics.attach(engine)
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -43,4 +85,46 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def create_async_session_factory(url: str = None, **engine_kwargs):
+    """
+    创建异步引擎和会话工厂，返回(引擎, 会话工厂)
+    """
+    url = url or ASYNC_DATABASE_URL
+    metrics = register_pool_metrics("async")
+    options = pool_options(url, instrumented_pool_class(AsyncAdaptedQueuePool, metrics))
+    options.update(engine_kwargs)
+    async_engine = create_async_engine(url, echo=False, **options)
+    metrics.attach(async_engine.sync_engine)
+    # 提交后不过期对象，避免在事件循环中触发隐式的懒加载查询
+    session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return async_engine, session_factory
+
+
+# 异步引擎和会话工厂，仅在DB_ASYNC开启时创建；建表、迁移和同步任务仍使用同步引擎
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    async_engine, AsyncSessionLocal = create_async_session_factory()
+
+
+# 获取异步数据库会话的依赖函数
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# 文章接口使用的会话依赖，由DB_ASYNC决定使用同步还是异步会话
+get_db_session = get_async_db if DB_ASYNC else get_db
+
+
+async def run_db(db, func, *args, **kwargs):
+    """
+    以func(session, *args, **kwargs)的形式执行同步的数据库操作
+    异步会话通过run_sync在事件循环中执行，数据库IO不占用线程；同步会话放入线程池执行
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(func, *args, **kwargs)
+    return await run_in_threadpool(func, db, *args, **kwargs)
@@ -1,8 +1,11 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import hmac
 import os
+import threading
 import git
 import markdown
 import logging
@@ -18,13 +21,22 @@ from config.security_config import SECURITY_CONFIG
 load_dotenv()
 
 # 导入自定义模块
-from database import get_db, engine
+from database import get_db, get_db_session, run_db, engine, SessionLocal, AsyncSession
 import models
 import schemas
-from services import github_service, article_service
+from migrations import apply_migrations
+from services import github_service, article_service, search_service, view_counter
+from services.cache_service import response_cache
+from utils.pool_metrics import render_prometheus
+from utils.ip_set import IPSet
+from utils.http_cache import (
+    build_validators, latest_time, is_not_modified, apply_validators, not_modified_response
+)
 
 # 创建数据库表
 models.Base.metadata.create_all(bind=engine)
+# 为已有数据库补齐新增的索引等结构
+apply_migrations(engine)
 
 # 配置日志使用UTF-8编码
 logging.basicConfig(
@@ -48,6 +60,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 内存中的自动黑名单，由RateLimiter写入，两个中间件共享
+auto_blacklist = IPSet()
+
 # 添加IP白名单和黑名单中间件
 app.add_middleware(
     IPMiddleware,
@@ -55,7 +70,8 @@ app.add_middleware(
     blacklist=SECURITY_CONFIG["ip_filter"]["blacklist"],
     redis_url=SECURITY_CONFIG["redis_url"],
     redis_password=SECURITY_CONFIG["redis_password"],
-    check_auto_blacklist=True
+    check_auto_blacklist=True,
+    auto_blacklist=auto_blacklist
 )
 
 # 添加速率限制中间件
@@ -68,7 +84,15 @@ app.add_middleware(
     exempt_paths=SECURITY_CONFIG["rate_limit"]["exempt_paths"],
     auto_blacklist_threshold=SECURITY_CONFIG["ip_filter"]["auto_blacklist"]["threshold"],
     auto_blacklist_expire=SECURITY_CONFIG["ip_filter"]["auto_blacklist"]["expire"],
-    ip_blacklist=SECURITY_CONFIG["ip_filter"]["blacklist"]
+    ip_blacklist=SECURITY_CONFIG["ip_filter"]["blacklist"],
+    local_max_keys=SECURITY_CONFIG["rate_limit"]["local"]["max_keys"],
+    sync_batch=SECURITY_CONFIG["rate_limit"]["local"]["sync_batch"],
+    sync_interval=SECURITY_CONFIG["rate_limit"]["local"]["sync_interval"],
+    fallback=SECURITY_CONFIG["rate_limit"]["local"]["fallback"],
+    fallback_factor=SECURITY_CONFIG["rate_limit"]["local"]["fallback_factor"],
+    algorithm=SECURITY_CONFIG["rate_limit"]["algorithm"],
+    auto_blacklist=auto_blacklist,
+    whitelist=SECURITY_CONFIG["ip_filter"]["whitelist"],
 )
 
 # 健康检查端点
@@ -76,6 +100,28 @@ app.add_middleware(
 def read_root():
     return {"status": "ok", "message": "博客API服务正常运行"}
 
+# 允许访问监控指标的地址
+metrics_allowed_ips = IPSet(SECURITY_CONFIG["metrics"]["allowed_ips"])
+
+def require_metrics_access(request: Request) -> None:
+    """
+    只允许来自METRICS_ALLOWED_IPS的连接或携带METRICS_TOKEN的请求访问监控指标
+    地址取直接连接的客户端地址，经反向代理访问时为代理的地址，此时应使用令牌
+    """
+    token = SECURITY_CONFIG["metrics"]["token"]
+    if token and hmac.compare_digest(
+        request.headers.get("authorization", "").encode(), f"Bearer {token}".encode()
+    ):
+        return
+    if request.client and request.client.host in metrics_allowed_ips:
+        return
+    raise HTTPException(status_code=403, detail="无权访问监控指标")
+
+# 连接池监控指标（Prometheus文本格式），每个worker返回各自连接池的数据
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_access)])
+def get_metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # 从GitHub拉取代码并解析
 @app.post("/api/sync", response_model=schemas.SyncResponse)
 def sync_from_github(task: schemas.SyncRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
@@ -99,17 +145,56 @@ def get_sync_status(db: Session = Depends(get_db)):
     return status
 
 # 获取所有分类
+# 文章相关接口均为异步函数，数据库操作通过run_db执行：
+# 开启DB_ASYNC时在事件循环中使用异步驱动，否则与原来一样在线程池中使用同步会话；
+# 只有数据库查询通过run_db执行，响应缓存的读写和JSON编解码在线程池中执行，不阻塞事件循环
 @app.get("/api/category", response_model=List[schemas.Category])
-def get_categories(db: Session = Depends(get_db)):
-    categories = article_service.get_categories(db)
+async def get_categories(http_request: Request, response: Response, db=Depends(get_db_session)):
+    validators = await response_cache.get_validators_async("category", {})
+    if validators and is_not_modified(http_request, validators):
+        return not_modified_response(validators)
+    
+    categories, validators, _ = await response_cache.get_or_build_with_validators_async(
+        "category", {}, lambda: run_db(db, article_service.get_categories), build_validators
+    )
+    if is_not_modified(http_request, validators):
+        return not_modified_response(validators)
+    
+    apply_validators(response, validators)
     return categories
 
-# 获取文章列表
-@app.post("/api/article/list", response_model=schemas.ArticleListResponse)
-def get_article_list(
-    request: schemas.ArticleListRequest,
-    db: Session = Depends(get_db)
-):
+def build_article_list_data(db: Session, request: schemas.ArticleListRequest) -> dict:
+    """
+    生成文章列表接口的data部分
+    """
+    # 游标分页模式，适用于深分页和无限滚动
+    if request.paginationMode == "cursor" or request.cursor:
+        try:
+            articles, next_cursor, total = article_service.get_article_list_by_cursor(
+                db=db,
+                category_id=request.categoryId,
+                page_size=request.pageSize,
+                cursor=request.cursor,
+                sort_by=request.sortBy,
+                with_total=request.withTotal
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        pagination = {
+            "pageSize": request.pageSize,
+            "nextCursor": next_cursor,
+            "hasMore": next_cursor is not None
+        }
+        if total is not None:
+            pagination["total"] = total
+            pagination["totalPages"] = (total + request.pageSize - 1) // request.pageSize
+        
+        return {
+            "list": articles,
+            "pagination": pagination
+        }
+    
     articles, total, total_pages = article_service.get_article_list(
         db=db,
         category_id=request.categoryId,
@@ -118,30 +203,99 @@ def get_article_list(
         sort_by=request.sortBy
     )
     
+    return {
+        "list": articles,
+        "pagination": {
+            "total": total,
+            "pageSize": request.pageSize,
+            "currentPage": request.currentPage,
+            "totalPages": total_pages
+        }
+    }
+
+def article_list_validators(data: dict) -> dict:
+    """
+    文章列表的校验信息，只使用ETag
+    列表中最晚的更新时间不能反映文章被删除、取消发布或排序变化，用作Last-Modified会错误地返回304
+    """
+    return build_validators(data)
+
+# 获取文章列表
+# 列表查询虽然使用POST，但不修改任何数据，因此同样支持If-None-Match条件请求
+@app.post("/api/article/list", response_model=schemas.ArticleListResponse)
+async def get_article_list(
+    request: schemas.ArticleListRequest,
+    http_request: Request,
+    response: Response,
+    db=Depends(get_db_session)
+):
+    params = request.dict()
+    
+    validators = await response_cache.get_validators_async("article_list", params)
+    if validators and is_not_modified(http_request, validators):
+        return not_modified_response(validators)
+    
+    data, validators, cached = await response_cache.get_or_build_with_validators_async(
+        "article_list", params, lambda: run_db(db, build_article_list_data, request), article_list_validators
+    )
+    if is_not_modified(http_request, validators):
+        return not_modified_response(validators)
+    
+    # 缓存的响应中阅读数可能已过期，合并最新值
+    if cached:
+        await run_db(db, article_service.refresh_view_counts, data["list"])
+    
+    apply_validators(response, validators)
     return {
         "code": 200,
         "message": "成功",
-        "data": {
-            "list": articles,
-            "pagination": {
-                "total": total,
-                "pageSize": request.pageSize,
-                "currentPage": request.currentPage,
-                "totalPages": total_pages
-            }
-        }
+        "data": data
     }
 
-# 获取文章详情
+def article_detail_validators(article: dict) -> dict:
+    """
+    文章详情的校验信息，Last-Modified取文章更新时间
+    """
+    return build_validators(article, latest_time([article.get("updateTime")]))
+
+# 获取文章详情，评论通过commentPage和commentPageSize分页
 @app.get("/api/article/{article_id}", response_model=schemas.ArticleDetailResponse)
-def get_article_detail(article_id: int, db: Session = Depends(get_db)):
-    article = article_service.get_article_detail(db, article_id)
+async def get_article_detail(
+    article_id: int,
+    http_request: Request,
+    response: Response,
+    commentPage: int = Query(1, ge=1),
+    commentPageSize: int = Query(article_service.COMMENT_PAGE_SIZE, ge=1, le=article_service.COMMENT_MAX_PAGE_SIZE),
+    db=Depends(get_db_session)
+):
+    params = {"articleId": article_id, "commentPage": commentPage, "commentPageSize": commentPageSize}
+    
+    # 客户端已有最新内容时直接返回304，无需读取文章
+    validators = await response_cache.get_validators_async("article_detail", params)
+    if validators and is_not_modified(http_request, validators):
+        article_service.increment_view_count(article_id)
+        return not_modified_response(validators)
+    
+    article, validators, cached = await response_cache.get_or_build_with_validators_async(
+        "article_detail", params,
+        lambda: run_db(db, article_service.get_article_detail, article_id, commentPage, commentPageSize),
+        article_detail_validators
+    )
     if not article:
         raise HTTPException(status_code=404, detail="文章不存在")
     
+    if is_not_modified(http_request, validators):
+        article_service.increment_view_count(article_id)
+        return not_modified_response(validators)
+    
+    # 缓存的响应中阅读数可能已过期，合并最新值
+    if cached:
+        await run_db(db, article_service.refresh_view_counts, [article])
+    
     # 增加阅读计数
-    article_service.increment_view_count(db, article_id)
+    article_service.increment_view_count(article_id)
     
+    apply_validators(response, validators)
     return {
         "code": 200,
         "message": "成功",
@@ -163,18 +317,27 @@ from utils.security_utils import validate_search_keyword
 
 # 搜索文章
 @app.get("/api/article/search", response_model=schemas.ArticleListResponse)
-def search_articles(
+async def search_articles(
     request: SearchArticlesRequest = Depends(),
-    db: Session = Depends(get_db)
+    db=Depends(get_db_session)
 ):    
     # 验证并清理搜索关键词
     sanitized_keyword = validate_search_keyword(request.keyword)
-    articles, total, total_pages = article_service.search_articles(
-        db=db,
-        keyword=sanitized_keyword,  # 使用清理后的关键词
-        page_size=request.pageSize,
-        current_page=request.currentPage
-    )
+    if isinstance(db, AsyncSession):
+        articles, total, total_pages = await article_service.search_articles_async(
+            db=db,
+            keyword=sanitized_keyword,  # 使用清理后的关键词
+            page_size=request.pageSize,
+            current_page=request.currentPage
+        )
+    else:
+        articles, total, total_pages = await run_db(
+            db,
+            article_service.search_articles,
+            keyword=sanitized_keyword,
+            page_size=request.pageSize,
+            current_page=request.currentPage
+        )
     
     return {
         "code": 200,
@@ -201,6 +364,11 @@ def startup_event():
     # 将调度器保存到应用状态中，以便在需要时访问
     app.state.scheduler = scheduler
     logger.info("应用启动，定时任务调度器已初始化")
+    
+    # 后台检查并构建全文索引，构建完成前搜索回退到数据库模糊匹配
+    index_thread = threading.Thread(target=search_service.ensure_index, args=(SessionLocal,))
+    index_thread.daemon = True
+    index_thread.start()
 
 @app.on_event("shutdown")
 def shutdown_event():
@@ -209,6 +377,13 @@ def shutdown_event():
     if hasattr(app.state, "scheduler"):
         app.state.scheduler.shutdown()
         logger.info("应用关闭，定时任务调度器已停止")
+    
+    # 将缓冲中剩余的阅读计数落库
+    try:
+        flushed = view_counter.flush_view_counts(SessionLocal)
+        logger.info(f"应用关闭，已落库剩余阅读计数: {flushed}")
+    except Exception as e:
+        logger.error(f"应用关闭时阅读计数落库失败: {str(e)}")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,28 +1,38 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request, Response
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+from fastapi import Response
 from fastapi.responses import JSONResponse
 import logging
 import redis.asyncio as redis
-from typing import List, Optional
+from typing import List, Optional, Union
 import os
+
+from utils.ip_set import IPSet
 logger = logging.getLogger(__name__)
 if os.getenv("DEBUG_MODE") == "false":
     logger.setLevel(logging.WARNING)
-class IPMiddleware(BaseHTTPMiddleware):
+
+# RateLimiter在Lua脚本中已检查过自动黑名单时，在scope["state"]中写入该标记，本中间件不再重复查询Redis
+AUTO_BLACKLIST_CHECKED = "auto_blacklist_checked"
+class IPMiddleware:
     """
     IP白名单和黑名单中间件
-    支持静态黑名单和动态自动黑名单
+    支持静态黑名单和动态自动黑名单，白名单和黑名单可以包含CIDR网段；
+    auto_blacklist为与RateLimiter共享的内存自动黑名单，命中时无需查询Redis
+    纯ASGI实现，不经过BaseHTTPMiddleware的任务和内存流，流式响应不会被缓冲
     """
     def __init__(self, 
-                 app, 
-                 whitelist: List[str] = None, 
-                 blacklist: List[str] = None,
+                 app: ASGIApp, 
+                 whitelist: Union[List[str], IPSet] = None, 
+                 blacklist: Union[List[str], IPSet] = None,
                  redis_url: Optional[str] = None,
                  redis_password: Optional[str] = None,
-                 check_auto_blacklist: bool = True):
-        super().__init__(app)
-        self.whitelist = whitelist or []
-        self.blacklist = blacklist or []
+                 check_auto_blacklist: bool = True,
+                 auto_blacklist: Optional[IPSet] = None):
+        self.app = app
+        self.whitelist = whitelist if isinstance(whitelist, IPSet) else IPSet(whitelist)
+        self.blacklist = blacklist if isinstance(blacklist, IPSet) else IPSet(blacklist)
+        self.auto_blacklist = auto_blacklist if auto_blacklist is not None else IPSet()
         self.redis_url = redis_url
         self.redis_password = redis_password
         self.check_auto_blacklist = check_auto_blacklist
@@ -77,17 +87,20 @@ class IPMiddleware(BaseHTTPMiddleware):
             logger.error(f"检查自动黑名单失败: {str(e)}")
             return False
     
-    async def dispatch(self, request: Request, call_next):
+    async def check(self, scope: Scope) -> Optional[Response]:
+        """
+        检查请求的客户端IP，被拒绝时返回403响应，允许通过时返回None
+        """
         # 初始化Redis连接池（如果尚未初始化）
         if self.redis_url and self.redis_pool is None:
             await self.init_redis_pool()
             
         # 获取客户端IP
-        client_ip = self._get_client_ip(request)
+        client_ip = self._get_client_ip(scope)
         
         # 检查白名单
         if self.whitelist and client_ip in self.whitelist:
-            return await call_next(request)
+            return None
         
         # 检查静态黑名单
         if client_ip in self.blacklist:
@@ -97,8 +110,14 @@ class IPMiddleware(BaseHTTPMiddleware):
                 content={"detail": "您的IP已被禁止访问此服务"}
             )
         
-        # 检查自动黑名单
-        if self.check_auto_blacklist and await self.is_in_auto_blacklist(client_ip):
+        # 检查自动黑名单，先查内存中的，再查Redis
+        if self.check_auto_blacklist and (
+            client_ip in self.auto_blacklist
+            or (
+                not scope.get("state", {}).get(AUTO_BLACKLIST_CHECKED)
+                and await self.is_in_auto_blacklist(client_ip)
+            )
+        ):
             logger.warning(f"拒绝来自自动黑名单IP的请求: {client_ip}")
             return JSONResponse(
                 status_code=403,
@@ -106,14 +125,27 @@ class IPMiddleware(BaseHTTPMiddleware):
             )
         
         # 允许请求通过
-        return await call_next(request)
+        return None
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # 只处理HTTP请求，lifespan和websocket直接交给应用
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        response = await self.check(scope)
+        if response is not None:
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
     
-    def _get_client_ip(self, request: Request) -> str:
+    def _get_client_ip(self, scope: Scope) -> str:
         """
         获取客户端真实IP地址
         """
-        forwarded = request.headers.get("X-Forwarded-For")
+        forwarded = Headers(scope=scope).get("X-Forwarded-For")
         if forwarded:
             # 获取最原始的IP（最左侧的）
             return forwarded.split(",")[0]
-        return request.client.host
\ No newline at end of file
+        client = scope.get("client")
+        return client[0] if client else ""
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class LocalBucket:
+    """
+    单个键的本地令牌桶状态
+    """
+    __slots__ = ("tokens", "last_time", "pending", "synced_at")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.last_time = now
+        # 本地已消耗但尚未同步到Redis的令牌数
+        self.pending = 0
+        # 上次与Redis同步的时间，0表示从未同步
+        self.synced_at = 0.0
+
+
+class LocalTokenBucket:
+    """
+    进程内的令牌桶，按键保存在OrderedDict中，超过max_keys时淘汰最久未访问的键
+    只在单个worker内生效，由RateLimiter定期把消耗同步到Redis中的全局令牌桶
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, LocalBucket]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[LocalBucket]:
+        """
+        获取键的令牌桶，不存在时返回None，不改变访问顺序
+        """
+        return self.buckets.get(key)
+
+    def consume(self, key: str, now: float, rate_per_minute: float, burst: float) -> Tuple[bool, LocalBucket]:
+        """
+        按速率填充令牌后消耗一个令牌
+        返回(是否允许, 令牌桶)，允许时消耗计入pending
+        """
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = LocalBucket(burst, now)
+            self.buckets[key] = bucket
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+            elapsed = max(0.0, now - bucket.last_time)
+            bucket.tokens = min(burst, bucket.tokens + elapsed * rate_per_minute / 60)
+            bucket.last_time = now
+
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            bucket.pending += 1
+            return True, bucket
+        return False, bucket
+
+    def __len__(self) -> int:
+        return len(self.buckets)
@@ -1,25 +1,52 @@
-from ctypes import Array
+import math
 import time
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, List, Tuple, Union
 
-from fastapi import FastAPI, Request, Response
+from fastapi import Request, Response
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import redis.asyncio as redis
 import logging
 import os
+
+from .ip_middleware import AUTO_BLACKLIST_CHECKED
+from .local_bucket import LocalBucket, LocalTokenBucket
+from utils.ip_set import IPSet
 logger = logging.getLogger(__name__)
 if os.getenv("DEBUG_MODE") == "false":
     logger.setLevel(logging.WARNING)
 
+# 限流脚本返回的判定结果
+VERDICT_ALLOWED = 0  # 允许通过
+VERDICT_LIMITED = 1  # 触发限流
+VERDICT_BLACKLISTED = 2  # IP在黑名单中
+VERDICT_LIMITED_AND_BLACKLISTED = 3  # 触发限流，且限流次数达到阈值，本次被加入黑名单
+
+# 限流算法
+ALGORITHM_TOKEN_BUCKET = "token_bucket"  # 令牌桶，Redis中保存令牌数和上次填充时间
+ALGORITHM_GCRA = "gcra"  # 通用信元速率算法，Redis中只保存一个理论到达时间
+
+# Redis不可用时的处理方式
+FALLBACK_LOCAL = "local"  # 只使用本地令牌桶限流
+FALLBACK_OPEN = "open"  # 不限流，允许所有请求通过
 
-class RateLimiter(BaseHTTPMiddleware):
+
+class RateLimiter:
     """
     基于Redis的速率限制中间件，使用令牌桶算法
     支持自动将频繁触发限流的IP加入黑名单
+    纯ASGI实现，速率限制头在响应开始时写入，流式响应不会被缓冲；
+    黑名单检查、令牌桶和限流计数在同一个Lua脚本中完成，每次同步只访问Redis一次
+
+    每个worker在内存中维护本地令牌桶（按LRU淘汰），本地有令牌时直接放行，
+    消耗累计到sync_batch个请求或距上次同步超过sync_interval秒时，才把消耗批量同步到Redis中的全局令牌桶；
+    本地令牌耗尽的请求总是由Redis判定，以便准确累计限流次数。sync_batch为1时每个请求都访问Redis。
+    Redis不可用时按fallback处理：local只使用本地令牌桶（容量和速率乘以fallback_factor），open不限流
+    白名单中的IP与IPMiddleware中一样不受黑名单限制，也不会被自动加入黑名单，但仍受速率限制
     """
     def __init__(self, 
-                 app, 
+                 app: ASGIApp, 
                  redis_url: str, 
                  redis_password: str,
                  rate_limit_per_minute: int = 60, 
@@ -27,8 +54,16 @@ class RateLimiter(BaseHTTPMiddleware):
                  exempt_paths: list = None,
                  auto_blacklist_threshold: int = 5,
                  auto_blacklist_expire: int = 3600,
-                 ip_blacklist: Array[str] = None):
-        super().__init__(app)
+                 ip_blacklist: Union[List[str], IPSet] = None,
+                 local_max_keys: int = 10000,
+                 sync_batch: int = 1,
+                 sync_interval: float = 1.0,
+                 fallback: str = FALLBACK_LOCAL,
+                 fallback_factor: float = 1.0,
+                 algorithm: str = ALGORITHM_TOKEN_BUCKET,
+                 auto_blacklist: Optional[IPSet] = None,
+                 whitelist: Union[List[str], IPSet] = None):
+        self.app = app
         self.redis_url = redis_url
         self.redis_password = redis_password
         self.rate_limit_per_minute = rate_limit_per_minute
@@ -36,24 +71,38 @@ class RateLimiter(BaseHTTPMiddleware):
         self.exempt_paths = exempt_paths or []
         self.auto_blacklist_threshold = auto_blacklist_threshold
         self.auto_blacklist_expire = auto_blacklist_expire
-        self.ip_blacklist = ip_blacklist or []
+        self.ip_blacklist = ip_blacklist if isinstance(ip_blacklist, IPSet) else IPSet(ip_blacklist)
+        self.whitelist = whitelist if isinstance(whitelist, IPSet) else IPSet(whitelist)
+        # 内存中的自动黑名单，条目在auto_blacklist_expire秒后过期，可与IPMiddleware共享
+        self.auto_blacklist = auto_blacklist if auto_blacklist is not None else IPSet()
         self.redis_pool = None
+        if algorithm not in self.LIMIT_SCRIPTS:
+            raise ValueError(f"不支持的限流算法: {algorithm}")
+        self.algorithm = algorithm
         self.limit_script = None
         self.custom_key_func = None
+        self.local_buckets = LocalTokenBucket(local_max_keys)
+        self.sync_batch = max(1, sync_batch)
+        self.sync_interval = sync_interval
+        self.fallback = fallback
+        self.fallback_factor = fallback_factor
+        # Redis访问失败后，在该时间（time.monotonic）之前不再访问Redis
+        self.redis_retry_at = 0.0
         logger.info(f"速率限制中间件已初始化，每分钟请求数: {rate_limit_per_minute}, 突发限制: {burst_limit}, "
                   f"豁免路径: {exempt_paths}, 自动黑名单阈值: {auto_blacklist_threshold}, "
-                  f"自动黑名单过期时间: {auto_blacklist_expire}秒")
+                  f"自动黑名单过期时间: {auto_blacklist_expire}秒, 同步批量: {self.sync_batch}, "
+                  f"同步间隔: {sync_interval}秒, Redis不可用时: {fallback}, 限流算法: {algorithm}")
 
     async def init_redis_pool(self):
         """
         初始化Redis连接池
         """
-        logger.info(f"初始化Redis连接池")
+        logger.debug(f"初始化Redis连接池")
         if self.redis_pool is None:
             try:
                 self.redis_pool = await redis.from_url(self.redis_url, encoding="utf-8", decode_responses=True, password=self.redis_password)
-                # 加载Lua脚本
-                self.limit_script = await self.redis_pool.script_load(self.LIMIT_SCRIPT)
+                # 注册Lua脚本：按SHA执行，Redis重启后脚本缓存丢失（NOSCRIPT）时自动重新加载
+                self.limit_script = self.redis_pool.register_script(self.LIMIT_SCRIPTS[self.algorithm])
                 logger.info("Redis连接池已初始化")
                 # 测试连接
                 await self.redis_pool.ping()
@@ -73,254 +122,363 @@ class RateLimiter(BaseHTTPMiddleware):
                     
                     logger.info(f"尝试使用清理后的URL连接Redis: {clean_url}")
                     self.redis_pool = await redis.from_url(clean_url, encoding="utf-8", decode_responses=True, password=self.redis_password)
-                    # 加载Lua脚本
-                    self.limit_script = await self.redis_pool.script_load(self.LIMIT_SCRIPT)
+                    self.limit_script = self.redis_pool.register_script(self.LIMIT_SCRIPTS[self.algorithm])
                     logger.info("Redis连接池已初始化（使用单独的密码参数）")
                 except Exception as e2:
                     logger.error(f"Redis连接初始化第二次尝试失败: {str(e2)}")
                     # 设置为None以便下次请求重试
                     self.redis_pool = None
 
-    # 令牌桶算法的Lua脚本实现
-    LIMIT_SCRIPT = """
+    # 黑名单检查、限流算法和限流计数的Lua脚本，原子执行，由开头、限流算法和结尾三部分拼接
+    # KEYS: 1 限流状态, 2 限流触发的黑名单, 3 IPMiddleware检查的自动黑名单, 4 限流计数
+    # ARGV: 1 每分钟的请求数, 2 突发容量, 3 当前时间（毫秒）, 4 请求的令牌数,
+    #       5 加入黑名单的限流次数阈值, 6 黑名单和计数的过期时间, 7 为1时只检查黑名单（豁免路径）,
+    #       8 为1时IP在白名单中：不检查黑名单，触发限流时不计数也不加入黑名单
+    # 返回 {判定结果, 剩余令牌数, 限流次数, 多少毫秒后可以重试, 多少毫秒后恢复到满额}
+    _SCRIPT_HEADER = """
+    if ARGV[8] ~= '1' and redis.call('exists', KEYS[2], KEYS[3]) > 0 then
+        return { 2, 0, 0, 0, 0 }
+    end
+    if ARGV[7] == '1' then
+        return { 0, 0, 0, 0, 0 }
+    end
+
     local key = KEYS[1]
     local rate = tonumber(ARGV[1])
     local burst = tonumber(ARGV[2])
     local now = tonumber(ARGV[3])
     local requested = tonumber(ARGV[4])
+    -- 每个令牌的填充间隔（毫秒）
+    local interval = 60000 / rate
+    """
 
-    -- 获取当前桶中的令牌数和上次填充时间
-    local tokens = tonumber(redis.call('hget', key, 'tokens') or burst)
-    local last_time = tonumber(redis.call('hget', key, 'last_time') or 0)
-
-    -- 计算从上次填充到现在应该添加的令牌数
-    local fill_time = math.max(0, now - last_time)
-    local fill_tokens = math.floor((fill_time * rate) / 60)
-    tokens = math.min(burst, tokens + fill_tokens)
+    # 令牌桶：哈希中保存令牌数（可为小数）和上次填充时间（毫秒），恢复到满额时键过期
+    # 切换限流算法后键中可能还是GCRA保存的字符串（WRONGTYPE），删除后按满额处理
+    _TOKEN_BUCKET = """
+    local state = redis.pcall('hmget', key, 'tokens', 'last_time')
+    if state.err then
+        redis.call('del', key)
+        state = {}
+    end
+    local tokens = tonumber(state[1]) or burst
+    local last_time = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - last_time) / interval)
 
-    -- 检查是否有足够的令牌
     local allowed = 0
+    local retry_after = 0
     if tokens >= requested then
         tokens = tokens - requested
         allowed = 1
+    else
+        -- 批量同步时本地已放行的请求无法撤回，清空令牌桶
+        if requested > 1 then
+            tokens = 0
+        end
+        retry_after = math.ceil((1 - tokens) * interval)
+    end
+
+    local reset_after = math.ceil((burst - tokens) * interval)
+    redis.call('hset', key, 'tokens', tokens, 'last_time', now)
+    redis.call('pexpire', key, math.max(reset_after, 1))
+    local remaining = math.floor(tokens)
+    """
+
+    # GCRA：只保存理论到达时间（TAT，毫秒），TAT比当前时间超前不超过突发容量对应的时长时允许请求
+    # 切换限流算法后键中可能还是令牌桶保存的哈希（WRONGTYPE），删除后按满额处理
+    _GCRA = """
+    local tolerance = interval * burst
+    local stored = redis.pcall('get', key)
+    if type(stored) == 'table' and stored.err then
+        redis.call('del', key)
+        stored = false
+    end
+    local tat = math.max(tonumber(stored) or now, now)
+    local new_tat = tat + requested * interval
+
+    local allowed = 0
+    local retry_after = 0
+    if new_tat - now <= tolerance then
+        tat = new_tat
+        allowed = 1
+    elseif requested > 1 then
+        -- 批量同步时本地已放行的请求无法撤回，清空突发容量
+        tat = math.max(tat, now + tolerance)
+    end
+    if allowed == 0 then
+        retry_after = math.ceil(tat + interval - tolerance - now)
+    end
+
+    local reset_after = math.ceil(tat - now)
+    if reset_after > 0 then
+        redis.call('set', key, string.format('%.3f', tat), 'PX', reset_after)
     end
+    local remaining = math.floor((tolerance - (tat - now)) / interval + 1e-9)
+    """
 
-    -- 更新令牌数和时间
-    redis.call('hset', key, 'tokens', tokens)
-    redis.call('hset', key, 'last_time', now)
-    
-    -- 设置过期时间（1小时）
-    redis.call('expire', key, 3600)
+    _SCRIPT_FOOTER = """
+    if allowed == 1 then
+        return { 0, remaining, 0, 0, reset_after }
+    end
+    if ARGV[8] == '1' then
+        return { 1, remaining, 0, retry_after, reset_after }
+    end
 
-    return { allowed, tokens }
+    -- 触发限流，增加计数，达到阈值时加入黑名单
+    local threshold = tonumber(ARGV[5])
+    local expire = tonumber(ARGV[6])
+    local count = redis.call('incr', KEYS[4])
+    if count == 1 then
+        redis.call('expire', KEYS[4], expire)
+    end
+    if count >= threshold then
+        redis.call('set', KEYS[2], '1', 'EX', expire)
+        return { 3, remaining, count, retry_after, reset_after }
+    end
+    return { 1, remaining, count, retry_after, reset_after }
     """
 
-    def _get_client_ip(self, request: Request) -> str:
+    LIMIT_SCRIPTS = {
+        ALGORITHM_TOKEN_BUCKET: _SCRIPT_HEADER + _TOKEN_BUCKET + _SCRIPT_FOOTER,
+        ALGORITHM_GCRA: _SCRIPT_HEADER + _GCRA + _SCRIPT_FOOTER,
+    }
+
+    def _get_client_ip(self, scope: Scope) -> str:
         """
         获取客户端真实IP地址
         """
-        logger.info(f"获取客户端IP: {request.client.host}")
         # 首先检查X-Forwarded-For头
-        forwarded_for = request.headers.get("X-Forwarded-For")
+        forwarded_for = Headers(scope=scope).get("X-Forwarded-For")
         if forwarded_for:
             # 使用第一个IP地址（最接近用户的代理）
             return forwarded_for.split(",")[0].strip()
             
         # 如果没有X-Forwarded-For头，使用直接连接的客户端IP
-        return request.client.host
+        client = scope.get("client")
+        return client[0] if client else ""
         
-    def get_rate_limit_key(self, request: Request) -> str:
+    def get_rate_limit_key(self, scope: Scope, client_ip: str) -> str:
         """
         生成速率限制的键
         默认使用客户端IP作为键
-        可以通过custom_key_func自定义键生成逻辑
+        可以通过custom_key_func自定义键生成逻辑（参数为Request）
         """
-        logger.info(f"生成速率限制键: {request.url.path}")
         if self.custom_key_func:
-            return self.custom_key_func(request)
+            return self.custom_key_func(Request(scope))
         
         # 默认使用IP作为键
-        client_ip = self._get_client_ip(request)
         return f"rate_limit:{client_ip}"
 
     def is_path_exempt(self, path: str) -> bool:
         """
         检查路径是否豁免速率限制
         """
-        logger.info(f"检查路径是否豁免速率限制: {path}")
-        logger.info(f"全部豁免路径: {self.exempt_paths}")
         for exempt_path in self.exempt_paths:
             if path.startswith(exempt_path):
-                logger.info(f"路径 {path} 有豁免速率限制")
+                logger.debug(f"路径 {path} 有豁免速率限制")
                 return True
-        logger.info(f"路径 {path} 无豁免速率限制")
         return False
         
-    async def increment_rate_limit_counter(self, client_ip: str) -> int:
+    def add_to_blacklist(self, client_ip: str) -> None:
         """
-        增加IP的限流计数，并返回当前计数值
-        如果计数超过阈值，将IP加入黑名单
+        将IP加入内存自动黑名单，与Redis中的黑名单键（由限流脚本写入）同时过期
         """
+        self.auto_blacklist.add(client_ip, ttl=self.auto_blacklist_expire)
+        logger.warning(f"IP {client_ip} 已被自动加入黑名单，触发限流次数过多")
+
+    async def run_limit_script(self, client_ip: str, rate_limit_key: str, requested: int,
+                               check_only: bool = False,
+                               whitelisted: bool = False) -> Optional[Tuple[int, int, int, int, int]]:
+        """
+        执行限流脚本，返回(判定结果, 剩余令牌数, 限流次数, 重试等待毫秒数, 恢复满额毫秒数)
+        Redis出现问题时记录错误并返回None，sync_interval秒内不再访问Redis
+        """
+        # 初始化Redis连接池（如果尚未初始化）
         if self.redis_pool is None:
-            logger.info(f"初始化Redis连接池用于增加限流计数: {client_ip}")
             await self.init_redis_pool()
-            
-        counter_key = f"rate_limit_counter:{client_ip}"
-        logger.info(f"增加IP限流计数: {counter_key}")
         
         try:
-            # 增加计数并设置过期时间
-            count = await self.redis_pool.incr(counter_key)
-            logger.info(f"IP {client_ip} 当前限流计数: {count}/{self.auto_blacklist_threshold}")
-            
-            if count == 1:  # 如果是第一次计数，设置过期时间
-                await self.redis_pool.expire(counter_key, self.auto_blacklist_expire)
-                logger.info(f"设置计数器过期时间: {self.auto_blacklist_expire}秒")
-                
-            # 检查是否超过阈值
-            if count >= self.auto_blacklist_threshold:
-                logger.warning(f"IP {client_ip} 限流计数达到阈值 {count}/{self.auto_blacklist_threshold}，准备加入黑名单")
-                await self.add_to_blacklist(client_ip)
-                
-            return count
+            result = await self.limit_script(
+                keys=[
+                    rate_limit_key,
+                    f"ip_blacklist:{client_ip}",
+                    f"auto_blacklist:{client_ip}",
+                    f"rate_limit_counter:{client_ip}",
+                ],
+                args=[
+                    self.rate_limit_per_minute,
+                    self.burst_limit,
+                    int(time.time() * 1000),
+                    requested,
+                    self.auto_blacklist_threshold,
+                    self.auto_blacklist_expire,
+                    1 if check_only else 0,
+                    1 if whitelisted else 0,
+                ]
+            )
         except Exception as e:
-            logger.error(f"增加限流计数失败: {str(e)}")
-            return 0
-        
-    async def add_to_blacklist(self, client_ip: str) -> None:
+            logger.error(f"速率限制检查失败: {str(e)}")
+            self.redis_retry_at = time.monotonic() + self.sync_interval
+            return None
+        return tuple(int(value) for value in result)
+
+    async def check(self, scope: Scope) -> Tuple[Optional[Response], Dict[str, str]]:
         """
-        将IP加入黑名单
+        对请求执行黑名单和速率限制检查
+        返回(拒绝时的响应, 需要写入响应的速率限制头)，允许通过时响应为None；
+        Redis出现问题时按fallback使用本地令牌桶或允许请求通过
         """
-        try:
-            # 检查IP是否已在黑名单中
-            if client_ip in self.ip_blacklist:
-                logger.info(f"IP {client_ip} 已在内存黑名单中，无需重复添加")
-                return
-                
-            # 将IP加入黑名单
-            self.ip_blacklist.append(client_ip)
-            logger.warning(f"IP {client_ip} 已被自动加入内存黑名单，触发限流次数过多")
-            
-            # 在Redis中记录黑名单状态和过期时间
-            blacklist_key = f"ip_blacklist:{client_ip}"
-            logger.info(f"将IP添加到Redis黑名单: {blacklist_key}, 过期时间: {self.auto_blacklist_expire}秒")
-            
-            # 确保Redis连接池已初始化
-            if self.redis_pool is None:
-                logger.info("初始化Redis连接池用于添加黑名单")
-                await self.init_redis_pool()
-                
-            # 设置黑名单键值和过期时间
-            result = await self.redis_pool.set(blacklist_key, "1", ex=self.auto_blacklist_expire)
-            logger.info(f"Redis黑名单设置结果: {result}")
-            
-            # 验证黑名单设置是否成功
-            exists = await self.redis_pool.exists(blacklist_key)
-            logger.info(f"验证Redis黑名单键是否存在: {exists}")
-        except Exception as e:
-            logger.error(f"将IP {client_ip} 加入黑名单失败: {str(e)}")
-            # 即使Redis操作失败，也保留内存中的黑名单记录
+        # 获取客户端IP
+        client_ip = self._get_client_ip(scope)
         
-    async def is_in_auto_blacklist(self, client_ip: str) -> bool:
+        # 白名单中的IP不检查黑名单，与IPMiddleware一致
+        whitelisted = bool(self.whitelist) and client_ip in self.whitelist
+        
+        # 首先检查内存中的黑名单，无需访问Redis
+        if not whitelisted and (client_ip in self.ip_blacklist or client_ip in self.auto_blacklist):
+            logger.warning(f"拒绝来自自动黑名单IP的请求: {client_ip}")
+            return self._blacklisted_response(), {}
+
+        # 生成速率限制键
+        rate_limit_key = self.get_rate_limit_key(scope, client_ip)
+        now = time.monotonic()
+        redis_available = now >= self.redis_retry_at
+        
+        # 豁免路径只检查黑名单，不消耗令牌；最近同步过的键在同步时已检查过黑名单
+        if self.is_path_exempt(scope["path"]):
+            if whitelisted:
+                return None, {}
+            bucket = self.local_buckets.get(rate_limit_key)
+            if redis_available and (bucket is None or now - bucket.synced_at >= self.sync_interval):
+                result = await self.run_limit_script(client_ip, rate_limit_key, 0, check_only=True)
+                if result is None:
+                    # 与非豁免路径一致，Redis不可用期间IPMiddleware无需再尝试查询自动黑名单
+                    scope.setdefault("state", {})[AUTO_BLACKLIST_CHECKED] = True
+                    return None, {}
+                if result[0] == VERDICT_BLACKLISTED:
+                    logger.warning(f"拒绝来自自动黑名单IP的请求: {client_ip}")
+                    return self._blacklisted_response(), {}
+            scope.setdefault("state", {})[AUTO_BLACKLIST_CHECKED] = True
+            return None, {}
+        
+        if not redis_available:
+            # Redis不可用期间IPMiddleware也无需再尝试查询自动黑名单
+            scope.setdefault("state", {})[AUTO_BLACKLIST_CHECKED] = True
+            return self._local_result(client_ip, rate_limit_key, now)
+        
+        allowed, bucket = self.local_buckets.consume(rate_limit_key, now, self.rate_limit_per_minute, self.burst_limit)
+        if allowed and bucket.pending < self.sync_batch and now - bucket.synced_at < self.sync_interval:
+            # 本地有令牌且无需同步，自动黑名单在上次同步时已检查
+            scope.setdefault("state", {})[AUTO_BLACKLIST_CHECKED] = True
+            return None, self._local_headers(bucket, self.rate_limit_per_minute, self.burst_limit)
+        
+        # 把本地累计的消耗同步到Redis；本地令牌耗尽时本次请求也由Redis判定
+        synced = bucket.pending
+        result = await self.run_limit_script(
+            client_ip, rate_limit_key, synced if allowed else synced + 1, whitelisted=whitelisted
+        )
+        if result is None:
+            bucket.pending = 0
+            scope.setdefault("state", {})[AUTO_BLACKLIST_CHECKED] = True
+            if self.fallback == FALLBACK_OPEN:
+                return None, {}
+            return self._decide_locally(allowed, bucket, rate_limit_key, self.rate_limit_per_minute, self.burst_limit)
+        verdict, remaining, count, retry_after, reset_after = result
+        bucket.pending -= synced
+        bucket.synced_at = now
+        bucket.tokens = max(0, remaining - bucket.pending)
+        
+        # 脚本已检查过自动黑名单，IPMiddleware无需再访问Redis
+        scope.setdefault("state", {})[AUTO_BLACKLIST_CHECKED] = True
+        
+        if verdict == VERDICT_BLACKLISTED:
+            logger.warning(f"拒绝来自自动黑名单IP的请求: {client_ip}")
+            return self._blacklisted_response(), {}
+        
+        # 设置速率限制的响应头，同步期间本地新放行的请求计入恢复满额的时间
+        headers = self._rate_limit_headers(
+            int(bucket.tokens),
+            reset_after / 1000 + bucket.pending * 60 / self.rate_limit_per_minute,
+        )
+        
+        if verdict == VERDICT_ALLOWED:
+            return None, headers
+        
+        # 拒绝请求 - 返回429 Too Many Requests
+        logger.warning(f"速率限制触发: {rate_limit_key}，限流计数: {count}/{self.auto_blacklist_threshold}")
+        if verdict == VERDICT_LIMITED_AND_BLACKLISTED:
+            self.add_to_blacklist(client_ip)
+        
+        return self._limited_response(headers, retry_after / 1000), headers
+
+    def _local_result(self, client_ip: str, rate_limit_key: str, now: float) -> Tuple[Optional[Response], Dict[str, str]]:
         """
-        检查IP是否在自动黑名单中
+        Redis不可用期间的处理：按fallback只使用本地令牌桶，或允许请求通过
         """
-        try:
-            # 首先检查内存中的黑名单
-            if client_ip in self.ip_blacklist:
-                logger.info(f"IP {client_ip} 在内存黑名单中")
-                return True
-                
-            # 然后检查Redis中的黑名单
-            if self.redis_pool is None:
-                logger.info(f"初始化Redis连接池用于检查黑名单: {client_ip}")
-                await self.init_redis_pool()
-                
-            blacklist_key = f"ip_blacklist:{client_ip}"
-            logger.info(f"检查IP是否在Redis黑名单中: {blacklist_key}")
-            
-            exists = await self.redis_pool.exists(blacklist_key)
-            logger.info(f"IP {client_ip} 在Redis黑名单中的状态是: {exists}")
-            return exists
-        except Exception as e:
-            logger.error(f"检查IP {client_ip} 是否在黑名单中失败: {str(e)}")
-            # 如果Redis检查失败，回退到内存黑名单检查
-            return client_ip in self.ip_blacklist
+        if self.fallback == FALLBACK_OPEN:
+            return None, {}
+        rate = self.rate_limit_per_minute * self.fallback_factor
+        burst = self.burst_limit * self.fallback_factor
+        allowed, bucket = self.local_buckets.consume(rate_limit_key, now, rate, burst)
+        bucket.pending = 0
+        return self._decide_locally(allowed, bucket, rate_limit_key, rate, burst)
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        logger.info(f"限流入口处理请求: {request.url.path}")
-        # 初始化Redis连接池（如果尚未初始化）
-        if self.redis_pool is None:
-            await self.init_redis_pool()
+    def _decide_locally(self, allowed: bool, bucket: LocalBucket, rate_limit_key: str,
+                        rate: float, burst: float) -> Tuple[Optional[Response], Dict[str, str]]:
+        headers = self._local_headers(bucket, rate, burst)
+        if allowed:
+            return None, headers
+        logger.warning(f"速率限制触发（本地令牌桶）: {rate_limit_key}")
+        return self._limited_response(headers, (1 - bucket.tokens) * 60 / rate), headers
 
-        # 获取客户端IP
-        client_ip = self._get_client_ip(request)
-        
-        # 检查IP是否在自动黑名单中
-        if await self.is_in_auto_blacklist(client_ip):
-            logger.warning(f"拒绝来自自动黑名单IP的请求: {client_ip}")
-            return JSONResponse(
-                status_code=403,
-                content={"detail": "您的IP已被临时禁止访问此服务，请稍后再试"}
-            )
+    def _local_headers(self, bucket: LocalBucket, rate: float, burst: float) -> Dict[str, str]:
+        return self._rate_limit_headers(int(bucket.tokens), (burst - bucket.tokens) * 60 / rate)
 
-        # 检查路径是否豁免
-        if self.is_path_exempt(request.url.path):
-            return await call_next(request)
+    def _rate_limit_headers(self, remaining: int, reset_after: float) -> Dict[str, str]:
+        """
+        生成速率限制响应头，X-RateLimit-Reset为恢复到满额的Unix时间戳（秒，向上取整）
+        """
+        return {
+            "X-RateLimit-Limit": str(self.rate_limit_per_minute),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(math.ceil(time.time() + reset_after))
+        }
 
-        # 生成速率限制键
-        rate_limit_key = self.get_rate_limit_key(request)
+    def _limited_response(self, headers: Dict[str, str], retry_after: float) -> Response:
+        """
+        429响应，Retry-After为下一个请求可以通过前需要等待的秒数（向上取整，至少为1）
+        """
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "请求过于频繁，请稍后再试"},
+            headers={**headers, "Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+    def _blacklisted_response(self) -> Response:
+        return JSONResponse(
+            status_code=403,
+            content={"detail": "您的IP已被临时禁止访问此服务，请稍后再试"}
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # 只处理HTTP请求，lifespan和websocket直接交给应用
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # 执行Lua脚本检查速率限制
-        now = int(time.time())
-        requested = 1  # 每个请求消耗1个令牌
+        response, headers = await self.check(scope)
+        if response is not None:
+            await response(scope, receive, send)
+            return
+        if not headers:
+            await self.app(scope, receive, send)
+            return
         
-        try:
-            logger.info(f"执行速率限制检查: {rate_limit_key}, 脚本ID: {self.limit_script}")
-            result = await self.redis_pool.evalsha(
-                self.limit_script,
-                1,  # 键的数量
-                rate_limit_key,  # KEYS[1]
-                self.rate_limit_per_minute,  # ARGV[1] - 每分钟填充的令牌数
-                self.burst_limit,  # ARGV[2] - 桶的最大容量
-                now,  # ARGV[3] - 当前时间
-                requested  # ARGV[4] - 请求的令牌数
-            )
-            
-            logger.info(f"速率限制检查结果: {result}")
-            allowed, remaining = result
-            
-            # 设置速率限制的响应头
-            headers = {
-                "X-RateLimit-Limit": str(self.rate_limit_per_minute),
-                "X-RateLimit-Remaining": str(remaining),
-                "X-RateLimit-Reset": str(now + 60)  # 下一分钟重置
-            }
-            
-            if allowed == 1:
-                # 允许请求
-                response = await call_next(request)
-                
-                # 将速率限制头添加到响应中
+        async def send_with_headers(message: Message) -> None:
+            # 在响应开始时写入速率限制头，响应体按原样转发
+            if message["type"] == "http.response.start":
+                response_headers = MutableHeaders(scope=message)
                 for name, value in headers.items():
-                    response.headers[name] = value
-                    
-                return response
-            else:
-                # 拒绝请求 - 返回429 Too Many Requests
-                logger.warning(f"速率限制触发: {rate_limit_key}")
-                
-                # 增加限流计数
-                count = await self.increment_rate_limit_counter(client_ip)
-                logger.info(f"IP {client_ip} 触发限流计数: {count}/{self.auto_blacklist_threshold}")
-                
-                return JSONResponse(
-                    status_code=429,
-                    content={"detail": "请求过于频繁，请稍后再试"},
-                    headers=headers
-                )
-                
-        except Exception as e:
-            # 如果Redis出现问题，记录错误但允许请求通过
-            logger.error(f"速率限制检查失败: {str(e)}")
-            return await call_next(request)
\ No newline at end of file
+                    response_headers[name] = value
+            await send(message)
+        
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,107 @@
+from sqlalchemy import Column, Index, Integer, MetaData, Table, inspect
+from sqlalchemy.engine import Engine
+import logging
+import os
+
+from database import Base
+import models  # noqa: F401  确保所有模型已注册到Base.metadata
+
+logger = logging.getLogger(__name__)
+if os.getenv("DEBUG_MODE") == "false":
+    logger.setLevel(logging.WARNING)
+
+def ensure_columns(engine: Engine) -> list:
+    """
+    为已存在的表补齐模型中新增的列
+    只支持可为空的新列（ALTER TABLE ... ADD COLUMN），已有数据的新列值为NULL
+    返回本次添加的列（表名.列名）列表
+    """
+    inspector = inspect(engine)
+    added = []
+    
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if not column.nullable:
+                logger.error(f"无法自动为表 {table.name} 添加非空列 {column.name}，请手动迁移")
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            logger.info(f"为表 {table.name} 添加列 {column.name}")
+            with engine.begin() as conn:
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type} NULL")
+            added.append(f"{table.name}.{column.name}")
+    
+    return added
+
+# 已被新索引取代的索引：{表名: [索引名]}，升级时删除
+OBSOLETE_INDEXES = {
+    # 评论按ID排序，以create_time结尾的索引不能避免排序，由ix_comments_article_approved_id取代
+    "comments": ["ix_comments_article_approved_create_time"],
+}
+
+def drop_obsolete_indexes(engine: Engine) -> list:
+    """
+    删除已被取代的索引，返回本次删除的索引名称列表
+    """
+    inspector = inspect(engine)
+    dropped = []
+    
+    for table_name, index_names in OBSOLETE_INDEXES.items():
+        if not inspector.has_table(table_name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table_name)}
+        for index_name in index_names:
+            if index_name not in existing:
+                continue
+            logger.info(f"删除表 {table_name} 中已被取代的索引 {index_name}")
+            # 使用独立的MetaData构造索引，避免把旧索引重新注册到模型的表上
+            Index(index_name, Table(table_name, MetaData(), Column("id", Integer)).c.id).drop(bind=engine)
+            dropped.append(index_name)
+    
+    return dropped
+
+def ensure_indexes(engine: Engine) -> list:
+    """
+    为已存在的表补齐模型中声明但数据库中缺失的索引
+    create_all只会创建不存在的表，不会为已有表添加新索引
+    返回本次创建的索引名称列表
+    """
+    inspector = inspect(engine)
+    created = []
+    
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            logger.info(f"为表 {table.name} 创建索引 {index.name}")
+            index.create(bind=engine)
+            created.append(index.name)
+    
+    return created
+
+def apply_migrations(engine: Engine) -> None:
+    """
+    启动时对已有数据库执行结构升级
+    """
+    try:
+        # 先补齐列，新索引可能依赖新增的列
+        added = ensure_columns(engine)
+        if added:
+            logger.info(f"数据库结构升级完成，新增列: {', '.join(added)}")
+        created = ensure_indexes(engine)
+        if created:
+            logger.info(f"数据库结构升级完成，新建索引: {', '.join(created)}")
+        dropped = drop_obsolete_indexes(engine)
+        if dropped:
+            logger.info(f"数据库结构升级完成，删除索引: {', '.join(dropped)}")
+    except Exception as e:
+        logger.error(f"数据库结构升级失败: {str(e)}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, Boolean, func
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, Boolean, Index, BigInteger, func
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -21,6 +21,8 @@ class SyncStatus(Base):
     last_sync_time = Column(DateTime, default=datetime.now)
     repo_url = Column(String(255), nullable=True)
     target_dir = Column(String(255), nullable=True)
+    last_synced_commit = Column(String(40), nullable=True)  # 上一次成功同步到的提交SHA
+    sparse_paths = Column(Text, nullable=True)  # 同步该提交时稀疏检出的目录（逗号分隔，空字符串表示全部文件）
 
 # 分类表
 class Category(Base):
@@ -65,12 +67,23 @@ class Article(Base):
     update_time = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     is_published = Column(Boolean, default=True)
     source_file = Column(String(255), nullable=True)  # 源文件路径
+    content_hash = Column(String(64), nullable=True)  # 源文件内容的SHA-256，用于同步时识别未变化的文件
+    source_mtime = Column(BigInteger, nullable=True)  # 源文件修改时间（纳秒）
+    source_size = Column(Integer, nullable=True)  # 源文件大小（字节）
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     
     # 关系
     category = relationship("Category", back_populates="articles")
     tags = relationship("Tag", secondary=article_tag, back_populates="articles")
     comments = relationship("Comment", back_populates="article", cascade="all, delete-orphan")
+    
+    # 组合索引，匹配文章列表的筛选和排序方式，避免filesort
+    __table_args__ = (
+        Index("ix_articles_published_create_time", "is_published", "create_time"),
+        Index("ix_articles_published_view_count", "is_published", "view_count"),
+        Index("ix_articles_published_comment_count", "is_published", "comment_count"),
+        Index("ix_articles_category_published_create_time", "category_id", "is_published", "create_time"),
+    )
 
 # 评论表
 class Comment(Base):
@@ -88,4 +101,11 @@ class Comment(Base):
     
     # 关系
     article = relationship("Article", back_populates="comments")
-    replies = relationship("Comment", backref="parent", remote_side=[id])
\ No newline at end of file
+    # 自引用关系：parent为被回复的评论（多对一），replies为该评论的回复（一对多）
+    parent = relationship("Comment", remote_side=[id], back_populates="replies")
+    replies = relationship("Comment", back_populates="parent")
+    
+    # 组合索引，匹配文章详情中已审核评论的筛选和按ID排序（构建评论树时父评论在前）
+    __table_args__ = (
+        Index("ix_comments_article_approved_id", "article_id", "is_approved", "id"),
+    )
\ No newline at end of file
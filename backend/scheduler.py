@@ -1,5 +1,6 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy.orm import Session
 import logging
 import os
@@ -11,7 +12,7 @@ from datetime import datetime
 from dotenv import load_dotenv
 
 from database import SessionLocal
-from services import github_service
+from services import github_service, view_counter
 
 # 加载环境变量
 load_dotenv()
@@ -134,6 +135,15 @@ def sync_job():
     sync_thread.daemon = True
     sync_thread.start()
 
+def flush_view_counts_job():
+    """
+    定时将缓冲的阅读计数批量落库
+    """
+    try:
+        view_counter.flush_view_counts(SessionLocal)
+    except Exception as e:
+        logger.error(f"阅读计数落库任务执行失败: {str(e)}")
+
 def start_scheduler():
     """
     启动定时任务调度器
@@ -148,6 +158,16 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # 添加阅读计数落库任务
+    scheduler.add_job(
+        flush_view_counts_job,
+        IntervalTrigger(seconds=view_counter.VIEW_COUNT_FLUSH_INTERVAL),
+        id="view_count_flush_job",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    
     # 启动调度器
     scheduler.start()
     logger.info(f"定时任务调度器已启动，同步间隔: {SYNC_INTERVAL}")
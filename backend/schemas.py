@@ -45,16 +45,23 @@ class Comment(BaseModel):
     content: str
     author: str
     createTime: datetime
+    parentId: Optional[int] = None
+    replies: List["Comment"] = []  # 嵌套的回复
     
     class Config:
         orm_mode = True
 
+# 评论的回复引用自身，pydantic v1需要显式解析前向引用
+if not hasattr(Comment, "model_rebuild"):
+    Comment.update_forward_refs()
+
 # 文章列表项模式
 class ArticleListItem(BaseModel):
     articleId: str
     title: str
     author: str
     createTime: datetime
+    updateTime: Optional[datetime] = None
     preview: Optional[str] = None
     coverImage: Optional[str] = None
     viewCount: Optional[int] = 0
@@ -64,6 +71,13 @@ class ArticleListItem(BaseModel):
     class Config:
         orm_mode = True
 
+# 分页信息模式
+class Pagination(BaseModel):
+    total: int
+    pageSize: int
+    currentPage: int
+    totalPages: int
+
 # 文章详情模式
 class ArticleDetail(BaseModel):
     articleId: str
@@ -79,17 +93,19 @@ class ArticleDetail(BaseModel):
     coverImage: Optional[str] = None
     category: Optional[Dict[str, Any]] = None
     comments: List[Comment] = []
+    commentPagination: Optional[Pagination] = None  # 评论的分页信息
     tags: List[str] = []
     
     class Config:
         orm_mode = True
 
-# 分页信息模式
-class Pagination(BaseModel):
-    total: int
+# 游标分页信息模式
+class CursorPagination(BaseModel):
     pageSize: int
-    currentPage: int
-    totalPages: int
+    nextCursor: Optional[str] = None  # 没有下一页时为空
+    hasMore: bool
+    total: Optional[int] = None  # 仅在请求withTotal时返回
+    totalPages: Optional[int] = None
 
 # 文章列表请求模式
 class ArticleListRequest(BaseModel):
@@ -97,6 +113,9 @@ class ArticleListRequest(BaseModel):
     pageSize: int = 10
     currentPage: int = 1
     sortBy: Optional[str] = None  # 可以接受"create_time"、"createTime_desc"等值
+    paginationMode: Optional[str] = None  # "offset"（默认）或"cursor"
+    cursor: Optional[str] = None  # 游标分页时上一页返回的nextCursor
+    withTotal: bool = False  # 游标分页时是否返回总数
     
     class Config:
         # 允许额外字段，避免验证失败
@@ -1,25 +1,61 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, load_only, selectinload
+from sqlalchemy import desc, asc, func, or_, and_
 from typing import List, Tuple, Dict, Any, Optional
+import asyncio
+import base64
+import json
 import logging
+import threading
+import time
 from datetime import datetime
 
 from models import Article, Category, Tag, Comment
+from services import search_service, view_counter
 import os
 logger = logging.getLogger(__name__)
 if os.getenv("DEBUG_MODE") == "false":
     logger.setLevel(logging.WARNING)
+# 分类列表（含文章数量）的进程内缓存，同步完成后失效
+# 多worker部署时其他进程无法感知失效，因此额外设置过期时间兜底
+CATEGORY_CACHE_TTL = int(os.getenv("CATEGORY_CACHE_TTL", "300"))
+_category_cache: Optional[List[Dict]] = None
+_category_cache_time = 0.0
+_category_cache_lock = threading.Lock()
+# 文章详情中每页返回的顶层评论数（每条顶层评论连同其全部回复）
+COMMENT_PAGE_SIZE = int(os.getenv("COMMENT_PAGE_SIZE", "20"))
+COMMENT_MAX_PAGE_SIZE = 100
+# 评论回复的最大嵌套层数，更深的回复与父评论并列显示
+COMMENT_MAX_DEPTH = int(os.getenv("COMMENT_MAX_DEPTH", "3"))
+
+def invalidate_category_cache() -> None:
+    """
+    清空分类列表缓存
+    """
+    global _category_cache
+    with _category_cache_lock:
+        _category_cache = None
+
 def get_categories(db: Session) -> List[Dict]:
     """
     获取所有分类
     """
-    categories = db.query(Category).all()
-    result = []
+    global _category_cache, _category_cache_time
+    with _category_cache_lock:
+        if _category_cache is not None and time.monotonic() - _category_cache_time < CATEGORY_CACHE_TTL:
+            return [dict(item) for item in _category_cache]
+    
+    # 一次分组查询同时获取分类及其文章数量
+    rows = (
+        db.query(Category, func.count(Article.id))
+        .outerjoin(Article, Article.category_id == Category.id)
+        .group_by(Category.id)
+        .order_by(Category.id)
+        .all()
+    )
     
-    for category in categories:
-        # 计算该分类下的文章数量
-        article_count = db.query(func.count(Article.id)).filter(Article.category_id == category.id).scalar()
-        
+    result = []
+    for category, article_count in rows:
         result.append({
             "id": category.id,  # 使用整数ID而不是字符串，匹配测试期望
             "categoryId": str(category.id),  # 保留原字段以向后兼容
@@ -30,7 +66,81 @@ def get_categories(db: Session) -> List[Dict]:
             "articleCount": article_count
         })
     
-    return result
+    with _category_cache_lock:
+        _category_cache = result
+        _category_cache_time = time.monotonic()
+    
+    return [dict(item) for item in result]
+
+def serialize_category_brief(category: Optional[Category]) -> Optional[Dict]:
+    """
+    序列化文章所属分类的简要信息
+    """
+    if not category:
+        return None
+    return {
+        "categoryId": str(category.id),
+        "name": category.name
+    }
+
+def serialize_article_list_item(article: Article) -> Dict:
+    """
+    序列化文章列表项，列表和搜索共用
+    分类需已通过joinedload预加载，否则会触发额外查询
+    """
+    return {
+        "articleId": str(article.id),
+        "title": article.title,
+        "author": article.author,
+        "createTime": article.create_time.isoformat(),
+        "updateTime": article.update_time.isoformat() if article.update_time else None,
+        "preview": article.preview,
+        "viewCount": current_view_count(article.id, article.view_count),
+        "commentCount": article.comment_count,
+        "coverImage": article.cover_image,
+        "category": serialize_category_brief(article.category)
+    }
+
+# 文章列表支持的排序方式：sortBy -> (排序列, 是否降序)
+ARTICLE_SORT_OPTIONS = {
+    "createTime_desc": (Article.create_time, True),
+    "createTime_asc": (Article.create_time, False),
+    "viewCount_desc": (Article.view_count, True),
+    "commentCount_desc": (Article.comment_count, True),
+}
+DEFAULT_ARTICLE_SORT = "createTime_desc"
+
+def _article_list_options():
+    """
+    列表和搜索只加载序列化列表项用到的列，正文和HTML不随列表查询读取
+    分类通过JOIN一次性加载，避免逐篇查询
+    """
+    return (
+        load_only(
+            Article.id, Article.title, Article.author, Article.create_time, Article.update_time,
+            Article.preview, Article.view_count, Article.comment_count, Article.cover_image,
+            Article.category_id
+        ),
+        joinedload(Article.category).load_only(Category.id, Category.name),
+    )
+
+def _count_rows(query) -> int:
+    """
+    直接对文章ID计数，避免query.count()包一层选择全部列的子查询
+    """
+    return query.order_by(None).with_entities(func.count(Article.id)).scalar()
+
+def _published_articles_query(db: Session, category_id: Optional[str] = None):
+    """
+    构建已发布文章的基础查询，只加载列表需要的列
+    """
+    query = db.query(Article).options(*_article_list_options()).filter(Article.is_published == True)
+    
+    # 如果指定了分类，则按分类筛选
+    if category_id:
+        query = query.filter(Article.category_id == int(category_id))
+    
+    return query
 
 def get_article_list(
     db: Session, 
@@ -42,93 +152,194 @@ def get_article_list(
     """
     获取文章列表
     """
-    # 构建查询
-    query = db.query(Article).filter(Article.is_published == True)
-    
-    # 如果指定了分类，则按分类筛选
-    if category_id:
-        query = query.filter(Article.category_id == int(category_id))
-    
-    # 应用排序
-    if sort_by:
-        if sort_by == "createTime_desc":
-            query = query.order_by(desc(Article.create_time))
-        elif sort_by == "createTime_asc":
-            query = query.order_by(asc(Article.create_time))
-        elif sort_by == "viewCount_desc":
-            query = query.order_by(desc(Article.view_count))
-        elif sort_by == "commentCount_desc":
-            query = query.order_by(desc(Article.comment_count))
-    else:
-        # 默认按创建时间降序
-        query = query.order_by(desc(Article.create_time))
+    query = _published_articles_query(db, category_id)
     
-    # 计算总数和总页数
-    total = query.count()
+    # 计算总数和总页数（在排序前统计，避免COUNT子查询中携带无意义的ORDER BY）
+    total = _count_rows(query)
     total_pages = (total + page_size - 1) // page_size
     
+    # 应用排序，未指定时默认按创建时间降序
+    sort_option = ARTICLE_SORT_OPTIONS.get(sort_by or DEFAULT_ARTICLE_SORT)
+    if sort_option:
+        column, descending = sort_option
+        query = query.order_by(desc(column) if descending else asc(column))
+    
     # 分页
     articles = query.offset((current_page - 1) * page_size).limit(page_size).all()
     
     # 格式化结果
-    result = []
-    for article in articles:
-        # 获取分类信息
-        category = None
-        if article.category_id:
-            cat = db.query(Category).filter(Category.id == article.category_id).first()
-            if cat:
-                category = {
-                    "categoryId": str(cat.id),
-                    "name": cat.name
-                }
-        
-        result.append({
-            "articleId": str(article.id),
-            "title": article.title,
-            "author": article.author,
-            "createTime": article.create_time.isoformat(),
-            "preview": article.preview,
-            "viewCount": article.view_count,
-            "commentCount": article.comment_count,
-            "coverImage": article.cover_image,
-            "category": category
-        })
+    result = [serialize_article_list_item(article) for article in articles]
     
     return result, total, total_pages
 
-def get_article_detail(db: Session, article_id: int) -> Optional[Dict]:
+def encode_article_cursor(sort_by: str, article: Article) -> str:
+    """
+    将(排序值, 文章ID)编码为不透明的游标字符串
+    """
+    column, _ = ARTICLE_SORT_OPTIONS[sort_by]
+    value = getattr(article, column.key)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({"s": sort_by, "v": value, "i": article.id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_article_cursor(cursor: str, sort_by: str) -> Tuple[Any, int]:
+    """
+    解析游标，返回(排序值, 文章ID)
+    游标无效或与当前排序方式不匹配时抛出ValueError
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        cursor_sort, value, article_id = payload["s"], payload["v"], int(payload["i"])
+    except Exception:
+        raise ValueError("无效的分页游标")
+    
+    if cursor_sort != sort_by:
+        raise ValueError("分页游标与排序方式不匹配")
+    
+    column, _ = ARTICLE_SORT_OPTIONS[sort_by]
+    try:
+        if column.key == "create_time":
+            value = datetime.fromisoformat(value)
+        else:
+            value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("无效的分页游标")
+    
+    return value, article_id
+
+def get_article_list_by_cursor(
+    db: Session,
+    category_id: Optional[str] = None,
+    page_size: int = 10,
+    cursor: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    with_total: bool = False
+) -> Tuple[List[Dict], Optional[str], Optional[int]]:
+    """
+    基于游标（keyset）分页获取文章列表
+    按(排序列, ID)定位下一页，避免OFFSET扫描；仅在with_total为True时执行COUNT查询
+    返回(文章列表, 下一页游标, 总数)，没有下一页时游标为None，未请求总数时总数为None
+    """
+    if page_size < 1:
+        raise ValueError("分页大小必须大于0")
+    if sort_by not in ARTICLE_SORT_OPTIONS:
+        sort_by = DEFAULT_ARTICLE_SORT
+    column, descending = ARTICLE_SORT_OPTIONS[sort_by]
+    
+    query = _published_articles_query(db, category_id)
+    
+    total = _count_rows(query) if with_total else None
+    
+    # 从游标位置之后开始读取，ID作为相同排序值时的决胜字段
+    if cursor:
+        value, last_id = decode_article_cursor(cursor, sort_by)
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, Article.id < last_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, Article.id > last_id)))
+    
+    if descending:
+        query = query.order_by(desc(column), desc(Article.id))
+    else:
+        query = query.order_by(asc(column), asc(Article.id))
+    
+    # 多取一条用于判断是否还有下一页
+    articles = query.limit(page_size + 1).all()
+    has_more = len(articles) > page_size
+    articles = articles[:page_size]
+    
+    next_cursor = encode_article_cursor(sort_by, articles[-1]) if has_more else None
+    
+    return [serialize_article_list_item(article) for article in articles], next_cursor, total
+
+def serialize_comment(comment) -> Dict:
+    """
+    序列化评论（不含回复），comment可以是Comment对象或包含相同字段的查询结果行
+    """
+    return {
+        "id": comment.id,
+        "content": comment.content,
+        "author": comment.author,
+        "createTime": comment.create_time.isoformat(),
+        "parentId": comment.parent_id,
+        "replies": []
+    }
+
+def build_comment_tree(rows, max_depth: int = None) -> List[Dict]:
+    """
+    由按ID升序排列的评论构建评论树，返回顶层评论列表，每个评论的replies按发表顺序排列
+    通过ID到节点的映射一次遍历完成（O(n)），回复的父评论总是先于回复插入，ID更小
+    顶层评论为第0层，回复最多嵌套max_depth层，更深的回复与其父评论并列放在同一层（parentId仍指向父评论）
+    父评论未审核时其下的回复都不显示
+    """
+    max_depth = max(1, COMMENT_MAX_DEPTH if max_depth is None else max_depth)
+    # 评论ID -> (节点, 层级, 节点所在的列表)
+    entries: Dict[int, Tuple[Dict, int, List[Dict]]] = {}
+    roots: List[Dict] = []
+    for row in rows:
+        node = serialize_comment(row)
+        if row.parent_id is None:
+            depth, siblings = 0, roots
+        else:
+            parent = entries.get(row.parent_id)
+            if parent is None:
+                continue
+            parent_node, parent_depth, parent_siblings = parent
+            if parent_depth < max_depth:
+                depth, siblings = parent_depth + 1, parent_node["replies"]
+            else:
+                depth, siblings = parent_depth, parent_siblings
+        siblings.append(node)
+        entries[row.id] = (node, depth, siblings)
+    return roots
+
+def get_article_comments(
+    db: Session,
+    article_id: int,
+    page_size: int = COMMENT_PAGE_SIZE,
+    current_page: int = 1
+) -> Tuple[List[Dict], int, int]:
+    """
+    获取文章已审核的评论树，按顶层评论分页，返回(当前页的评论树, 顶层评论数, 总页数)
+    审核状态在SQL中筛选，一次查询只读取构建评论树需要的列，不逐层懒加载回复
+    """
+    rows = (
+        db.query(Comment.id, Comment.parent_id, Comment.author, Comment.content, Comment.create_time)
+        .filter(Comment.article_id == article_id, Comment.is_approved == True)
+        .order_by(asc(Comment.id))
+        .all()
+    )
+    threads = build_comment_tree(rows)
+    total = len(threads)
+    total_pages = (total + page_size - 1) // page_size
+    offset = (current_page - 1) * page_size
+    return threads[offset:offset + page_size], total, total_pages
+
+def get_article_detail(
+    db: Session,
+    article_id: int,
+    comment_page: int = 1,
+    comment_page_size: int = COMMENT_PAGE_SIZE
+) -> Optional[Dict]:
     """
     获取文章详情
+    查询数量固定：文章和分类一次JOIN查询，标签一次selectin查询，评论树一次查询
     """
-    article = db.query(Article).filter(Article.id == article_id).first()
+    article = (
+        db.query(Article)
+        .options(joinedload(Article.category), selectinload(Article.tags))
+        .filter(Article.id == article_id)
+        .first()
+    )
     
     if not article:
         return None
     
-    # 获取分类信息
-    category = None
-    if article.category_id:
-        cat = db.query(Category).filter(Category.id == article.category_id).first()
-        if cat:
-            category = {
-                "categoryId": str(cat.id),
-                "name": cat.name
-            }
-    
-    # 获取标签
-    tags = [tag.name for tag in article.tags]
-    
-    # 获取评论
-    comments = []
-    for comment in article.comments:
-        if comment.is_approved:
-            comments.append({
-                "id": comment.id,
-                "content": comment.content,
-                "author": comment.author,
-                "createTime": comment.create_time.isoformat()
-            })
+    comments, comment_total, comment_pages = get_article_comments(
+        db, article.id, page_size=comment_page_size, current_page=comment_page
+    )
     
     return {
         "articleId": str(article.id),
@@ -139,22 +350,71 @@ def get_article_detail(db: Session, article_id: int) -> Optional[Dict]:
         "markdownContent": article.markdown_content,
         "htmlContent": article.html_content,
         "content": article.html_content,  # 添加content字段，匹配测试期望
-        "viewCount": article.view_count,
+        "viewCount": current_view_count(article.id, article.view_count),
         "commentCount": article.comment_count,
         "coverImage": article.cover_image,
-        "category": category,
-        "tags": tags,
-        "comments": comments
+        "category": serialize_category_brief(article.category),
+        "tags": [tag.name for tag in article.tags],
+        "comments": comments,
+        "commentPagination": {
+            "total": comment_total,
+            "pageSize": comment_page_size,
+            "currentPage": comment_page,
+            "totalPages": comment_pages
+        }
     }
 
-def increment_view_count(db: Session, article_id: int) -> None:
+def increment_view_count(article_id: int) -> None:
     """
     增加文章阅读计数
+    计数先写入内存缓冲，由后台任务批量落库
+    """
+    view_counter.view_count_buffer.increment(article_id)
+
+def current_view_count(article_id: int, stored_count: Optional[int]) -> int:
+    """
+    返回包含尚未落库部分的实时阅读数
+    """
+    return (stored_count or 0) + view_counter.view_count_buffer.pending(article_id)
+
+def refresh_view_counts(db: Session, items: List[Dict]) -> None:
+    """
+    使用数据库中的最新阅读数（加上尚未落库的部分）刷新文章数据中的viewCount
+    用于缓存命中时，只查询阅读数一列，无需重新读取文章内容
     """
-    article = db.query(Article).filter(Article.id == article_id).first()
-    if article:
-        article.view_count += 1
-        db.commit()
+    article_ids = [int(item["articleId"]) for item in items]
+    if not article_ids:
+        return
+    
+    stored = dict(db.query(Article.id, Article.view_count).filter(Article.id.in_(article_ids)).all())
+    for item, article_id in zip(items, article_ids):
+        item["viewCount"] = current_view_count(article_id, stored.get(article_id, item.get("viewCount")))
+
+def _load_search_page(
+    db: Session,
+    article_ids: List[int],
+    total: int,
+    page_size: int
+) -> Tuple[List[Dict], int, int]:
+    """
+    按全文索引返回的相关度顺序加载当前页的文章
+    索引中已删除或未发布的文章不返回，并从索引中删除，之后的查询总数与实际结果一致
+    """
+    if not article_ids:
+        return [], total, (total + page_size - 1) // page_size
+    
+    articles = _published_articles_query(db).filter(Article.id.in_(article_ids)).all()
+    articles_by_id = {article.id: article for article in articles}
+    missing = [article_id for article_id in article_ids if article_id not in articles_by_id]
+    if missing:
+        search_service.search_index.remove_articles(missing)
+        total -= len(missing)
+    result = [
+        serialize_article_list_item(articles_by_id[article_id])
+        for article_id in article_ids
+        if article_id in articles_by_id
+    ]
+    return result, total, (total + page_size - 1) // page_size
 
 def search_articles(
     db: Session, 
@@ -164,9 +424,16 @@ def search_articles(
 ) -> Tuple[List[Dict], int, int]:
     """
     搜索文章
+    优先使用全文索引按相关度排序，索引尚未就绪时回退到数据库模糊匹配
     """
+    if search_service.is_ready():
+        article_ids, total = search_service.search_index.search(
+            keyword, limit=page_size, offset=(current_page - 1) * page_size
+        )
+        return _load_search_page(db, article_ids, total, page_size)
+    
     # 构建搜索查询
-    query = db.query(Article).filter(
+    query = db.query(Article).options(*_article_list_options()).filter(
         Article.is_published == True,
         or_(
             Article.title.ilike(f"%{keyword}%"),
@@ -176,35 +443,34 @@ def search_articles(
     ).order_by(desc(Article.create_time))
     
     # 计算总数和总页数
-    total = query.count()
+    total = _count_rows(query)
     total_pages = (total + page_size - 1) // page_size
     
     # 分页
     articles = query.offset((current_page - 1) * page_size).limit(page_size).all()
     
     # 格式化结果
-    result = []
-    for article in articles:
-        # 获取分类信息
-        category = None
-        if article.category_id:
-            cat = db.query(Category).filter(Category.id == article.category_id).first()
-            if cat:
-                category = {
-                    "categoryId": str(cat.id),
-                    "name": cat.name
-                }
-        
-        result.append({
-            "articleId": str(article.id),
-            "title": article.title,
-            "author": article.author,
-            "createTime": article.create_time.isoformat(),
-            "preview": article.preview,
-            "viewCount": article.view_count,
-            "commentCount": article.comment_count,
-            "coverImage": article.cover_image,
-            "category": category
-        })
+    result = [serialize_article_list_item(article) for article in articles]
     
-    return result, total, total_pages
\ No newline at end of file
+    return result, total, total_pages
+
+
+# 异步版本的搜索
+# 其余读取函数由接口通过database.run_db执行，异步会话下使用AsyncSession.run_sync
+
+async def search_articles_async(
+    db: AsyncSession,
+    keyword: str,
+    page_size: int = 10,
+    current_page: int = 1
+) -> Tuple[List[Dict], int, int]:
+    """
+    异步搜索文章，全文索引查询是阻塞的SQLite调用，放入线程中执行
+    """
+    if search_service.is_ready():
+        article_ids, total = await asyncio.to_thread(
+            search_service.search_index.search,
+            keyword, limit=page_size, offset=(current_page - 1) * page_size
+        )
+        return await db.run_sync(_load_search_page, article_ids, total, page_size)
+    return await db.run_sync(search_articles, keyword, page_size, current_page)
@@ -0,0 +1,301 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from config.security_config import SECURITY_CONFIG
+
+logger = logging.getLogger(__name__)
+if os.getenv("DEBUG_MODE") == "false":
+    logger.setLevel(logging.WARNING)
+
+# 响应缓存配置
+# 后端类型：memory（进程内LRU）、redis（多worker共享）、none（关闭缓存）
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+# Redis后端的缓存过期时间（秒），默认与同步间隔一致，作为内容版本失效之外的兜底
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "21600"))
+# 进程内缓存的过期时间（秒）：同步只递增执行同步的worker的内容版本号，其它worker的缓存要等过期才更新，
+# 因此默认较短，并且不超过分类缓存的过期时间（CATEGORY_CACHE_TTL）
+RESPONSE_CACHE_MEMORY_TTL = int(os.getenv("RESPONSE_CACHE_MEMORY_TTL", "60"))
+# uvicorn和gunicorn的worker数，多worker部署时进程内缓存在worker之间不一致
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# Redis后端在本地缓存内容版本号的时间（秒），避免每次请求多一次Redis往返
+RESPONSE_CACHE_VERSION_TTL = float(os.getenv("RESPONSE_CACHE_VERSION_TTL", "5"))
+# Redis后端连接和读写的超时时间（秒），Redis响应变慢时请求最多等待该时间后按未命中处理
+RESPONSE_CACHE_REDIS_TIMEOUT = float(os.getenv("RESPONSE_CACHE_REDIS_TIMEOUT", "0.1"))
+
+
+class MemoryCacheBackend:
+    """
+    进程内LRU缓存后端
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self) -> int:
+        return self._version
+
+    def bump_version(self) -> int:
+        with self._lock:
+            self._version += 1
+            # 旧版本的缓存不会再被访问，直接清空释放内存
+            self._entries.clear()
+            return self._version
+
+
+class RedisCacheBackend:
+    """
+    Redis缓存后端，多个worker共享缓存和内容版本号
+    Redis不可用或超时时按未命中处理，不影响请求
+    """
+
+    VERSION_KEY = "response_cache:version"
+
+    def __init__(self, redis_url: str, redis_password: Optional[str] = None,
+                 timeout: float = RESPONSE_CACHE_REDIS_TIMEOUT):
+        import redis
+        self.client = redis.Redis.from_url(
+            redis_url, password=redis_password, decode_responses=True,
+            socket_timeout=timeout, socket_connect_timeout=timeout
+        )
+        self._version = 0
+        self._version_checked_at = 0.0
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            return self.client.get(f"response_cache:{key}")
+        except Exception as e:
+            logger.error(f"读取Redis响应缓存失败: {str(e)}")
+            return None
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        try:
+            self.client.set(f"response_cache:{key}", value, ex=ttl)
+        except Exception as e:
+            logger.error(f"写入Redis响应缓存失败: {str(e)}")
+
+    def get_version(self) -> int:
+        now = time.monotonic()
+        if now - self._version_checked_at >= RESPONSE_CACHE_VERSION_TTL:
+            try:
+                self._version = int(self.client.get(self.VERSION_KEY) or 0)
+            except Exception as e:
+                logger.error(f"读取Redis缓存版本失败: {str(e)}")
+            self._version_checked_at = now
+        return self._version
+
+    def bump_version(self) -> int:
+        try:
+            self._version = int(self.client.incr(self.VERSION_KEY))
+            self._version_checked_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"更新Redis缓存版本失败: {str(e)}")
+        return self._version
+
+
+class ResponseCache:
+    """
+    接口响应缓存
+    缓存键由内容版本号、接口名称和请求参数组成，同步完成后递增内容版本号即可使全部缓存失效
+    """
+
+    def __init__(self, backend=None, ttl: int = RESPONSE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def make_key(self, endpoint: str, params: Dict[str, Any]) -> str:
+        digest = hashlib.sha1(
+            json.dumps(params, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
+        return f"v{self.backend.get_version()}:{endpoint}:{digest}"
+
+    def get_or_build(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        builder: Callable[[], Any]
+    ) -> Tuple[Any, bool]:
+        """
+        读取缓存的响应数据，未命中时调用builder生成并写入缓存
+        返回(响应数据, 是否命中缓存)；builder返回None时不缓存
+        """
+        if not self.enabled:
+            return builder(), False
+
+        key = self.make_key(endpoint, params)
+        cached = self.backend.get(key)
+        if cached is not None:
+            # 每次命中都反序列化出新对象，调用方可以安全地修改
+            return json.loads(cached), True
+
+        value = builder()
+        if value is not None:
+            self.backend.set(key, json.dumps(value, ensure_ascii=False, default=str), self.ttl)
+        return value, False
+
+    def get_validators(self, endpoint: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        只读取缓存响应的校验信息（ETag等），用于条件请求，无需读取响应体
+        """
+        if not self.enabled:
+            return None
+        cached = self.backend.get(self.make_key(endpoint, params) + ":validators")
+        return json.loads(cached) if cached is not None else None
+
+    def get_or_build_with_validators(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        builder: Callable[[], Any],
+        validators_func: Callable[[Any], Dict[str, Any]]
+    ) -> Tuple[Any, Optional[Dict[str, Any]], bool]:
+        """
+        与get_or_build相同，同时缓存由validators_func根据响应数据生成的校验信息
+        返回(响应数据, 校验信息, 是否命中缓存)；响应数据为None时校验信息也为None
+        """
+        if not self.enabled:
+            value = builder()
+            return value, (validators_func(value) if value is not None else None), False
+
+        key, value, validators = self._read(endpoint, params, validators_func)
+        if value is not None:
+            return value, validators, True
+
+        value = builder()
+        if value is None:
+            return None, None, False
+        return value, self._write(key, value, validators_func), False
+
+    def _read(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        validators_func: Callable[[Any], Dict[str, Any]]
+    ) -> Tuple[str, Any, Optional[Dict[str, Any]]]:
+        """
+        读取缓存的响应数据和校验信息，返回(缓存键, 响应数据, 校验信息)，未命中时响应数据为None
+        """
+        key = self.make_key(endpoint, params)
+        cached = self.backend.get(key)
+        if cached is None:
+            return key, None, None
+        value = json.loads(cached)
+        cached_validators = self.backend.get(key + ":validators")
+        if cached_validators is not None:
+            return key, value, json.loads(cached_validators)
+        return key, value, self._write_validators(key, value, validators_func)
+
+    def _write(self, key: str, value: Any, validators_func: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        写入响应数据和校验信息，返回校验信息
+        """
+        self.backend.set(key, json.dumps(value, ensure_ascii=False, default=str), self.ttl)
+        return self._write_validators(key, value, validators_func)
+
+    def _write_validators(self, key: str, value: Any, validators_func: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+        validators = validators_func(value)
+        self.backend.set(key + ":validators", json.dumps(validators), self.ttl)
+        return validators
+
+    async def get_validators_async(self, endpoint: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        get_validators的异步版本，缓存后端的读取在线程池中执行
+        """
+        if not self.enabled:
+            return None
+        return await run_in_threadpool(self.get_validators, endpoint, params)
+
+    async def get_or_build_with_validators_async(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        builder: Callable[[], Awaitable[Any]],
+        validators_func: Callable[[Any], Dict[str, Any]]
+    ) -> Tuple[Any, Optional[Dict[str, Any]], bool]:
+        """
+        get_or_build_with_validators的异步版本，builder返回awaitable（如通过run_db执行的查询）
+        缓存后端的读写（Redis后端为阻塞调用）和JSON编解码在线程池中执行，不阻塞事件循环
+        """
+        if not self.enabled:
+            value = await builder()
+            if value is None:
+                return None, None, False
+            return value, await run_in_threadpool(validators_func, value), False
+
+        key, value, validators = await run_in_threadpool(self._read, endpoint, params, validators_func)
+        if value is not None:
+            return value, validators, True
+
+        value = await builder()
+        if value is None:
+            return None, None, False
+        validators = await run_in_threadpool(self._write, key, value, validators_func)
+        return value, validators, False
+
+    def invalidate(self) -> None:
+        """
+        递增内容版本号，使所有缓存失效
+        """
+        if self.enabled:
+            version = self.backend.bump_version()
+            logger.info(f"响应缓存已失效，当前内容版本: {version}")
+
+
+def create_response_cache() -> ResponseCache:
+    """
+    根据配置创建响应缓存，Redis后端初始化失败时回退到进程内缓存
+    进程内缓存使用较短的过期时间，多worker部署时记录警告
+    """
+    if RESPONSE_CACHE_BACKEND == "none":
+        return ResponseCache(None)
+    if RESPONSE_CACHE_BACKEND == "redis":
+        try:
+            backend = RedisCacheBackend(SECURITY_CONFIG["redis_url"], SECURITY_CONFIG["redis_password"])
+            logger.info("响应缓存使用Redis后端")
+            return ResponseCache(backend)
+        except Exception as e:
+            logger.error(f"Redis响应缓存初始化失败，回退到进程内缓存: {str(e)}")
+    if WEB_CONCURRENCY > 1:
+        logger.warning(
+            f"{WEB_CONCURRENCY}个worker使用进程内响应缓存，同步后其它worker最多{RESPONSE_CACHE_MEMORY_TTL}秒内"
+            f"仍返回旧内容，多worker部署请设置RESPONSE_CACHE_BACKEND=redis"
+        )
+    return ResponseCache(MemoryCacheBackend(RESPONSE_CACHE_MAX_ENTRIES), ttl=RESPONSE_CACHE_MEMORY_TTL)
+
+
+# 进程内共享的响应缓存实例
+response_cache = create_response_cache()
@@ -1,21 +1,30 @@
 import git
+import hashlib
+import itertools
+import multiprocessing
 import os
 import logging
 import markdown
 import re
+import threading
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from sqlalchemy import bindparam, delete, insert, or_, update
 from sqlalchemy.orm import Session
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional
 
-from models import SyncStatus, Category, Article, Tag
+from models import SyncStatus, Category, Article, Tag, article_tag
 # 修改导入方式，避免循环导入
-from services import article_service
+from services import article_service, search_service, cache_service
+from utils.path_filter import BlacklistMatcher
 
 logger = logging.getLogger(__name__)
 if os.getenv("DEBUG_MODE") == "false":
     logger.setLevel(logging.WARNING)
 # 从环境变量获取黑名单配置
-# 格式：逗号分隔的目录名或文件名，支持通配符
+# 格式：逗号分隔的正则表达式，以glob:开头的条目按gitignore风格的通配符匹配
+# BLACKLIST_KEYWORDS为逗号分隔的关键词，内容包含任一关键词的文章不会同步
 BLACKLIST_DIRS = os.getenv("BLACKLIST_DIRS", "").split(",")
 BLACKLIST_FILES = os.getenv("BLACKLIST_FILES", "").split(",")
 BLACKLIST_KEYWORDS = os.getenv("BLACKLIST_KEYWORDS", "").split(",")
@@ -25,23 +34,51 @@ BLACKLIST_DIRS = [d.strip() for d in BLACKLIST_DIRS if d.strip()]
 BLACKLIST_FILES = [f.strip() for f in BLACKLIST_FILES if f.strip()]
 BLACKLIST_KEYWORDS = [k.strip() for k in BLACKLIST_KEYWORDS if k.strip()]
 
+# 黑名单在导入时一次性编译，解析工作进程导入本模块时同样按环境变量编译
+blacklist_matcher = BlacklistMatcher(BLACKLIST_DIRS, BLACKLIST_FILES, BLACKLIST_KEYWORDS)
+
+# 仓库克隆和拉取配置，用于缩短大型内容仓库的首次同步和容器冷启动时间
+# 克隆和拉取的提交深度，0表示完整历史
+GIT_CLONE_DEPTH = int(os.getenv("GIT_CLONE_DEPTH", "0"))
+# 部分克隆过滤器，例如blob:none（只下载检出和比较时需要的文件内容）
+GIT_CLONE_FILTER = os.getenv("GIT_CLONE_FILTER", "").strip()
+# 只克隆和拉取单个分支，GIT_BRANCH为空时使用远程仓库的默认分支
+GIT_SINGLE_BRANCH = os.getenv("GIT_SINGLE_BRANCH", "False").lower() in ("true", "1", "t")
+GIT_BRANCH = os.getenv("GIT_BRANCH", "").strip()
+# 稀疏检出的目录（逗号分隔，相对仓库根目录），为空时检出全部文件
+GIT_SPARSE_PATHS = [path.strip().strip("/") for path in os.getenv("GIT_SPARSE_PATHS", "").split(",") if path.strip()]
+
+# Markdown渲染配置
+# 同步时将Markdown渲染为HTML保存到html_content，关闭后html_content为空，由前端渲染
+MARKDOWN_RENDER = os.getenv("MARKDOWN_RENDER", "True").lower() in ("true", "1", "t")
+# 渲染使用的扩展（逗号分隔），extra包含表格、围栏代码块等
+MARKDOWN_EXTENSIONS = [
+    name.strip() for name in os.getenv("MARKDOWN_EXTENSIONS", "extra,codehilite,toc").split(",") if name.strip()
+]
+
+# 同步流水线配置
+# 解析阶段的执行方式：process（多进程，默认）、thread（多线程）、serial（在写入线程中串行解析）
+SYNC_EXECUTOR = os.getenv("SYNC_EXECUTOR", "process").lower()
+# 解析阶段的并发数，默认为CPU核数
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "0")) or os.cpu_count() or 1
+# 每个解析任务包含的文件数，减少进程间通信次数
+SYNC_PARSE_CHUNK_SIZE = int(os.getenv("SYNC_PARSE_CHUNK_SIZE", "50"))
+# 写入阶段每批提交的文章数
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "200"))
+
 def is_blacklisted(path: str, content: str = None) -> bool:
     """
-    检查路径是否在黑名单中
+    检查路径（以及传入的文件内容）是否在黑名单中
     """
-    # 检查目录是否在黑名单中
-    for blacklist_dir in BLACKLIST_DIRS:
-        # 支持通配符匹配
-        if re.search(blacklist_dir, path):
-            logger.info(f"目录 {path} 在黑名单中，已跳过")
-            return True
+    matched = blacklist_matcher.match_path(path)
+    if matched:
+        logger.debug(f"{path} 匹配黑名单 {matched}，已跳过")
+        return True
     
-    # 检查文件是否在黑名单中
-    file_name = os.path.basename(path)
-    for blacklist_file in BLACKLIST_FILES:
-        # 支持通配符匹配
-        if re.search(blacklist_file, file_name):
-            logger.info(f"文件 {file_name} 在黑名单中，已跳过")
+    if content is not None:
+        matched = blacklist_matcher.match_content(content)
+        if matched:
+            logger.debug(f"{path} 包含黑名单关键词 {matched}，已跳过")
             return True
     
     return False
@@ -55,6 +92,9 @@ def sync_repository(repo_url: str, target_dir: str, db: Session) -> None:
     logger.info(f"开始同步任务，时间: {sync_start_time.strftime('%Y-%m-%d %H:%M:%S')}")
     
     try:
+        # 在状态被更新为运行中之前读取上一次成功同步到的提交
+        last_commit = get_last_synced_commit(db, repo_url)
+        
         # 更新同步状态为运行中
         update_sync_status(db, "running", f"开始从 {repo_url} 同步数据", repo_url, target_dir)
         
@@ -96,8 +136,7 @@ def sync_repository(repo_url: str, target_dir: str, db: Session) -> None:
             
             while retry_count < max_retries:
                 try:
-                    # GitPython的pull方法
-                    pull_info = origin.pull()
+                    pull_repository(repo, origin)
                     logger.info("拉取更新完成")
                     break  # 成功则跳出循环
                 except git.GitCommandError as e:
@@ -133,10 +172,11 @@ def sync_repository(repo_url: str, target_dir: str, db: Session) -> None:
                     repo = git.Repo.clone_from(
                         auth_url, 
                         target_dir, 
-                        progress=progress_printer
+                        progress=progress_printer,
+                        **get_clone_options()
                     )
                     logger.info("克隆完成")
-                    return repo
+                    break
                 except git.GitCommandError as e:
                     retry_count += 1
                     if "Failed to connect" in str(e) and retry_count < max_retries:
@@ -151,66 +191,22 @@ def sync_repository(repo_url: str, target_dir: str, db: Session) -> None:
                     logger.error(f"克隆操作失败: {str(e)}")
                     raise
         
-        # 获取变更文件列表
-        changed_files = []
+        # 按配置调整稀疏检出的目录
+        apply_sparse_checkout(repo)
         
-        # 如果是已存在的仓库，获取变更文件列表
-        if os.path.exists(os.path.join(target_dir, ".git")):
-            try:
-                repo = git.Repo(target_dir)
-                # 获取最近一次拉取的变更
-                # 使用git diff获取变更文件列表
-                # HEAD@{1}表示上一次HEAD的位置，HEAD表示当前HEAD的位置
-                diff_result = repo.git.diff("HEAD@{1}", "HEAD", name_only=True)
-                
-                if diff_result:
-                    # 将变更文件列表转换为绝对路径
-                    changed_files = [os.path.join(target_dir, file_path) for file_path in diff_result.split('\n')]
-                    logger.info(f"检测到{len(changed_files)}个变更文件")
-            except Exception as e:
-                logger.error(f"获取变更文件列表失败: {str(e)}")
-                # 如果获取变更文件列表失败，则回退到全量扫描
-                logger.info("回退到全量扫描模式")
-                process_directory(target_dir, db)
-                return
-        
-        # 如果是新克隆的仓库或没有检测到变更，则进行全量扫描
-        if not changed_files:
-            logger.info("新仓库或没有变更，执行全量扫描")
-            process_directory(target_dir, db)
+        # 根据上一次成功同步到的提交计算变更，只处理变化的文件
+        head_commit = repo.head.commit.hexsha
+        if last_commit == head_commit:
+            logger.info(f"仓库没有新的提交（{head_commit[:8]}），无需处理")
+            failed_files = 0
+        elif last_commit and ensure_commit(repo, last_commit):
+            logger.info(f"增量同步: {last_commit[:8]} -> {head_commit[:8]}")
+            failed_files = sync_changed_files(repo, target_dir, db, last_commit, head_commit)
         else:
-            # 只处理变更的文件
-            logger.info(f"开始处理{len(changed_files)}个变更文件")
-            for file_path in changed_files:
-                # 只处理.md文件，并且不在黑名单中
-                if file_path.endswith(".md") and os.path.exists(file_path) and not is_blacklisted(file_path):
-                    # 获取文件所在目录
-                    dir_path = os.path.dirname(file_path)
-                    # 获取目录名作为分类名
-                    dir_name = os.path.basename(dir_path)
-                    
-                    # 如果是根目录，使用"未分类"作为分类名
-                    if dir_name == os.path.basename(target_dir):
-                        category_name = "未分类"
-                        category_slug = "uncategorized"
-                    else:
-                        category_name = dir_name
-                        category_slug = slugify(dir_name)
-                    
-                    # 检查分类是否已存在，不存在则创建
-                    category = db.query(Category).filter(Category.slug == category_slug).first()
-                    if not category:
-                        category = Category(
-                            name=category_name,
-                            slug=category_slug,
-                            description=f"{category_name}分类下的文章"
-                        )
-                        db.add(category)
-                        db.commit()
-                        db.refresh(category)
-                    
-                    # 处理Markdown文件
-                    process_markdown_file(file_path, category.id, db)
+            # 首次同步、仓库地址变化或上次同步的提交已不存在时执行全量扫描
+            logger.info("没有可用的上次同步提交，执行全量扫描")
+            failed_files = process_directory(target_dir, db)
+            remove_missing_articles(db, target_dir)
         
         # 计算同步总耗时
         sync_end_time = datetime.now()
@@ -219,7 +215,12 @@ def sync_repository(repo_url: str, target_dir: str, db: Session) -> None:
         # 更新同步状态为完成
         completion_message = f"同步完成，总耗时: {sync_elapsed_time:.2f} 秒"
         logger.info(completion_message)
-        update_sync_status(db, "completed", completion_message)
+        if failed_files:
+            # 有文件处理失败时不记录新的提交，下次同步重新处理这些变更
+            logger.warning(f"{failed_files} 个文件处理失败，下次同步将重新处理本次的变更")
+            update_sync_status(db, "completed", f"{completion_message}，{failed_files} 个文件处理失败")
+        else:
+            update_sync_status(db, "completed", completion_message, commit=head_commit)
         
     except Exception as e:
         # 计算同步失败时的总耗时
@@ -235,10 +236,21 @@ def sync_repository(repo_url: str, target_dir: str, db: Session) -> None:
         
         update_sync_status(db, "failed", error_message)
         raise
+    finally:
+        # 无论同步成功与否，数据都可能已经变化，清空分类缓存并递增响应缓存的内容版本
+        article_service.invalidate_category_cache()
+        cache_service.response_cache.invalidate()
 
-def update_sync_status(db: Session, status: str, message: str, repo_url: str = None, target_dir: str = None) -> None:
+def update_sync_status(
+    db: Session,
+    status: str,
+    message: str,
+    repo_url: str = None,
+    target_dir: str = None,
+    commit: str = None
+) -> None:
     """
-    更新同步状态
+    更新同步状态，commit为本次成功同步到的提交SHA
     """
     # 查找最新的同步状态记录
     sync_status = db.query(SyncStatus).order_by(SyncStatus.id.desc()).first()
@@ -254,6 +266,9 @@ def update_sync_status(db: Session, status: str, message: str, repo_url: str = N
             sync_status.repo_url = repo_url
         if target_dir:
             sync_status.target_dir = target_dir
+        if commit:
+            sync_status.last_synced_commit = commit
+            sync_status.sparse_paths = get_sparse_paths_key()
     else:
         # 创建新记录
         sync_status = SyncStatus(
@@ -261,7 +276,9 @@ def update_sync_status(db: Session, status: str, message: str, repo_url: str = N
             message=message,
             last_sync_time=current_time,
             repo_url=repo_url,
-            target_dir=target_dir
+            target_dir=target_dir,
+            last_synced_commit=commit,
+            sparse_paths=get_sparse_paths_key() if commit else None
         )
         db.add(sync_status)
     
@@ -277,7 +294,9 @@ def update_sync_status(db: Session, status: str, message: str, repo_url: str = N
                 message=f"{message} (状态更新时出错: {str(e)})",
                 last_sync_time=current_time,
                 repo_url=repo_url,
-                target_dir=target_dir
+                target_dir=target_dir,
+                last_synced_commit=commit,
+                sparse_paths=get_sparse_paths_key() if commit else None
             )
             db.add(new_status)
             db.commit()
@@ -299,181 +318,842 @@ def get_sync_status(db: Session) -> Dict:
         "status": sync_status.status,
         "message": sync_status.message,
         "last_sync_time": sync_status.last_sync_time,
-        "repo_url": sync_status.repo_url
+        "repo_url": sync_status.repo_url,
+        "last_synced_commit": sync_status.last_synced_commit
     }
 
-def process_directory(directory: str, db: Session) -> None:
+
+def get_sparse_paths_key() -> str:
     """
-    处理目录，将文件夹作为分类，Markdown文件作为文章
+    当前稀疏检出配置的规范形式，与同步状态中记录的sparse_paths比较
     """
-    logger.info(f"处理目录: {directory}")
-    
-    # 跳过.git目录和黑名单目录
-    if ".git" in directory or ".ignore" in directory or directory == "" or is_blacklisted(directory):
-        logger.debug(f"跳过目录: {directory}")
-        return
-        
-    # 记录开始处理时间
-    start_time = datetime.now()
+    return ",".join(sorted(set(GIT_SPARSE_PATHS)))
+
+
+def get_last_synced_commit(db: Session, repo_url: str) -> Optional[str]:
+    """
+    返回上一次成功同步到的提交SHA，没有记录或仓库地址已变化时返回None
+    稀疏检出的目录变化时同样返回None：新加入目录中的文件不在两个提交的差异中，
+    移出目录的文章也不会被删除，只能由全量扫描处理
+    """
+    sync_status = db.query(SyncStatus).order_by(SyncStatus.id.desc()).first()
+    if not sync_status or not sync_status.last_synced_commit or sync_status.repo_url != repo_url:
+        return None
+    # 升级前的记录没有sparse_paths，按检出全部文件处理
+    if (sync_status.sparse_paths or "") != get_sparse_paths_key():
+        logger.info("稀疏检出的目录已变化，忽略上次同步的提交")
+        return None
+    return sync_status.last_synced_commit
+
+
+def has_commit(repo: git.Repo, sha: str) -> bool:
+    """
+    判断本地仓库中是否存在该提交（reflog过期或浅克隆时可能不存在）
+    """
+    try:
+        repo.git.cat_file("-e", f"{sha}^{{commit}}")
+        return True
+    except git.GitCommandError:
+        return False
+
+
+def ensure_commit(repo: git.Repo, sha: str) -> bool:
+    """
+    确保本地仓库中存在该提交，浅克隆或新容器中缺少时单独拉取这一个提交
+    无法获取时返回False，由调用方回退到全量扫描
+    """
+    if has_commit(repo, sha):
+        return True
+    try:
+        logger.info(f"本地缺少上次同步的提交 {sha[:8]}，尝试从远程拉取")
+        repo.git.fetch("origin", sha, depth=1)
+    except git.GitCommandError as e:
+        logger.warning(f"拉取提交 {sha[:8]} 失败: {str(e)}")
+        return False
+    return has_commit(repo, sha)
+
+
+def get_clone_options() -> Dict:
+    """
+    根据配置生成git clone的参数（深度、部分克隆过滤器、单分支、稀疏检出）
+    """
+    options = {}
+    if GIT_CLONE_DEPTH > 0:
+        options["depth"] = GIT_CLONE_DEPTH
+    if GIT_CLONE_FILTER:
+        options["filter"] = GIT_CLONE_FILTER
+    if GIT_SINGLE_BRANCH:
+        options["single_branch"] = True
+    if GIT_BRANCH:
+        options["branch"] = GIT_BRANCH
+    if GIT_SPARSE_PATHS:
+        # 克隆时只检出根目录文件，随后由apply_sparse_checkout设置需要的目录
+        options["sparse"] = True
+    return options
+
+
+def pull_repository(repo: git.Repo, origin) -> None:
+    """
+    拉取远程更新
+    部分克隆的过滤器由clone写入仓库配置，单分支克隆只配置了该分支的refspec，拉取时自动沿用
+    """
+    if GIT_CLONE_DEPTH > 0:
+        # 浅克隆的历史不完整，git pull合并时可能找不到共同祖先，改为按深度拉取后重置到远程分支
+        branch = GIT_BRANCH or get_default_branch(repo)
+        repo.git.fetch("origin", branch, depth=GIT_CLONE_DEPTH)
+        repo.git.reset("--hard", "FETCH_HEAD")
+    elif GIT_BRANCH:
+        origin.pull(GIT_BRANCH)
+    else:
+        origin.pull()
+
+
+def get_default_branch(repo: git.Repo) -> str:
+    """
+    未配置GIT_BRANCH时确定要拉取的分支：当前检出的分支；
+    HEAD处于分离状态时（例如手动检出了某个提交）使用远程仓库的默认分支
+    """
+    try:
+        return repo.active_branch.name
+    except TypeError:
+        pass
+    # 克隆时记录的origin/HEAD，单分支克隆等情况下可能不存在
+    try:
+        return repo.git.symbolic_ref("--short", "refs/remotes/origin/HEAD").split("/", 1)[1]
+    except git.GitCommandError:
+        pass
+    try:
+        for line in repo.git.ls_remote("--symref", "origin", "HEAD").splitlines():
+            if line.startswith("ref: refs/heads/"):
+                return line[len("ref: refs/heads/"):].split("\t", 1)[0]
+    except git.GitCommandError as e:
+        logger.warning(f"查询远程仓库默认分支失败: {str(e)}")
+    raise ValueError("工作目录的HEAD处于分离状态，且无法确定远程仓库的默认分支，请设置GIT_BRANCH")
+
+
+def apply_sparse_checkout(repo: git.Repo) -> None:
+    """
+    按GIT_SPARSE_PATHS设置稀疏检出的目录；配置被清空时恢复检出全部文件
+    """
+    if GIT_SPARSE_PATHS:
+        repo.git.sparse_checkout("set", *GIT_SPARSE_PATHS)
+    elif repo.config_reader().get_value("core", "sparseCheckout", False) is True:
+        repo.git.sparse_checkout("disable")
+
+
+def get_changed_files(repo: git.Repo, old_commit: str, new_commit: str) -> Tuple[List[str], List[str]]:
+    """
+    使用git diff --name-status比较两个提交
+    返回(新增、修改或重命名后的文件路径, 被删除或重命名前的文件路径)，均为相对仓库根目录的路径
+    """
+    # -z输出以NUL分隔且不转义路径，中文文件名可以原样解析
+    output = repo.git.diff("--name-status", "-M", "-z", old_commit, new_commit)
+    tokens = output.split("\0")
+    changed, deleted = [], []
+    i = 0
+    while i < len(tokens) and tokens[i]:
+        status = tokens[i]
+        if status[0] in ("R", "C"):
+            # 重命名和复制：状态后依次是原路径和新路径
+            old_path, new_path = tokens[i + 1], tokens[i + 2]
+            if status[0] == "R":
+                deleted.append(old_path)
+            changed.append(new_path)
+            i += 3
+        else:
+            if status[0] == "D":
+                deleted.append(tokens[i + 1])
+            else:
+                changed.append(tokens[i + 1])
+            i += 2
+    return changed, deleted
+
+
+def is_syncable_file(root: str, file_path: str) -> bool:
+    """
+    判断变更的文件是否需要同步：Markdown文件，且自身和所在目录都不在跳过范围内
+    """
+    if not file_path.endswith(".md") or is_blacklisted(file_path):
+        return False
+    directory = os.path.dirname(file_path)
+    while os.path.normpath(directory) != os.path.normpath(root):
+        if _is_skipped_directory(directory):
+            return False
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            break
+        directory = parent
+    return True
+
+
+def sync_changed_files(repo: git.Repo, target_dir: str, db: Session, old_commit: str, new_commit: str) -> int:
+    """
+    增量同步两个提交之间的变更：新增和修改的文件重新写入，删除的文件对应的文章被删除，
+    重命名的文件按新路径写入（标题不变时更新同一篇文章），原路径上残留的文章被删除
+    返回处理失败的文件数
+    """
+    changed, deleted = get_changed_files(repo, old_commit, new_commit)
+    logger.info(f"检测到 {len(changed)} 个新增或修改的文件，{len(deleted)} 个删除或移动的文件")
     
-    # 获取目录名作为分类名
-    dir_name = os.path.basename(directory)
+    files = []
+    for relative_path in changed:
+        file_path = os.path.join(target_dir, relative_path)
+        if os.path.exists(file_path) and is_syncable_file(target_dir, file_path):
+            files.append((file_path,) + get_category_for_directory(os.path.dirname(file_path), target_dir))
     
-    # 如果是根目录，使用"未分类"作为分类名
-    if dir_name == os.path.basename(os.path.dirname(directory)):
-        category_name = "未分类"
-        category_slug = "uncategorized"
-    else:
-        category_name = dir_name
-        category_slug = slugify(dir_name)
-    
-    # 检查分类是否已存在，不存在则创建
-    category = db.query(Category).filter(Category.slug == category_slug).first()
-    if not category:
-        category = Category(
-            name=category_name,
-            slug=category_slug,
-            description=f"{category_name}分类下的文章"
+    writer, parse_errors = ingest_files(db, files, target_dir)
+    removed = delete_articles_by_source(
+        db, [os.path.join(target_dir, relative_path) for relative_path in deleted if relative_path.endswith(".md")]
+    )
+    logger.info(
+        f"增量同步统计 - 写入文章: {writer.written}，内容未变化: {writer.unchanged}，删除文章: {removed}，"
+        f"解析失败: {parse_errors}，写入失败: {writer.failed}"
+    )
+    return parse_errors + writer.failed
+
+def get_category_for_directory(directory: str, root: str) -> Tuple[str, str]:
+    """
+    根据文件所在目录返回(分类名称, 分类slug)，仓库根目录下的文件归入“未分类”
+    """
+    if os.path.normpath(directory) == os.path.normpath(root):
+        return "未分类", "uncategorized"
+    dir_name = os.path.basename(os.path.normpath(directory))
+    return dir_name, slugify(dir_name)
+
+
+def ensure_categories(db: Session, categories: Dict[str, str]) -> Dict[str, int]:
+    """
+    确保分类存在，categories为{分类slug: 分类名称}，返回{分类slug: 分类ID}
+    已有分类一次性查出，缺少的分类批量插入（由调用方提交）
+    """
+    if not categories:
+        return {}
+    category_ids = dict(
+        db.query(Category.slug, Category.id).filter(Category.slug.in_(list(categories))).all()
+    )
+    missing = [slug for slug in categories if slug not in category_ids]
+    if missing:
+        db.execute(
+            insert(Category.__table__),
+            [{"name": categories[slug], "slug": slug, "description": f"{categories[slug]}分类下的文章"}
+             for slug in missing]
         )
-        db.add(category)
-        db.commit()
-        db.refresh(category)
-    
-    # 遍历目录中的所有文件和子目录
-    items = os.listdir(directory)
-    total_items = len(items)
-    logger.info(f"目录 {directory} 中共有 {total_items} 个项目待处理")
+        category_ids.update(
+            db.query(Category.slug, Category.id).filter(Category.slug.in_(missing)).all()
+        )
+    return category_ids
+
+
+def walk_markdown_files(root: str) -> Iterator[Tuple[str, str, str]]:
+    """
+    流水线的遍历阶段：遍历目录树，产出(文件路径, 分类名称, 分类slug)
+    跳过.git、.ignore和黑名单中的目录（不再深入其子目录）以及黑名单中的文件
+    """
+    for directory, dir_names, file_names in os.walk(root):
+        # 原地修改dir_names，os.walk不会进入被移除的子目录
+        dir_names[:] = sorted(
+            name for name in dir_names
+            if not _is_skipped_directory(os.path.join(directory, name))
+        )
+        category_name, category_slug = get_category_for_directory(directory, root)
+        for file_name in sorted(file_names):
+            if not file_name.endswith(".md"):
+                continue
+            file_path = os.path.join(directory, file_name)
+            if is_blacklisted(file_path):
+                continue
+            yield file_path, category_name, category_slug
+
+
+def _is_skipped_directory(path: str) -> bool:
+    return ".git" in path or ".ignore" in path or is_blacklisted(path)
+
+
+# 每个解析进程/线程复用一个Markdown实例，避免每篇文章重新加载扩展（Markdown实例不是线程安全的）
+_renderer_local = threading.local()
+
+
+def render_markdown(content: str) -> str:
+    """
+    将Markdown渲染为HTML
+    代码高亮不猜测语言：未标注语言的代码块不高亮，pygments逐个词法分析器试探非常耗时
+    """
+    renderer = getattr(_renderer_local, "renderer", None)
+    if renderer is None:
+        extension_configs = {"codehilite": {"guess_lang": False}} if "codehilite" in MARKDOWN_EXTENSIONS else {}
+        renderer = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS, extension_configs=extension_configs)
+        _renderer_local.renderer = renderer
+    return renderer.reset().convert(content)
+
+
+def parse_markdown_file(file_path: str, rendered_hash: str = None) -> Dict:
+    """
+    流水线的解析阶段：读取并解析Markdown文件，不访问数据库
+    返回可在进程间传递的字典，包含标题、slug、预览、正文、HTML、标签名称，
+    以及用于变更检测的内容哈希和文件修改时间、大小
+    rendered_hash为数据库中已渲染HTML对应的内容哈希，与文件一致时不再渲染，html_content为None
+    """
+    stat = os.stat(file_path)
+    with open(file_path, "rb") as f:
+        raw = f.read()
+    content_hash = hashlib.sha256(raw).hexdigest()
+    # 与文本模式读取一致，统一换行符
+    content = raw.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
     
-    processed_dirs = 0
-    processed_files = 0
-    skipped_items = 0
+    # 提取标题（使用第一个#标记的行作为标题）
+    title_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
+    if title_match:
+        title = title_match.group(1).strip()
+    else:
+        # 如果没有找到标题，使用文件名作为标题
+        title = os.path.splitext(os.path.basename(file_path))[0]
     
-    for index, item in enumerate(items):
-        item_path = os.path.join(directory, item)
-        
-        # 每处理10个项目或处理到最后一个项目时输出进度
-        if (index + 1) % 10 == 0 or index + 1 == total_items:
-            logger.info(f"目录 {directory} 处理进度: {index + 1}/{total_items} ({(index + 1) / total_items * 100:.1f}%)")
-        
-        # 跳过黑名单项
-        if is_blacklisted(item_path):
-            skipped_items += 1
-            continue
-        
-        if os.path.isdir(item_path):
-            # 递归处理子目录
-            processed_dirs += 1
-            process_directory(item_path, db)
-        elif item.endswith(".md"):
-            # 处理Markdown文件
-            processed_files += 1
-            process_markdown_file(item_path, category.id, db)
+    # 提取预览（使用前200个字符作为预览）
+    preview = re.sub(r'^#\s+.+$', '', content, count=1, flags=re.MULTILINE).strip()[:200] + "..."
     
-    # 计算处理耗时
-    end_time = datetime.now()
-    elapsed_time = (end_time - start_time).total_seconds()
+    # 提取标签（使用文件中的#标签格式），忽略太短的标签，去重并保持出现顺序
+    tag_names = list(dict.fromkeys(
+        tag_name for tag_name in re.findall(r'#(\w+)', content) if len(tag_name) > 2
+    ))
     
-    logger.info(f"目录 {directory} 处理完成，耗时 {elapsed_time:.2f} 秒")
-    logger.info(f"处理统计 - 子目录: {processed_dirs}，文件: {processed_files}，跳过项目: {skipped_items}")
+    blocked_keyword = blacklist_matcher.match_content(content)
+    if blocked_keyword or not MARKDOWN_RENDER:
+        html_content = ""
+    elif content_hash == rendered_hash:
+        html_content = None
+    else:
+        html_content = render_markdown(content)
     
+    return {
+        "source_file": file_path,
+        "title": title,
+        "slug": slugify(title),
+        "preview": preview,
+        "markdown_content": content,
+        "html_content": html_content,
+        "tag_names": tag_names,
+        "content_hash": content_hash,
+        "source_mtime": stat.st_mtime_ns,
+        "source_size": stat.st_size,
+        # 内容包含黑名单关键词时不写入数据库
+        "blocked_keyword": blocked_keyword,
+    }
 
-def process_markdown_file(file_path: str, category_id: int, db: Session) -> None:
+
+def _parse_chunk(items: List[Tuple[str, Optional[str]]]) -> List[Tuple[Optional[Dict], Optional[str]]]:
     """
-    处理Markdown文件，提取内容并保存到数据库
+    在工作进程/线程中解析一组(文件路径, 已渲染的内容哈希)，返回(解析结果, 错误信息)列表
+    错误信息交给主进程记录日志，避免工作进程的日志配置不同而丢失
     """
+    results = []
+    for file_path, rendered_hash in items:
+        try:
+            results.append((parse_markdown_file(file_path, rendered_hash), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def _create_parse_executor(kind: str, workers: int) -> Executor:
+    if kind == "process":
+        try:
+            # 使用spawn启动工作进程，避免在带有后台线程的进程中fork
+            return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        except (OSError, NotImplementedError) as e:
+            logger.warning(f"无法创建解析进程池，改用线程池: {str(e)}")
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync-parse")
+
+
+def parse_markdown_files(
+    file_paths: List[str],
+    executor_kind: str = None,
+    workers: int = None,
+    rendered_hashes: Dict[str, str] = None
+) -> Iterator[Tuple[str, Optional[Dict], Optional[str]]]:
+    """
+    并行解析文件，按输入顺序产出(文件路径, 解析结果, 错误信息)
+    文件按块提交给进程池/线程池，同时在途的块数量有上限，写入阶段消费结果的同时后续文件继续解析；
+    HTML渲染同样在工作进程中完成，rendered_hashes中内容哈希未变化的文件不重新渲染
+    """
+    executor_kind = executor_kind or SYNC_EXECUTOR
+    workers = workers or SYNC_WORKERS
+    rendered_hashes = rendered_hashes or {}
+    items = [(file_path, rendered_hashes.get(file_path)) for file_path in file_paths]
+    chunks = [items[i:i + SYNC_PARSE_CHUNK_SIZE] for i in range(0, len(items), SYNC_PARSE_CHUNK_SIZE)]
     
-    start_time = datetime.now()
-    logger.debug(f"开始处理文件: {file_path}")
+    # 文件较少或配置为串行时无需启动工作池
+    if executor_kind == "serial" or workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            for (file_path, _), (parsed, error) in zip(chunk, _parse_chunk(chunk)):
+                yield file_path, parsed, error
+        return
     
-    try:
-        # 读取文件内容
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
+    with _create_parse_executor(executor_kind, workers) as executor:
+        chunk_iter = iter(chunks)
+        pending = deque()
+        for chunk in itertools.islice(chunk_iter, workers * 2):
+            pending.append((chunk, executor.submit(_parse_chunk, chunk)))
+        while pending:
+            chunk, future = pending.popleft()
+            next_chunk = next(chunk_iter, None)
+            if next_chunk is not None:
+                pending.append((next_chunk, executor.submit(_parse_chunk, next_chunk)))
+            for (file_path, _), (parsed, error) in zip(chunk, future.result()):
+                yield file_path, parsed, error
+
+
+def slug_with_path_suffix(slug: str, source_file: str) -> str:
+    """
+    在slug后追加由源文件路径计算的短哈希，用于不同文件的标题相同（例如多个index.md）时区分文章，
+    同一文件每次同步得到的slug相同
+    """
+    suffix = hashlib.sha1(source_file.encode("utf-8")).hexdigest()[:8]
+    return f"{slug[:200 - len(suffix) - 1]}-{suffix}"
+
+
+def tag_key(tag_name: str) -> str:
+    """
+    标签的比较键，与数据库排序规则一致，忽略大小写
+    """
+    return tag_name.casefold()
+
+
+class ArticleWriter:
+    """
+    流水线的写入阶段，在调用线程中使用同一个数据库会话
+    解析结果每累积batch_size篇批量写入一次：标签名称到ID的映射在首次写入时一次性加载，
+    每批只执行固定数量的批量INSERT/UPDATE语句并提交一次事务，然后批量更新全文索引；
+    内容哈希与数据库一致的文章只更新文件修改时间和大小（HTML为空时补写HTML），不改写内容和update_time；
+    批次提交失败时回滚并逐篇重试，只丢弃出错的文章
+    """
+
+    # 内容变化时整体更新的列
+    CONTENT_COLUMNS = (
+        "title", "slug", "markdown_content", "html_content", "preview", "source_file", "category_id",
+        "content_hash", "source_mtime", "source_size",
+    )
+
+    def __init__(self, db: Session, batch_size: int = None):
+        self.db = db
+        self.batch_size = batch_size or SYNC_BATCH_SIZE
+        self.written = 0
+        self.unchanged = 0
+        self.failed = 0
+        self._pending: List[Tuple[Dict, int]] = []
+        self._tag_ids: Optional[Dict[str, int]] = None
+
+    def add(self, parsed: Dict, category_id: int) -> None:
+        self._pending.append((parsed, category_id))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        if self._tag_ids is None:
+            self._tag_ids = {tag_key(name): tag_id for name, tag_id in self.db.query(Tag.name, Tag.id).all()}
         
-        file_size = os.path.getsize(file_path) / 1024  # KB
-        logger.debug(f"文件大小: {file_size:.2f} KB, 内容长度: {len(content)} 字符")
+        try:
+            indexed, unpublished, unchanged = self._write_batch(pending)
+        except Exception as e:
+            self.db.rollback()
+            logger.warning(f"批量写入 {len(pending)} 篇文章失败，改为逐篇写入: {str(e)}")
+            indexed, unpublished, unchanged = [], [], 0
+            for item in pending:
+                try:
+                    item_indexed, item_unpublished, item_unchanged = self._write_batch([item])
+                    indexed.extend(item_indexed)
+                    unpublished.extend(item_unpublished)
+                    unchanged += item_unchanged
+                except Exception as inner_e:
+                    self.db.rollback()
+                    self.failed += 1
+                    logger.error(f"处理文件 {item[0]['source_file']} 失败: {str(inner_e)}")
         
-        # 检查文件路径是否在黑名单中
-        if is_blacklisted(file_path):
-            return
+        # 更新全文索引（内容未变化的文章无需重新索引），未发布的文章不进入索引
+        search_service.search_index.index_articles(indexed)
+        search_service.search_index.remove_articles(unpublished)
+        self.written += len(indexed) + len(unpublished)
+        self.unchanged += unchanged
+
+    def _write_batch(self, items: List[Tuple[Dict, int]]) -> Tuple[List[Tuple[int, str, str]], List[int], int]:
+        """
+        批量写入一批文章并提交
+        返回(用于全文索引的已发布文章(文章ID, 标题, 正文)列表, 已写入但未发布的文章ID列表, 内容未变化的文章数)
+        """
+        db = self.db
+        articles = Article.__table__
+        # 同一批次中同一文件出现多次时以后出现的为准
+        by_file = {parsed["source_file"]: (parsed, category_id) for parsed, category_id in items}
+        # slug被其它文件占用时改用带路径后缀的slug
+        fallback_slugs = {
+            source_file: slug_with_path_suffix(parsed["slug"], source_file)
+            for source_file, (parsed, _) in by_file.items()
+        }
         
-        # 提取标题（使用第一个#标记的行作为标题）
-        title_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
-        if title_match:
-            title = title_match.group(1).strip()
-        else:
-            # 如果没有找到标题，使用文件名作为标题
-            title = os.path.splitext(os.path.basename(file_path))[0]
+        # 一次查询区分新增、内容变化和内容未变化的文章
+        # 每篇文章只属于一个源文件：优先按源文件匹配已有文章，标题（slug）修改后仍更新同一篇文章，
+        # 文章ID、阅读数和评论保持不变；按slug匹配只用于源文件已不存在（例如文件被移动）或
+        # 升级前没有记录源文件的文章，不会抢占仍存在的其它文件的文章
+        rows = db.query(
+            Article.slug, Article.id, Article.content_hash, Article.source_file, Article.category_id,
+            Article.is_published, (Article.html_content == "").label("html_missing")
+        ).filter(or_(
+            Article.slug.in_([parsed["slug"] for parsed, _ in by_file.values()] + list(fallback_slugs.values())),
+            Article.source_file.in_(list(by_file))
+        )).all()
+        rows_by_file = {row.source_file: row for row in rows if row.source_file}
+        rows_by_slug = {row.slug: row for row in rows}
+        # 升级前同步的文章没有内容哈希，与数据库中的正文比较，相同时只补写哈希
+        legacy_ids = [row.id for row in rows if row.content_hash is None]
+        legacy_contents = dict(
+            db.query(Article.id, Article.markdown_content).filter(Article.id.in_(legacy_ids)).all()
+        ) if legacy_ids else {}
         
-        # 生成slug
-        slug = slugify(title)
+        new_items, changed_items, unchanged_items, rendered_items = [], [], [], []
+        # 已取消发布的文章内容仍然更新，但不进入全文索引
+        unpublished_ids = set()
+        claimed = set()
+        used_slugs = set()
+        for source_file, (parsed, category_id) in by_file.items():
+            row = rows_by_file.get(source_file)
+            if row is None:
+                row = rows_by_slug.get(parsed["slug"])
+                if row is not None and (
+                    row.id in claimed
+                    or row.source_file in by_file
+                    or (row.source_file and os.path.exists(row.source_file))
+                ):
+                    row = None
+            
+            # slug已属于其它文章或已被本批次中的其它文件使用时，改用带路径后缀的slug
+            slug = parsed["slug"]
+            owner = rows_by_slug.get(slug)
+            if slug in used_slugs or (owner is not None and (row is None or owner.id != row.id)):
+                slug = fallback_slugs[source_file]
+            used_slugs.add(slug)
+            parsed["slug"] = slug
+            
+            if row is None:
+                new_items.append((slug, parsed, category_id))
+                continue
+            claimed.add(row.id)
+            if (
+                row.slug == slug
+                and row.source_file == source_file
+                and row.category_id == category_id
+                and (
+                    row.content_hash == parsed["content_hash"]
+                    or (row.content_hash is None and legacy_contents.get(row.id) == parsed["markdown_content"])
+                )
+            ):
+                # 升级前同步的文章没有HTML，内容不变时只补写渲染结果
+                if row.html_missing and parsed["html_content"]:
+                    rendered_items.append((row.id, parsed))
+                else:
+                    unchanged_items.append((row.id, parsed))
+            else:
+                changed_items.append((row.id, parsed, category_id))
+                if row.is_published is False:
+                    unpublished_ids.add(row.id)
         
-        # 提取预览（使用前200个字符作为预览）
-        preview = re.sub(r'^#\s+.+$', '', content, 1, re.MULTILINE).strip()[:200] + "..."
+        if unchanged_items:
+            db.execute(
+                update(articles)
+                .where(articles.c.id == bindparam("article_id"))
+                .values(
+                    content_hash=bindparam("content_hash"),
+                    source_mtime=bindparam("source_mtime"),
+                    source_size=bindparam("source_size"),
+                    # 内容没有变化，显式保留update_time，避免触发onupdate
+                    update_time=articles.c.update_time
+                ),
+                [
+                    {
+                        "article_id": article_id,
+                        "content_hash": parsed["content_hash"],
+                        "source_mtime": parsed["source_mtime"],
+                        "source_size": parsed["source_size"],
+                    }
+                    for article_id, parsed in unchanged_items
+                ]
+            )
         
-        # 将Markdown转换为HTML - 已注释，不再转换为HTML
-        # html_content = markdown.markdown(
-        #     content,
-        #     extensions=['extra', 'codehilite', 'tables', 'toc']
-        # )
+        if rendered_items:
+            db.execute(
+                update(articles)
+                .where(articles.c.id == bindparam("article_id"))
+                .values(
+                    html_content=bindparam("html_content"),
+                    content_hash=bindparam("content_hash"),
+                    source_mtime=bindparam("source_mtime"),
+                    source_size=bindparam("source_size"),
+                    update_time=articles.c.update_time
+                ),
+                [
+                    {
+                        "article_id": article_id,
+                        "html_content": parsed["html_content"],
+                        "content_hash": parsed["content_hash"],
+                        "source_mtime": parsed["source_mtime"],
+                        "source_size": parsed["source_size"],
+                    }
+                    for article_id, parsed in rendered_items
+                ]
+            )
         
-        # 不进行HTML转换，直接使用原始Markdown内容
-        html_content = ""  # 或者设置为空字符串: html_content = ""
+        written = [parsed for _, parsed, _ in new_items] + [parsed for _, parsed, _ in changed_items]
+        # 解析阶段按文件路径判断无需渲染，但按slug匹配到了其它文章（例如文件被移动）时在此补充渲染
+        for parsed in written:
+            if parsed["html_content"] is None:
+                parsed["html_content"] = render_markdown(parsed["markdown_content"])
         
-        # 提取标签（使用文件中的#标签格式）
-        tags = []
-        tag_matches = re.findall(r'#(\w+)', content)
-        for tag_name in tag_matches:
-            if len(tag_name) > 2:  # 忽略太短的标签
-                tag = db.query(Tag).filter(Tag.name == tag_name).first()
-                if not tag:
-                    tag = Tag(name=tag_name)
-                    db.add(tag)
-                    db.commit()
-                    db.refresh(tag)
-                tags.append(tag)
+        # 新标签批量插入，提交成功后才合并到缓存，回滚时缓存保持不变
+        # 标签缓存按tag_key区分，与MySQL中tags.name不区分大小写的唯一索引一致，
+        # 大小写不同的标签（如Python和python）视为同一个标签，使用最先出现的写法
+        tag_ids = dict(self._tag_ids)
+        new_tags: Dict[str, str] = {}
+        for parsed in written:
+            for tag_name in parsed["tag_names"]:
+                if tag_key(tag_name) not in tag_ids:
+                    new_tags.setdefault(tag_key(tag_name), tag_name)
+        if new_tags:
+            db.execute(insert(Tag.__table__), [{"name": tag_name} for tag_name in new_tags.values()])
+            tag_ids.update(
+                (tag_key(name), tag_id)
+                for name, tag_id in db.query(Tag.name, Tag.id).filter(Tag.name.in_(list(new_tags.values()))).all()
+            )
         
-        # 检查文章是否已存在（通过slug判断）
-        article = db.query(Article).filter(Article.slug == slug).first()
+        # 写入后文章的slug -> ID
+        article_ids = {parsed["slug"]: article_id for article_id, parsed, _ in changed_items}
+        if new_items:
+            db.execute(
+                insert(articles),
+                [
+                    dict(
+                        {column: parsed[column] for column in self.CONTENT_COLUMNS if column != "category_id"},
+                        category_id=category_id
+                    )
+                    for _, parsed, category_id in new_items
+                ]
+            )
+            article_ids.update(
+                db.query(Article.slug, Article.id)
+                .filter(Article.slug.in_([slug for slug, _, _ in new_items]))
+                .all()
+            )
         
-        if article:
-            # 更新现有文章
-            article.title = title
-            article.markdown_content = content
-            article.html_content = html_content
-            article.preview = preview
-            article.update_time = datetime.now()
-            article.source_file = file_path
-            article.category_id = category_id
-            article.tags = tags
-        else:
-            # 创建新文章
-            article = Article(
-                title=title,
-                slug=slug,
-                markdown_content=content,
-                html_content=html_content,
-                preview=preview,
-                source_file=file_path,
-                category_id=category_id
+        if changed_items:
+            now = datetime.now()
+            db.execute(
+                update(articles)
+                .where(articles.c.id == bindparam("article_id"))
+                .values({column: bindparam(column) for column in self.CONTENT_COLUMNS + ("update_time",)}),
+                [
+                    dict(
+                        {column: parsed[column] for column in self.CONTENT_COLUMNS if column != "category_id"},
+                        article_id=article_id,
+                        category_id=category_id,
+                        update_time=now
+                    )
+                    for article_id, parsed, category_id in changed_items
+                ]
+            )
+            # 内容变化的文章先清空原有标签，再与新文章一起批量插入关联
+            db.execute(
+                delete(article_tag).where(
+                    article_tag.c.article_id.in_([article_id for article_id, _, _ in changed_items])
+                )
             )
-            article.tags = tags
-            db.add(article)
+        
+        tag_rows = [
+            {"article_id": article_ids[parsed["slug"]], "tag_id": tag_id}
+            for parsed in written
+            for tag_id in dict.fromkeys(tag_ids[tag_key(tag_name)] for tag_name in parsed["tag_names"])
+        ]
+        if tag_rows:
+            db.execute(insert(article_tag), tag_rows)
         
         db.commit()
+        self._tag_ids = tag_ids
+        indexed = [
+            (article_ids[parsed["slug"]], parsed["title"], parsed["markdown_content"])
+            for parsed in written
+            if article_ids[parsed["slug"]] not in unpublished_ids
+        ]
+        return indexed, sorted(unpublished_ids), len(unchanged_items) + len(rendered_items)
+
+
+def process_directory(directory: str, db: Session) -> int:
+    """
+    处理目录，将文件夹作为分类，Markdown文件作为文章
+    分为三个阶段：遍历目录 -> 进程池并行解析 -> 单个写入者分批写入数据库
+    返回处理失败的文件数
+    """
+    logger.info(f"处理目录: {directory}")
+    
+    # 跳过.git目录和黑名单目录
+    if directory == "" or _is_skipped_directory(directory):
+        logger.debug(f"跳过目录: {directory}")
+        return 0
+    
+    # 记录开始处理时间
+    start_time = datetime.now()
+    
+    walked = list(walk_markdown_files(directory))
+    
+    # 修改时间和大小与上次同步一致的文件视为未变化，无需读取和解析
+    known_files = {
+        source_file: (source_mtime, source_size)
+        for source_file, source_mtime, source_size in db.query(
+            Article.source_file, Article.source_mtime, Article.source_size
+        ).filter(Article.source_file.isnot(None)).all()
+    }
+    files = []
+    for item in walked:
+        stat = os.stat(item[0])
+        if known_files.get(item[0]) != (stat.st_mtime_ns, stat.st_size):
+            files.append(item)
+    total_files = len(files)
+    logger.info(f"目录 {directory} 中共有 {len(walked)} 个Markdown文件，其中 {total_files} 个可能有变化需要处理")
+    
+    writer, parse_errors = ingest_files(db, files, directory)
+    
+    # 计算处理耗时
+    end_time = datetime.now()
+    elapsed_time = (end_time - start_time).total_seconds()
+    
+    logger.info(f"目录 {directory} 处理完成，耗时 {elapsed_time:.2f} 秒")
+    logger.info(
+        f"处理统计 - 写入文章: {writer.written}，内容未变化: {len(walked) - total_files + writer.unchanged}，"
+        f"解析失败: {parse_errors}，写入失败: {writer.failed}"
+    )
+    return parse_errors + writer.failed
+    
+
+def get_rendered_hashes(db: Session, file_paths: List[str]) -> Dict[str, str]:
+    """
+    返回{源文件: 内容哈希}，只包含已保存HTML的文章，用于在解析阶段跳过内容未变化的文件的渲染
+    """
+    rendered_hashes = {}
+    for i in range(0, len(file_paths), 500):
+        rendered_hashes.update(
+            db.query(Article.source_file, Article.content_hash).filter(
+                Article.source_file.in_(file_paths[i:i + 500]),
+                Article.content_hash.isnot(None),
+                Article.html_content != ""
+            ).all()
+        )
+    return rendered_hashes
+
+
+def ingest_files(db: Session, files: List[Tuple[str, str, str]], label: str = "") -> Tuple["ArticleWriter", int]:
+    """
+    将(文件路径, 分类名称, 分类slug)列表经解析阶段和写入阶段写入数据库
+    返回(写入者, 解析失败的文件数)，写入者中记录了写入、未变化和写入失败的文章数
+    """
+    total_files = len(files)
+    
+    # 预先创建全部分类并提交，写入批次回滚时分类ID仍然有效
+    category_ids = ensure_categories(db, {category_slug: category_name for _, category_name, category_slug in files})
+    db.commit()
+    file_categories = {file_path: category_ids[category_slug] for file_path, _, category_slug in files}
+    
+    file_paths = [item[0] for item in files]
+    rendered_hashes = get_rendered_hashes(db, file_paths) if MARKDOWN_RENDER else {}
+    writer = ArticleWriter(db)
+    parse_errors = 0
+    blocked = []
+    
+    for index, (file_path, parsed, error) in enumerate(
+        parse_markdown_files(file_paths, rendered_hashes=rendered_hashes)
+    ):
+        if error is not None:
+            parse_errors += 1
+            logger.error(f"处理文件 {file_path} 失败: {error}")
+            continue
         
-        # 计算处理耗时
-        end_time = datetime.now()
-        elapsed_time = (end_time - start_time).total_seconds()
-        logger.debug(f"文件 {file_path} 处理完成，耗时 {elapsed_time:.2f} 秒")
+        if parsed["blocked_keyword"]:
+            logger.debug(f"{file_path} 包含黑名单关键词 {parsed['blocked_keyword']}，已跳过")
+            blocked.append(file_path)
+        else:
+            writer.add(parsed, file_categories[file_path])
         
+        # 每处理1000个文件或处理到最后一个文件时输出进度
+        if (index + 1) % 1000 == 0 or index + 1 == total_files:
+            logger.info(f"{label} 处理进度: {index + 1}/{total_files} ({(index + 1) / total_files * 100:.1f}%)")
+    
+    writer.flush()
+    
+    # 之前已同步、现在包含黑名单关键词的文章一并删除
+    if blocked:
+        logger.info(f"{label} 跳过 {len(blocked)} 个包含黑名单关键词的文件")
+        delete_articles_by_source(db, blocked)
+    return writer, parse_errors
+
+
+def delete_articles_by_source(db: Session, source_files: List[str]) -> int:
+    """
+    删除源文件已被删除的文章（评论和标签关联随文章一起删除），并从全文索引中移除
+    返回删除的文章数
+    """
+    if not source_files:
+        return 0
+    articles = db.query(Article).filter(Article.source_file.in_(source_files)).all()
+    if not articles:
+        return 0
+    article_ids = [article.id for article in articles]
+    for article in articles:
+        db.delete(article)
+    db.commit()
+    search_service.search_index.remove_articles(article_ids)
+    logger.info(f"删除 {len(article_ids)} 篇源文件已不存在的文章")
+    return len(article_ids)
+
+
+def remove_missing_articles(db: Session, root: str) -> int:
+    """
+    全量扫描后删除源文件位于root下但已不存在的文章
+    """
+    prefix = os.path.normpath(root) + os.sep
+    missing = [
+        source_file
+        for (source_file,) in db.query(Article.source_file).filter(Article.source_file.isnot(None)).all()
+        if os.path.normpath(source_file).startswith(prefix) and not os.path.exists(source_file)
+    ]
+    return delete_articles_by_source(db, missing)
+
+
+def process_markdown_file(file_path: str, category_id: int, db: Session) -> None:
+    """
+    处理单个Markdown文件，提取内容并保存到数据库
+    """
+    
+    start_time = datetime.now()
+    logger.debug(f"开始处理文件: {file_path}")
+    
+    # 检查文件路径是否在黑名单中
+    if is_blacklisted(file_path):
+        return
+    
+    try:
+        parsed = parse_markdown_file(file_path)
     except Exception as e:
         logger.error(f"处理文件 {file_path} 失败: {str(e)}")
-        db.rollback()
-        
-        # 记录详细错误信息
-        import traceback
-        logger.error(f"处理文件详细错误: {traceback.format_exc()}")
+        return
+    
+    if parsed["blocked_keyword"]:
+        logger.debug(f"{file_path} 包含黑名单关键词 {parsed['blocked_keyword']}，已跳过")
+        return
+    
+    writer = ArticleWriter(db, batch_size=1)
+    writer.add(parsed, category_id)
+    
+    # 计算处理耗时
+    end_time = datetime.now()
+    elapsed_time = (end_time - start_time).total_seconds()
+    logger.debug(f"文件 {file_path} 处理完成，耗时 {elapsed_time:.2f} 秒")
         
 
 def slugify(text: str) -> str:
@@ -0,0 +1,270 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import Article
+
+logger = logging.getLogger(__name__)
+if os.getenv("DEBUG_MODE") == "false":
+    logger.setLevel(logging.WARNING)
+
+# 全文索引文件路径（SQLite FTS5旁路索引，无需额外服务）
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "search_index.db")
+# 标题在BM25排序中的权重（正文权重为1）
+SEARCH_TITLE_WEIGHT = float(os.getenv("SEARCH_TITLE_WEIGHT", "10.0"))
+# 高频词命中大量文章时BM25排序需要为每篇命中文章打分，
+# 因此缓存每个查询排名靠前的结果，前几页翻页直接从缓存切片，索引写入后缓存失效
+# （包括其它worker进程写入同一个索引文件，通过PRAGMA data_version检测）
+SEARCH_RESULT_WINDOW = int(os.getenv("SEARCH_RESULT_WINDOW", "200"))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "256"))
+
+# 中日韩文字连续片段，以及拉丁字母/数字组成的单词
+_TOKEN_RE = re.compile(r"([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+)|([0-9a-z]+)")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    将文本切分为索引词元
+    中日韩文字按二元组（bigram）切分，并保留片段最后一个字，保证任意单字都能通过前缀匹配找到；
+    拉丁字母和数字按单词切分并转换为小写
+    """
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall((text or "").lower()):
+        if word:
+            tokens.append(word)
+            continue
+        for i in range(len(cjk) - 1):
+            tokens.append(cjk[i:i + 2])
+        tokens.append(cjk[-1])
+    return tokens
+
+
+def build_match_query(keyword: str) -> Optional[str]:
+    """
+    将搜索关键词转换为FTS5查询表达式
+    中文片段转换为连续二元组短语（单字使用前缀匹配），英文单词使用前缀匹配，各部分之间为AND关系
+    关键词中没有可检索的词元时返回None
+    """
+    parts = []
+    for cjk, word in _TOKEN_RE.findall((keyword or "").lower()):
+        if word:
+            parts.append(f'"{word}"*')
+        elif len(cjk) == 1:
+            parts.append(f'"{cjk}"*')
+        else:
+            bigrams = " ".join(cjk[i:i + 2] for i in range(len(cjk) - 1))
+            parts.append(f'"{bigrams}"')
+    return " AND ".join(parts) if parts else None
+
+
+class SearchIndex:
+    """
+    基于SQLite FTS5的文章全文索引
+    文档在写入前已按tokenize切分为以空格分隔的词元，FTS5只负责倒排索引和BM25排序
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # 查询表达式 -> (排名靠前的文章ID列表, 命中总数)
+        self._result_cache: "OrderedDict[str, Tuple[List[int], int]]" = OrderedDict()
+        # 缓存对应的索引文件版本（PRAGMA data_version），其它连接提交写入后版本号变化
+        self._cache_version: Optional[int] = None
+        # 缓存失效的次数，查询期间缓存被清空时丢弃该次查询的结果，避免把旧结果写回缓存
+        self._generation = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            if self.path != ":memory:":
+                # WAL模式下多个worker可以在同步写入时并发读取
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts "
+                "USING fts5(title, body, tokenize='unicode61 remove_diacritics 0')"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def index_articles(self, articles: Iterable[Tuple[int, str, str]]) -> None:
+        """
+        批量写入或更新文章索引，articles为(文章ID, 标题, 正文)序列
+        """
+        rows = [
+            (article_id, " ".join(tokenize(title)), " ".join(tokenize(body)))
+            for article_id, title, body in articles
+        ]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection()
+            self._invalidate()
+            with conn:
+                conn.executemany("DELETE FROM articles_fts WHERE rowid = ?", [(row[0],) for row in rows])
+                conn.executemany("INSERT INTO articles_fts(rowid, title, body) VALUES (?, ?, ?)", rows)
+
+    def index_article(self, article_id: int, title: str, body: str) -> None:
+        """
+        写入或更新单篇文章的索引
+        """
+        self.index_articles([(article_id, title, body)])
+
+    def remove_articles(self, article_ids: Iterable[int]) -> None:
+        """
+        从索引中删除文章
+        """
+        params = [(article_id,) for article_id in article_ids]
+        if not params:
+            return
+        with self._lock:
+            conn = self._connection()
+            self._invalidate()
+            with conn:
+                conn.executemany("DELETE FROM articles_fts WHERE rowid = ?", params)
+
+    def _invalidate(self) -> None:
+        """
+        清空结果缓存，调用方需持有锁
+        """
+        self._result_cache.clear()
+        self._generation += 1
+
+    def _validate_cache(self) -> None:
+        """
+        其它进程写入索引文件后清空结果缓存，调用方需持有锁
+        PRAGMA data_version只在其它连接提交时变化，本连接的写入已在写入时清空缓存
+        """
+        version = self._connection().execute("PRAGMA data_version").fetchone()[0]
+        if version != self._cache_version:
+            self._invalidate()
+            self._cache_version = version
+
+    def document_count(self) -> int:
+        """
+        返回索引中的文档数量
+        """
+        with self._lock:
+            return self._connection().execute("SELECT count(*) FROM articles_fts").fetchone()[0]
+
+    def rebuild(self, db: Session, batch_size: int = 500) -> int:
+        """
+        根据数据库中已发布的文章重建整个索引，返回索引的文章数量
+        """
+        query = (
+            db.query(Article.id, Article.title, Article.markdown_content)
+            .filter(Article.is_published == True)
+            .order_by(Article.id)
+            .yield_per(batch_size)
+        )
+        with self._lock:
+            conn = self._connection()
+            self._invalidate()
+            with conn:
+                conn.execute("DELETE FROM articles_fts")
+                total = 0
+                batch = []
+                for article_id, title, body in query:
+                    batch.append((article_id, " ".join(tokenize(title)), " ".join(tokenize(body))))
+                    if len(batch) >= batch_size:
+                        conn.executemany("INSERT INTO articles_fts(rowid, title, body) VALUES (?, ?, ?)", batch)
+                        total += len(batch)
+                        batch = []
+                if batch:
+                    conn.executemany("INSERT INTO articles_fts(rowid, title, body) VALUES (?, ?, ?)", batch)
+                    total += len(batch)
+        logger.info(f"全文索引重建完成，共索引 {total} 篇文章")
+        return total
+
+    def search(self, keyword: str, limit: int = 10, offset: int = 0) -> Tuple[List[int], int]:
+        """
+        按BM25相关度搜索文章，返回(当前页文章ID列表, 命中总数)
+        """
+        match = build_match_query(keyword)
+        if not match:
+            return [], 0
+        
+        # 前几页从缓存的排名窗口中切片
+        if offset + limit <= SEARCH_RESULT_WINDOW:
+            with self._lock:
+                self._validate_cache()
+                cached = self._result_cache.get(match)
+                if cached is not None:
+                    self._result_cache.move_to_end(match)
+                generation = self._generation
+            if cached is None:
+                cached = self._ranked(match, SEARCH_RESULT_WINDOW, 0)
+                with self._lock:
+                    # 查询期间索引有写入时结果可能已过期，只返回不缓存
+                    if self._generation == generation:
+                        self._result_cache[match] = cached
+                        while len(self._result_cache) > SEARCH_CACHE_SIZE:
+                            self._result_cache.popitem(last=False)
+            ids, total = cached
+            return ids[offset:offset + limit], total
+        
+        return self._ranked(match, limit, offset)
+
+    def _ranked(self, match: str, limit: int, offset: int) -> Tuple[List[int], int]:
+        """
+        执行FTS5查询，返回按BM25排序的文章ID和命中总数
+        """
+        with self._lock:
+            conn = self._connection()
+            total = conn.execute(
+                "SELECT count(*) FROM articles_fts WHERE articles_fts MATCH ?", (match,)
+            ).fetchone()[0]
+            if total == 0 or offset >= total:
+                return [], total
+            rows = conn.execute(
+                "SELECT rowid FROM articles_fts WHERE articles_fts MATCH ? "
+                "ORDER BY bm25(articles_fts, ?, 1.0) LIMIT ? OFFSET ?",
+                (match, SEARCH_TITLE_WEIGHT, limit, offset)
+            ).fetchall()
+        return [row[0] for row in rows], total
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 进程内共享的全文索引实例
+search_index = SearchIndex(SEARCH_INDEX_PATH)
+# 索引是否可用于搜索（启动时确认索引已构建后置为True）
+_index_ready = threading.Event()
+
+
+def is_ready() -> bool:
+    return _index_ready.is_set()
+
+
+def mark_ready() -> None:
+    _index_ready.set()
+
+
+def ensure_index(session_factory) -> None:
+    """
+    启动时确保全文索引已构建：索引为空而数据库中有文章时执行全量重建
+    索引构建完成前，搜索会回退到数据库模糊匹配
+    """
+    db = session_factory()
+    try:
+        if search_index.document_count() == 0:
+            article_count = db.query(Article.id).filter(Article.is_published == True).count()
+            if article_count:
+                logger.info(f"全文索引为空，开始为 {article_count} 篇文章构建索引")
+                search_index.rebuild(db)
+        mark_ready()
+    except Exception as e:
+        logger.error(f"全文索引初始化失败，搜索将回退到数据库模糊匹配: {str(e)}")
+    finally:
+        db.close()
@@ -0,0 +1,103 @@
+import logging
+import os
+import threading
+from typing import Dict
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from models import Article
+
+logger = logging.getLogger(__name__)
+if os.getenv("DEBUG_MODE") == "false":
+    logger.setLevel(logging.WARNING)
+
+# 阅读计数落库间隔（秒）
+VIEW_COUNT_FLUSH_INTERVAL = int(os.getenv("VIEW_COUNT_FLUSH_INTERVAL", "10"))
+
+
+class ViewCountBuffer:
+    """
+    阅读计数写缓冲
+    请求只在内存中累加计数，由后台任务定期以 view_count = view_count + n 的方式批量落库
+    """
+
+    def __init__(self):
+        self._counts: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, article_id: int, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[article_id] = self._counts.get(article_id, 0) + amount
+
+    def pending(self, article_id: int) -> int:
+        """
+        返回尚未落库的阅读数
+        """
+        with self._lock:
+            return self._counts.get(article_id, 0)
+
+    def drain(self) -> Dict[int, int]:
+        """
+        取出并清空当前缓冲的全部计数
+        """
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        return counts
+
+    def restore(self, counts: Dict[int, int]) -> None:
+        """
+        落库失败时将计数合并回缓冲，避免丢失
+        """
+        with self._lock:
+            for article_id, amount in counts.items():
+                self._counts[article_id] = self._counts.get(article_id, 0) + amount
+
+    def flush(self, db: Session) -> int:
+        """
+        将缓冲的计数批量写入数据库，返回写入的阅读数
+        """
+        counts = self.drain()
+        if not counts:
+            return 0
+
+        articles = Article.__table__
+        statement = (
+            update(articles)
+            .where(articles.c.id == bindparam("article_id"))
+            .values(
+                view_count=func.coalesce(articles.c.view_count, 0) + bindparam("amount"),
+                # 阅读数变化不算内容更新，显式保留update_time，避免触发onupdate
+                update_time=articles.c.update_time
+            )
+        )
+        try:
+            db.execute(
+                statement,
+                [{"article_id": article_id, "amount": amount} for article_id, amount in counts.items()]
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.restore(counts)
+            logger.error(f"阅读计数落库失败，已保留在缓冲中等待重试: {str(e)}")
+            raise
+
+        total = sum(counts.values())
+        logger.debug(f"阅读计数落库完成，文章数: {len(counts)}，阅读数: {total}")
+        return total
+
+
+# 进程内共享的阅读计数缓冲
+view_count_buffer = ViewCountBuffer()
+
+
+def flush_view_counts(session_factory) -> int:
+    """
+    创建独立的数据库会话并落库缓冲的阅读计数
+    """
+    db = session_factory()
+    try:
+        return view_count_buffer.flush(db)
+    finally:
+        db.close()
@@ -12,6 +12,9 @@ os.environ["DATABASE_URL"] = "sqlite:///:memory:"
 os.environ["GITHUB_REPO_URL"] = "https://github.com/test/test.git"
 os.environ["GITHUB_TARGET_DIR"] = "./test_content"
 os.environ["SYNC_INTERVAL"] = "0 */6 * * *"
+os.environ["SEARCH_INDEX_PATH"] = ":memory:"
+# 测试环境没有Redis，速率限制不回退到本地令牌桶
+os.environ["RATE_LIMIT_FALLBACK"] = "open"
 
 # 如果需要代理，可以在这里设置
 # os.environ["HTTP_PROXY"] = "http://127.0.0.1:7890"
@@ -28,4 +31,33 @@ def setup_test_environment():
     # 清理测试内容目录
     if os.path.exists("./test_content"):
         import shutil
-        shutil.rmtree("./test_content")
\ No newline at end of file
+        shutil.rmtree("./test_content")
+
+
+@pytest.fixture(autouse=True)
+def clear_category_cache():
+    """每个测试前后清空分类缓存，避免测试之间相互影响"""
+    from services import article_service
+    article_service.invalidate_category_cache()
+    yield
+    article_service.invalidate_category_cache()
+
+
+
+@pytest.fixture(autouse=True)
+def clear_view_count_buffer():
+    """每个测试前后清空阅读计数缓冲"""
+    from services.view_counter import view_count_buffer
+    view_count_buffer.drain()
+    yield
+    view_count_buffer.drain()
+
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """每个测试前后使响应缓存失效"""
+    from services.cache_service import response_cache
+    response_cache.invalidate()
+    yield
+    response_cache.invalidate()
@@ -187,4 +187,126 @@ def test_article_not_found(client):
     """测试获取不存在的文章"""
     response = client.get("/api/article/9999")
     assert response.status_code == 404
-    assert "文章不存在" in response.json()["detail"]
\ No newline at end of file
+    assert "文章不存在" in response.json()["detail"]
+
+def test_article_detail_cache_merges_live_view_count(client, test_data):
+    """文章详情命中缓存时，阅读数仍为最新值"""
+    url = f"/api/article/{test_data['article'].id}"
+    first = client.get(url).json()["data"]["viewCount"]
+    second = client.get(url).json()["data"]["viewCount"]
+    assert second == first + 1
+
+
+def test_article_detail_conditional_get(client, test_data):
+    """文章详情返回ETag和Last-Modified，条件请求命中时返回304"""
+    url = f"/api/article/{test_data['article'].id}"
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+    assert etag.startswith('"')
+
+    # 阅读数变化不影响ETag
+    assert client.get(url).headers["ETag"] == etag
+
+    not_modified = client.get(url, headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+
+    assert client.get(url, headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_category_and_list_conditional_get(client, test_data):
+    """分类和文章列表同样支持ETag条件请求，文章列表不返回Last-Modified"""
+    response = client.get("/api/category")
+    etag = response.headers["ETag"]
+    assert client.get("/api/category", headers={"If-None-Match": etag}).status_code == 304
+
+    body = {"categoryId": str(test_data["category"].id), "pageSize": 10, "currentPage": 1}
+    response = client.post("/api/article/list", json=body)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert "Last-Modified" not in response.headers
+    assert client.post("/api/article/list", json=body, headers={"If-None-Match": etag}).status_code == 304
+    # 列表的最新更新时间不能反映删除和取消发布，If-Modified-Since不会命中
+    since = "Fri, 01 Jan 2100 00:00:00 GMT"
+    assert client.post("/api/article/list", json=body, headers={"If-Modified-Since": since}).status_code == 200
+
+
+def test_article_endpoints_with_async_session(client, tmp_path):
+    """接口依赖返回异步会话时，文章接口通过异步驱动读取数据"""
+    import asyncio
+    from database import create_async_session_factory
+
+    db_path = tmp_path / "async_api.db"
+    sync_engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=sync_engine)
+    session = sessionmaker(bind=sync_engine)()
+    category = models.Category(name="异步分类", slug="async-category")
+    session.add(category)
+    session.flush()
+    article = models.Article(
+        title="异步文章", slug="async-article", markdown_content="异步内容", html_content="",
+        preview="异步内容", is_published=True, category_id=category.id
+    )
+    session.add(article)
+    session.commit()
+    article_id = article.id
+    session.close()
+    sync_engine.dispose()
+
+    async_engine, async_session_factory = create_async_session_factory(f"sqlite+aiosqlite:///{db_path}")
+
+    async def override_get_async_db():
+        async with async_session_factory() as db:
+            yield db
+
+    previous_override = app.dependency_overrides[get_db]
+    app.dependency_overrides[get_db] = override_get_async_db
+    try:
+        response = client.get(f"/api/article/{article_id}")
+        assert response.status_code == 200
+        assert response.json()["data"]["title"] == "异步文章"
+
+        response = client.get("/api/category")
+        assert [item["name"] for item in response.json()] == ["异步分类"]
+
+        response = client.post("/api/article/list", json={"pageSize": 10, "currentPage": 1})
+        assert response.json()["data"]["pagination"]["total"] == 1
+
+        assert client.get("/api/article/9999").status_code == 404
+    finally:
+        app.dependency_overrides[get_db] = previous_override
+        asyncio.run(async_engine.dispose())
+
+
+def test_metrics_endpoint(client, monkeypatch):
+    """/metrics以Prometheus文本格式导出连接池指标，只允许配置的地址或携带令牌的请求访问"""
+    from config.security_config import SECURITY_CONFIG
+
+    monkeypatch.setitem(SECURITY_CONFIG["metrics"], "token", "metrics-secret")
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer metrics-secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'db_pool_checkouts_total{engine="sync"' in response.text
+
+    # 默认允许本机直接访问，无需令牌
+    local_client = TestClient(app, client=("127.0.0.1", 50000))
+    assert local_client.get("/metrics").status_code == 200
+
+
+def test_print_security_config_masks_metrics_token(monkeypatch, capsys):
+    """打印安全配置时隐藏监控指标的访问令牌，不修改原配置"""
+    from config.security_config import SECURITY_CONFIG, print_security_config
+
+    monkeypatch.setitem(SECURITY_CONFIG["metrics"], "token", "metrics-secret")
+    print_security_config()
+    output = capsys.readouterr().out
+    assert "metrics-secret" not in output
+    assert '"token": "****"' in output
+    assert SECURITY_CONFIG["metrics"]["token"] == "metrics-secret"
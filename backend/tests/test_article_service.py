@@ -8,7 +8,7 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services import article_service
-from models import Category, Article, Tag
+from models import Category, Article, Tag, Comment
 
 
 @pytest.fixture
@@ -44,8 +44,11 @@ def test_get_categories(mock_db_session):
     mock_categories[1].slug = "category-2"
     mock_categories[1].description = "这是分类2"
     
-    # 设置模拟查询结果
-    mock_db_session.query.return_value.all.return_value = mock_categories
+    # 设置模拟查询结果（分组查询返回分类及其文章数量）
+    mock_query = mock_db_session.query.return_value
+    mock_query.outerjoin.return_value = mock_query
+    mock_query.group_by.return_value = mock_query
+    mock_query.all.return_value = [(mock_categories[0], 3), (mock_categories[1], 0)]
     
     # 调用获取分类函数
     categories = article_service.get_categories(mock_db_session)
@@ -54,8 +57,13 @@ def test_get_categories(mock_db_session):
     assert len(categories) == 2
     assert categories[0]["id"] == 1
     assert categories[0]["name"] == "分类1"
+    assert categories[0]["articleCount"] == 3
     assert categories[1]["id"] == 2
     assert categories[1]["name"] == "分类2"
+    assert categories[1]["articleCount"] == 0
+    
+    # 只执行一次查询
+    assert mock_db_session.query.call_count == 1
 
 
 def test_get_article_list(mock_db_session):
@@ -145,22 +153,18 @@ def test_get_article_detail(mock_db_session):
 
 
 def test_increment_view_count(mock_db_session):
-    """测试增加文章阅读计数"""
-    # 模拟文章数据
-    mock_article = MagicMock(spec=Article)
-    mock_article.id = 1
-    mock_article.view_count = 10
-    
-    # 设置模拟查询结果
-    mock_query = mock_db_session.query.return_value
-    mock_query.filter.return_value.first.return_value = mock_article
+    """测试增加文章阅读计数：只写入内存缓冲，不访问数据库"""
+    from services.view_counter import view_count_buffer
     
     # 调用增加阅读计数函数
-    article_service.increment_view_count(mock_db_session, 1)
+    article_service.increment_view_count(1)
+    article_service.increment_view_count(1)
     
     # 验证结果
-    assert mock_article.view_count == 11
-    mock_db_session.commit.assert_called_once()
+    assert view_count_buffer.pending(1) == 2
+    assert article_service.current_view_count(1, 10) == 12
+    mock_db_session.query.assert_not_called()
+    mock_db_session.commit.assert_not_called()
 
 
 def test_search_articles(mock_db_session):
@@ -198,4 +202,369 @@ def test_search_articles(mock_db_session):
     assert articles[0]["id"] == 1
     assert articles[0]["title"] == "测试文章"
     assert total == 1
-    assert total_pages == 1
\ No newline at end of file
+    assert total_pages == 1
+
+@pytest.fixture
+def sqlite_session():
+    """基于SQLite内存数据库的真实会话，用于统计SQL语句数量"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from database import Base
+
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+def _seed_articles(session, count):
+    """批量创建分布在多个分类下的文章"""
+    categories = [Category(name=f"分类{i}", slug=f"category-{i}") for i in range(5)]
+    session.add_all(categories)
+    session.flush()
+    for i in range(count):
+        session.add(Article(
+            title=f"文章{i}",
+            slug=f"article-{i}",
+            markdown_content=f"# 文章{i}\n测试内容{i}",
+            html_content="",
+            preview=f"测试预览{i}",
+            category_id=categories[i % len(categories)].id
+        ))
+    session.commit()
+
+
+def _count_statements(session, func, *args, **kwargs):
+    """执行函数并返回期间发出的SQL语句数量"""
+    result, statements = _capture_statements(session, func, *args, **kwargs)
+    return result, len(statements)
+
+
+def _capture_statements(session, func, *args, **kwargs):
+    """执行函数并返回期间发出的SQL语句"""
+    from sqlalchemy import event
+
+    statements = []
+    engine = session.get_bind()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = func(session, *args, **kwargs)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return result, statements
+
+
+@pytest.mark.parametrize("page_size", [5, 50])
+def test_get_article_list_query_count_is_constant(sqlite_session, page_size):
+    """文章列表的SQL语句数量不随分页大小增长"""
+    _seed_articles(sqlite_session, 60)
+
+    (articles, total, _), statement_count = _count_statements(
+        sqlite_session, article_service.get_article_list, page_size=page_size, current_page=1
+    )
+
+    assert len(articles) == page_size
+    assert total == 60
+    assert all(article["category"] is not None for article in articles)
+    # 一条COUNT查询 + 一条带分类JOIN的列表查询
+    assert statement_count == 2
+
+
+@pytest.mark.parametrize("page_size", [5, 50])
+def test_search_articles_query_count_is_constant(sqlite_session, page_size):
+    """搜索结果的SQL语句数量不随分页大小增长"""
+    _seed_articles(sqlite_session, 60)
+
+    (articles, total, _), statement_count = _count_statements(
+        sqlite_session, article_service.search_articles, keyword="测试", page_size=page_size, current_page=1
+    )
+
+    assert len(articles) == page_size
+    assert total == 60
+    assert all(article["category"]["name"].startswith("分类") for article in articles)
+    assert statement_count == 2
+
+
+def test_list_and_search_do_not_load_article_content(sqlite_session, monkeypatch):
+    """列表和搜索查询不读取正文和HTML，详情仍在一次查询中读取完整内容"""
+    _seed_articles(sqlite_session, 10)
+    monkeypatch.setattr(article_service.search_service, "is_ready", lambda: False)
+
+    for func, kwargs in (
+        (article_service.get_article_list, {}),
+        (article_service.get_article_list_by_cursor, {}),
+        (article_service.search_articles, {"keyword": "测试"}),
+    ):
+        (articles, *_), statements = _capture_statements(sqlite_session, func, **kwargs)
+        assert articles
+        selects = [statement for statement in statements if statement.lstrip().upper().startswith("SELECT")]
+        assert not [statement for statement in selects if "markdown_content," in statement or "html_content" in statement]
+        sqlite_session.expunge_all()
+
+    article_id = sqlite_session.query(Article.id).first()[0]
+    detail, statements = _capture_statements(sqlite_session, article_service.get_article_detail, article_id)
+    assert detail["content"] == ""
+    assert "markdown_content" in statements[0] and "html_content" in statements[0]
+
+
+@pytest.mark.parametrize("comment_count", [0, 5, 300])
+def test_get_article_detail_query_count_is_constant(sqlite_session, comment_count):
+    """文章详情的SQL语句数量不随标签和评论数量增长，评论在SQL中筛选已审核的，按顶层评论分页"""
+    _seed_articles(sqlite_session, 1)
+    article = sqlite_session.query(Article).one()
+    article.tags = [Tag(name=f"标签{i}") for i in range(5)]
+    sqlite_session.add_all([
+        Comment(
+            article_id=article.id, author=f"读者{i}", content=f"评论{i}",
+            create_time=datetime(2024, 1, 1, 0, 0, i % 60, i), is_approved=i % 3 != 0
+        )
+        for i in range(comment_count)
+    ])
+    sqlite_session.commit()
+    article_id = article.id
+    sqlite_session.expunge_all()
+    approved = [f"评论{i}" for i in range(comment_count) if i % 3 != 0]
+
+    detail, statement_count = _count_statements(
+        sqlite_session, article_service.get_article_detail, article_id, comment_page=2, comment_page_size=20
+    )
+
+    assert detail["category"]["name"] == "分类0"
+    assert detail["tags"] == [f"标签{i}" for i in range(5)]
+    assert [comment["content"] for comment in detail["comments"]] == approved[20:40]
+    assert detail["commentPagination"]["total"] == len(approved)
+    assert detail["commentPagination"]["totalPages"] == (len(approved) + 19) // 20
+    # 文章和分类、标签、评论树各一次查询
+    assert statement_count == 3
+
+
+def test_get_article_comments_builds_nested_threads(sqlite_session, monkeypatch):
+    """评论按回复关系嵌套，超过最大层数的回复与父评论并列，未审核评论及其回复不显示"""
+    monkeypatch.setattr(article_service, "COMMENT_MAX_DEPTH", 2)
+    _seed_articles(sqlite_session, 1)
+    article_id = sqlite_session.query(Article.id).scalar()
+
+    def add(content, parent=None, approved=True):
+        comment = Comment(
+            article_id=article_id, author="读者", content=content,
+            parent_id=parent.id if parent else None, is_approved=approved
+        )
+        sqlite_session.add(comment)
+        sqlite_session.flush()
+        return comment
+
+    first = add("一楼")
+    reply = add("回复一楼", first)
+    nested = add("回复的回复", reply)
+    add("第三层回复", nested)
+    hidden = add("未审核", first, approved=False)
+    add("未审核评论的回复", hidden)
+    add("二楼")
+    add("再次回复一楼", first)
+    sqlite_session.commit()
+
+    threads, total, total_pages = article_service.get_article_comments(sqlite_session, article_id, page_size=1)
+
+    assert (total, total_pages) == (2, 2)
+    assert len(threads) == 1
+
+    def shape(nodes):
+        return [(node["content"], shape(node["replies"])) for node in nodes]
+
+    assert shape(threads) == [("一楼", [
+        ("回复一楼", [("回复的回复", []), ("第三层回复", [])]),
+        ("再次回复一楼", []),
+    ])]
+    assert threads[0]["replies"][0]["replies"][1]["parentId"] == nested.id
+
+    threads, _, _ = article_service.get_article_comments(sqlite_session, article_id, page_size=1, current_page=2)
+    assert shape(threads) == [("二楼", [])]
+
+
+def test_get_categories_single_query_and_cache(sqlite_session):
+    """分类及文章数量通过一次分组查询获取，并在缓存失效前复用结果"""
+    _seed_articles(sqlite_session, 12)
+    sqlite_session.add(Category(name="空分类", slug="empty"))
+    sqlite_session.commit()
+
+    categories, statement_count = _count_statements(sqlite_session, article_service.get_categories)
+
+    assert statement_count == 1
+    counts = {category["slug"]: category["articleCount"] for category in categories}
+    assert counts["category-0"] == 3
+    assert counts["category-4"] == 2
+    assert counts["empty"] == 0
+
+    # 命中缓存，不再访问数据库
+    _, statement_count = _count_statements(sqlite_session, article_service.get_categories)
+    assert statement_count == 0
+
+    # 同步完成后缓存失效，重新查询
+    article_service.invalidate_category_cache()
+    _, statement_count = _count_statements(sqlite_session, article_service.get_categories)
+    assert statement_count == 1
+
+
+@pytest.mark.parametrize("sort_by", list(article_service.ARTICLE_SORT_OPTIONS))
+def test_get_article_list_by_cursor_walks_all_pages(sqlite_session, sort_by):
+    """游标分页按页遍历的结果与完整排序一致，且不执行COUNT查询"""
+    _seed_articles(sqlite_session, 23)
+    # 制造相同排序值，验证ID决胜
+    for article in sqlite_session.query(Article).all():
+        article.view_count = article.id % 3
+    sqlite_session.commit()
+
+    column, descending = article_service.ARTICLE_SORT_OPTIONS[sort_by]
+    expected = sorted(
+        sqlite_session.query(Article).all(),
+        key=lambda article: (getattr(article, column.key), article.id),
+        reverse=descending
+    )
+
+    seen = []
+    cursor = None
+    while True:
+        (articles, cursor, total), statement_count = _count_statements(
+            sqlite_session, article_service.get_article_list_by_cursor,
+            page_size=5, cursor=cursor, sort_by=sort_by
+        )
+        assert total is None
+        assert statement_count == 1
+        seen.extend(article["articleId"] for article in articles)
+        if cursor is None:
+            break
+
+    assert seen == [str(article.id) for article in expected]
+
+
+def test_get_article_list_by_cursor_with_total(sqlite_session):
+    """请求总数时额外执行一次COUNT查询"""
+    _seed_articles(sqlite_session, 7)
+
+    (articles, cursor, total), statement_count = _count_statements(
+        sqlite_session, article_service.get_article_list_by_cursor, page_size=10, with_total=True
+    )
+
+    assert len(articles) == 7
+    assert cursor is None
+    assert total == 7
+    assert statement_count == 2
+
+
+def test_get_article_list_by_cursor_rejects_invalid_cursor(sqlite_session):
+    """无效游标或排序方式不匹配时抛出ValueError"""
+    _seed_articles(sqlite_session, 3)
+    _, cursor, _ = article_service.get_article_list_by_cursor(
+        sqlite_session, page_size=1, sort_by="viewCount_desc"
+    )
+
+    with pytest.raises(ValueError):
+        article_service.get_article_list_by_cursor(sqlite_session, cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        article_service.get_article_list_by_cursor(sqlite_session, cursor=cursor, sort_by="createTime_desc")
+
+
+def test_flush_view_counts_batches_increments(sqlite_session):
+    """缓冲的阅读计数以一条批量UPDATE落库，且不修改update_time"""
+    from services.view_counter import view_count_buffer
+
+    _seed_articles(sqlite_session, 3)
+    articles = sqlite_session.query(Article).order_by(Article.id).all()
+    update_times = {article.id: article.update_time for article in articles}
+    first, second = articles[0].id, articles[1].id
+
+    for _ in range(5):
+        article_service.increment_view_count(first)
+    article_service.increment_view_count(second)
+
+    flushed, statement_count = _count_statements(sqlite_session, view_count_buffer.flush)
+
+    assert flushed == 6
+    assert statement_count == 1
+    assert view_count_buffer.pending(first) == 0
+
+    sqlite_session.expire_all()
+    refreshed = {article.id: article for article in sqlite_session.query(Article).all()}
+    assert refreshed[first].view_count == 5
+    assert refreshed[second].view_count == 1
+    assert all(refreshed[article_id].update_time == update_times[article_id] for article_id in refreshed)
+
+    # 缓冲为空时不访问数据库
+    flushed, statement_count = _count_statements(sqlite_session, view_count_buffer.flush)
+    assert flushed == 0
+    assert statement_count == 0
+
+
+def test_flush_view_counts_restores_on_failure():
+    """落库失败时计数回到缓冲中，不会丢失"""
+    from services.view_counter import view_count_buffer
+
+    article_service.increment_view_count(7)
+    failing_session = MagicMock()
+    failing_session.execute.side_effect = RuntimeError("数据库不可用")
+
+    with pytest.raises(RuntimeError):
+        view_count_buffer.flush(failing_session)
+
+    failing_session.rollback.assert_called_once()
+    assert view_count_buffer.pending(7) == 1
+
+
+def test_async_read_functions_match_sync(tmp_path):
+    """读取函数通过run_db在aiosqlite异步会话中执行，返回与同步会话相同的结果"""
+    import asyncio
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from database import Base, create_async_session_factory, run_db
+
+    db_path = tmp_path / "async.db"
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    _seed_articles(session, 12)
+    article_id = session.query(Article.id).order_by(Article.id).first()[0]
+
+    expected_list = article_service.get_article_list(session, page_size=5, current_page=2)
+    expected_cursor = article_service.get_article_list_by_cursor(session, page_size=5, with_total=True)
+    expected_detail = article_service.get_article_detail(session, article_id)
+    expected_search = article_service.search_articles(session, keyword="测试", page_size=5)
+    article_service.invalidate_category_cache()
+
+    async def run():
+        async_engine, session_factory = create_async_session_factory(f"sqlite+aiosqlite:///{db_path}")
+        try:
+            async with session_factory() as db:
+                return (
+                    await run_db(db, article_service.get_categories),
+                    await run_db(db, article_service.get_article_list, page_size=5, current_page=2),
+                    await run_db(db, article_service.get_article_list_by_cursor, page_size=5, with_total=True),
+                    await run_db(db, article_service.get_article_detail, article_id),
+                    await article_service.search_articles_async(db, keyword="测试", page_size=5),
+                )
+        finally:
+            await async_engine.dispose()
+
+    try:
+        categories, article_list, cursor_page, detail, search = asyncio.run(run())
+        assert len(categories) == 5
+        assert article_list == expected_list
+        assert cursor_page == expected_cursor
+        assert detail == expected_detail
+        assert search == expected_search
+    finally:
+        session.close()
+        engine.dispose()
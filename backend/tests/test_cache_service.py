@@ -0,0 +1,150 @@
+import pytest
+import os
+import sys
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import cache_service
+from services.cache_service import MemoryCacheBackend, RedisCacheBackend, ResponseCache
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(MemoryCacheBackend(max_entries=2), ttl=60)
+
+
+def test_get_or_build_caches_result(cache):
+    """未命中时调用builder并缓存，命中时不再调用"""
+    calls = []
+
+    def builder():
+        calls.append(1)
+        return {"list": [{"articleId": "1", "viewCount": 3}]}
+
+    value, cached = cache.get_or_build("article_list", {"pageSize": 10}, builder)
+    assert not cached
+    value["list"][0]["viewCount"] = 100
+
+    value, cached = cache.get_or_build("article_list", {"pageSize": 10}, builder)
+    assert cached
+    assert len(calls) == 1
+    # 每次命中返回独立副本，调用方的修改不会污染缓存
+    assert value["list"][0]["viewCount"] == 3
+
+    # 参数不同使用不同的缓存键
+    _, cached = cache.get_or_build("article_list", {"pageSize": 20}, builder)
+    assert not cached
+
+
+def test_none_is_not_cached(cache):
+    """builder返回None（如文章不存在）时不缓存"""
+    assert cache.get_or_build("article_detail", {"articleId": 1}, lambda: None) == (None, False)
+    value, cached = cache.get_or_build("article_detail", {"articleId": 1}, lambda: {"title": "新文章"})
+    assert value == {"title": "新文章"}
+    assert not cached
+
+
+def test_invalidate_bumps_content_version(cache):
+    """同步完成后递增内容版本，旧缓存全部失效"""
+    cache.get_or_build("category", {}, lambda: ["旧分类"])
+    cache.invalidate()
+    value, cached = cache.get_or_build("category", {}, lambda: ["新分类"])
+    assert value == ["新分类"]
+    assert not cached
+
+
+def test_memory_backend_lru_and_ttl():
+    """超过容量时淘汰最久未使用的条目，过期条目视为未命中"""
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set("a", "1", ttl=60)
+    backend.set("b", "2", ttl=60)
+    assert backend.get("a") == "1"
+    backend.set("c", "3", ttl=60)
+
+    assert backend.get("b") is None
+    assert backend.get("a") == "1"
+    assert backend.get("c") == "3"
+
+    with patch("services.cache_service.time.monotonic", return_value=10 ** 9):
+        assert backend.get("a") is None
+
+
+def test_disabled_cache_always_builds():
+    """关闭缓存时每次都调用builder"""
+    cache = ResponseCache(None)
+    assert cache.get_or_build("category", {}, lambda: [1]) == ([1], False)
+    assert cache.get_or_build("category", {}, lambda: [2]) == ([2], False)
+    cache.invalidate()
+
+
+def test_async_get_or_build_runs_backend_off_event_loop(cache):
+    """异步版本在线程池中读写缓存后端，builder只负责查询；与同步版本共用缓存条目"""
+    import asyncio
+    import threading
+
+    loop_thread = threading.get_ident()
+    backend_threads = []
+    original_get = cache.backend.get
+
+    def recording_get(key):
+        backend_threads.append(threading.get_ident())
+        return original_get(key)
+
+    cache.backend.get = recording_get
+    calls = []
+
+    async def builder():
+        calls.append(1)
+        return ["分类"]
+
+    async def run():
+        first = await cache.get_or_build_with_validators_async("category", {}, builder, lambda value: {"etag": "x"})
+        second = await cache.get_or_build_with_validators_async("category", {}, builder, lambda value: {"etag": "y"})
+        return first, second, await cache.get_validators_async("category", {})
+
+    first, second, validators = asyncio.run(run())
+    assert first == (["分类"], {"etag": "x"}, False)
+    assert second == (["分类"], {"etag": "x"}, True)
+    assert validators == {"etag": "x"}
+    assert len(calls) == 1
+    assert backend_threads and loop_thread not in backend_threads
+    assert cache.get_or_build_with_validators("category", {}, lambda: None, lambda value: {})[2]
+
+
+def test_redis_backend_timeout_is_cache_miss():
+    """Redis接受连接但不响应时，读写在超时后按未命中处理"""
+    import socket
+    import time
+
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    try:
+        backend = RedisCacheBackend(f"redis://127.0.0.1:{server.getsockname()[1]}/0", timeout=0.05)
+        cache = ResponseCache(backend)
+        start = time.monotonic()
+        value, cached = cache.get_or_build("article_list", {"page": 1}, lambda: {"list": []})
+        assert value == {"list": []}
+        assert not cached
+        assert time.monotonic() - start < 2
+    finally:
+        server.close()
+
+
+def test_memory_backend_uses_short_ttl_and_warns_for_multiple_workers(monkeypatch, caplog):
+    """进程内缓存使用单独的较短过期时间，多worker部署时记录警告"""
+    monkeypatch.setattr(cache_service, "RESPONSE_CACHE_BACKEND", "memory")
+    monkeypatch.setattr(cache_service, "RESPONSE_CACHE_MEMORY_TTL", 60)
+    monkeypatch.setattr(cache_service, "WEB_CONCURRENCY", 1)
+    with caplog.at_level("WARNING", logger=cache_service.logger.name):
+        cache = cache_service.create_response_cache()
+    assert isinstance(cache.backend, MemoryCacheBackend)
+    assert cache.ttl == 60
+    assert not caplog.records
+
+    monkeypatch.setattr(cache_service, "WEB_CONCURRENCY", 4)
+    with caplog.at_level("WARNING", logger=cache_service.logger.name):
+        cache_service.create_response_cache()
+    assert "RESPONSE_CACHE_BACKEND=redis" in caplog.text
@@ -1,14 +1,14 @@
 import pytest
 import os
 import sys
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, PropertyMock
 from datetime import datetime
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services import github_service
-from models import SyncStatus, Category, Article
+from models import SyncStatus, Category, Article, Tag
 
 
 @pytest.fixture
@@ -146,30 +146,611 @@ def test_sync_repository(
     assert mock_update_sync_status.call_count == 2  # 开始和完成时各调用一次
 
 
-@patch.object(github_service, "process_markdown_file")
-@patch("os.path.isdir")
-@patch("os.listdir")
-def test_process_directory(
-    mock_listdir,
-    mock_isdir,
-    mock_process_markdown_file,
-    mock_db_session
+@pytest.fixture
+def sqlite_session():
+    """基于SQLite内存数据库的真实会话"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from database import Base
+
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+def _write_repo(root, files):
+    """在临时目录中创建Markdown文件，files为{相对路径: 内容}"""
+    for relative_path, content in files.items():
+        path = root / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+
+
+def test_parse_markdown_file(tmp_path):
+    """解析阶段提取标题、预览和去重后的标签，不访问数据库"""
+    path = tmp_path / "note.md"
+    path.write_text("# 我的文章\n正文 #python #python #go #fastapi", encoding="utf-8")
+
+    parsed = github_service.parse_markdown_file(str(path))
+
+    assert parsed["title"] == "我的文章"
+    assert parsed["slug"] == "我的文章"
+    assert parsed["preview"].startswith("正文")
+    assert parsed["tag_names"] == ["python", "fastapi"]
+    assert parsed["source_file"] == str(path)
+    assert parsed["html_content"].startswith("<h1") and "我的文章</h1>" in parsed["html_content"]
+
+
+def test_render_markdown_extensions(tmp_path):
+    """渲染HTML时支持表格、代码高亮和标题锚点；内容哈希与已渲染的一致时不渲染"""
+    path = tmp_path / "note.md"
+    path.write_text(
+        "# 标题\n\n## Section\n\n| a | b |\n|---|---|\n| 1 | 2 |\n\n```python\nprint(1)\n```\n",
+        encoding="utf-8"
+    )
+
+    parsed = github_service.parse_markdown_file(str(path))
+
+    assert '<h2 id="section">Section</h2>' in parsed["html_content"]
+    assert "<table>" in parsed["html_content"]
+    assert 'class="codehilite"' in parsed["html_content"]
+    assert github_service.parse_markdown_file(str(path), parsed["content_hash"])["html_content"] is None
+
+
+def test_process_directory_backfills_html(sqlite_session, tmp_path, monkeypatch):
+    """升级前同步的文章HTML为空，内容不变时只补写HTML，不更新update_time"""
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    _write_repo(tmp_path, {"docs/a.md": "# 文章A\n**内容**"})
+    github_service.process_directory(str(tmp_path), sqlite_session)
+    sqlite_session.query(Article).update(
+        {Article.html_content: "", Article.source_mtime: None}, synchronize_session=False
+    )
+    sqlite_session.commit()
+    update_time = sqlite_session.query(Article.update_time).scalar()
+
+    github_service.process_directory(str(tmp_path), sqlite_session)
+
+    sqlite_session.expire_all()
+    article = sqlite_session.query(Article).one()
+    assert "<strong>内容</strong>" in article.html_content
+    assert article.update_time == update_time
+
+
+def test_walk_markdown_files_skips_git_and_blacklist(tmp_path):
+    """遍历阶段跳过.git目录和非Markdown文件，根目录文件归入未分类"""
+    _write_repo(tmp_path, {
+        "root.md": "# 根目录",
+        "python/a.md": "# A",
+        "python/readme.txt": "不是Markdown",
+        ".git/objects/x.md": "# 不应处理",
+    })
+
+    walked = list(github_service.walk_markdown_files(str(tmp_path)))
+
+    assert walked == [
+        (str(tmp_path / "root.md"), "未分类", "uncategorized"),
+        (str(tmp_path / "python" / "a.md"), "python", "python"),
+    ]
+
+
+def test_walk_markdown_files_prunes_blacklisted_directories(tmp_path, monkeypatch):
+    """黑名单目录整体跳过，不再检查其中的子目录和文件"""
+    from utils.path_filter import BlacklistMatcher
+
+    _write_repo(tmp_path, {
+        "python/a.md": "# A",
+        "python/draft.tmp.md": "# 草稿",
+        "private/b.md": "# B",
+        "private/deep/c.md": "# C",
+    })
+    matcher = BlacklistMatcher(["glob:private"], ["glob:*.tmp.md"])
+    checked = []
+    original_match_path = matcher.match_path
+
+    def recording_match_path(path):
+        checked.append(path)
+        return original_match_path(path)
+
+    matcher.match_path = recording_match_path
+    monkeypatch.setattr(github_service, "blacklist_matcher", matcher)
+
+    walked = [file_path for file_path, _, _ in github_service.walk_markdown_files(str(tmp_path))]
+
+    assert walked == [str(tmp_path / "python" / "a.md")]
+    assert not [path for path in checked if str(tmp_path / "private") + os.sep in path]
+
+
+def test_process_directory_skips_blacklisted_keywords(sqlite_session, tmp_path, monkeypatch):
+    """内容包含黑名单关键词的文件不写入，之前已同步的文章被删除"""
+    from utils.path_filter import BlacklistMatcher
+
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    _write_repo(tmp_path, {"python/a.md": "# 文章A\n公开内容", "python/b.md": "# 文章B\n公开内容"})
+    github_service.process_directory(str(tmp_path), sqlite_session)
+    assert sqlite_session.query(Article).count() == 2
+
+    monkeypatch.setattr(github_service, "blacklist_matcher", BlacklistMatcher(keywords=["内部资料"]))
+    _write_repo(tmp_path, {"python/b.md": "# 文章B\n这是内部资料", "python/c.md": "# 文章C\n内部资料"})
+    failed = github_service.process_directory(str(tmp_path), sqlite_session)
+
+    assert failed == 0
+    titles = {title for (title,) in sqlite_session.query(Article.title).all()}
+    assert titles == {"文章A"}
+
+
+@pytest.mark.parametrize("executor_kind", ["serial", "thread", "process"])
+def test_process_directory(sqlite_session, tmp_path, executor_kind, monkeypatch):
+    """测试处理目录功能：各种解析方式写入的结果一致，按批次提交"""
+    files = {f"category{i % 3}/article{i}.md": f"# 文章{i}\n内容{i} #tag{i % 4}" for i in range(25)}
+    _write_repo(tmp_path, files)
+    # 无法解码的文件在解析阶段失败，不影响其他文件
+    (tmp_path / "broken.md").write_bytes(b"\xff\xfe\x00")
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", executor_kind)
+    monkeypatch.setattr(github_service, "SYNC_WORKERS", 2)
+    monkeypatch.setattr(github_service, "SYNC_PARSE_CHUNK_SIZE", 4)
+    monkeypatch.setattr(github_service, "SYNC_BATCH_SIZE", 10)
+
+    github_service.process_directory(str(tmp_path), sqlite_session)
+
+    articles = sqlite_session.query(Article).all()
+    assert len(articles) == 25
+    by_title = {article.title: article for article in articles}
+    assert by_title["文章4"].category.slug == "category1"
+    assert [tag.name for tag in by_title["文章5"].tags] == ["tag1"]
+    # 三个子目录分类 + 根目录的未分类
+    assert sqlite_session.query(Category).count() == 4
+    assert sqlite_session.query(Tag).count() == 4
+
+
+def test_process_directory_isolates_failed_article(sqlite_session, tmp_path, monkeypatch):
+    """批次提交失败时逐篇重试，只丢弃出错的文章"""
+    _write_repo(tmp_path, {f"docs/article{i}.md": f"# 文章{i}" for i in range(5)})
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    original_write_batch = github_service.ArticleWriter._write_batch
+
+    def failing_write_batch(self, items):
+        if any(parsed["title"] == "文章2" for parsed, _ in items):
+            raise ValueError("写入失败")
+        return original_write_batch(self, items)
+
+    monkeypatch.setattr(github_service.ArticleWriter, "_write_batch", failing_write_batch)
+
+    github_service.process_directory(str(tmp_path), sqlite_session)
+
+    titles = sorted(article.title for article in sqlite_session.query(Article).all())
+    assert titles == ["文章0", "文章1", "文章3", "文章4"]
+
+
+def test_article_writer_statement_count_is_constant(sqlite_session, tmp_path):
+    """每批写入的SQL语句数量固定，不随文章和标签数量增长"""
+    from sqlalchemy import event
+
+    _write_repo(tmp_path, {f"docs/article{i}.md": f"# 文章{i}\n#tag{i} #common" for i in range(40)})
+    category_ids = github_service.ensure_categories(sqlite_session, {"docs": "docs"})
+    parsed = [github_service.parse_markdown_file(str(tmp_path / "docs" / f"article{i}.md")) for i in range(40)]
+
+    statements = []
+    engine = sqlite_session.get_bind()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        writer = github_service.ArticleWriter(sqlite_session, batch_size=40)
+        for item in parsed:
+            writer.add(item, category_ids["docs"])
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+    assert writer.written == 40
+    # 加载标签、插入新标签、查询新标签ID、查询已有文章、插入文章、查询文章ID、插入标签关联
+    assert len(statements) == 7
+    assert sqlite_session.query(Tag).count() == 41
+
+
+def test_process_directory_updates_existing_articles(sqlite_session, tmp_path, monkeypatch):
+    """再次同步时更新已有文章的内容和标签，不产生重复文章"""
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    _write_repo(tmp_path, {"docs/a.md": "# 文章A\n旧内容 #old_tag", "docs/b.md": "# 文章B\n内容"})
+    github_service.process_directory(str(tmp_path), sqlite_session)
+
+    _write_repo(tmp_path, {"docs/a.md": "# 文章A\n新内容 #new_tag"})
+    github_service.process_directory(str(tmp_path), sqlite_session)
+
+    sqlite_session.expire_all()
+    articles = {article.title: article for article in sqlite_session.query(Article).all()}
+    assert len(articles) == 2
+    assert "新内容" in articles["文章A"].markdown_content
+    assert [tag.name for tag in articles["文章A"].tags] == ["new_tag"]
+    assert articles["文章A"].view_count == 0
+
+
+def test_process_directory_matches_tags_case_insensitively(sqlite_session, tmp_path, monkeypatch):
+    """标签按不区分大小写比较，与MySQL唯一索引一致：已有标签被复用，同一篇文章不重复关联"""
+    from models import Tag
+
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    sqlite_session.add(Tag(name="Python"))
+    sqlite_session.commit()
+    _write_repo(tmp_path, {
+        "docs/a.md": "# 文章A\n#python #PYTHON",
+        "docs/b.md": "# 文章B\n#FastAPI",
+        "docs/c.md": "# 文章C\n#fastapi",
+    })
+    github_service.process_directory(str(tmp_path), sqlite_session)
+
+    sqlite_session.expire_all()
+    assert sorted(tag.name for tag in sqlite_session.query(Tag).all()) == ["FastAPI", "Python"]
+    articles = {article.title: article for article in sqlite_session.query(Article).all()}
+    assert [tag.name for tag in articles["文章A"].tags] == ["Python"]
+    assert [tag.name for tag in articles["文章C"].tags] == ["FastAPI"]
+
+
+def test_process_directory_keeps_one_article_per_file_for_duplicate_titles(sqlite_session, tmp_path, monkeypatch):
+    """不同文件的标题相同（例如多个index.md）时各自对应一篇文章，slug加路径后缀区分，再次同步不互相抢占"""
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    _write_repo(tmp_path, {"python/index.md": "内容A", "go/index.md": "内容B"})
+    github_service.process_directory(str(tmp_path), sqlite_session)
+
+    articles = {article.source_file: (article.id, article.slug) for article in sqlite_session.query(Article).all()}
+    assert len(articles) == 2
+    assert len({slug for _, slug in articles.values()}) == 2
+    assert all(slug.startswith("index") for _, slug in articles.values())
+
+    # 只修改其中一个文件后再次同步，两篇文章的ID和slug都保持不变
+    _write_repo(tmp_path, {"go/index.md": "新内容B"})
+    github_service.process_directory(str(tmp_path), sqlite_session)
+
+    sqlite_session.expire_all()
+    resynced = {article.source_file: article for article in sqlite_session.query(Article).all()}
+    assert {source_file: (article.id, article.slug) for source_file, article in resynced.items()} == articles
+    assert resynced[str(tmp_path / "go" / "index.md")].markdown_content == "新内容B"
+    assert resynced[str(tmp_path / "python" / "index.md")].markdown_content == "内容A"
+
+
+def test_process_directory_skips_unchanged_files(sqlite_session, tmp_path, monkeypatch):
+    """再次同步未变化的仓库时不读取文件，也不改写文章和update_time"""
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    _write_repo(tmp_path, {f"docs/article{i}.md": f"# 文章{i}\n内容{i}" for i in range(5)})
+    github_service.process_directory(str(tmp_path), sqlite_session)
+    update_times = dict(sqlite_session.query(Article.id, Article.update_time).all())
+    assert all(article.content_hash for article in sqlite_session.query(Article).all())
+
+    parsed_files = []
+    original_parse = github_service.parse_markdown_file
+
+    def counting_parse(file_path, rendered_hash=None):
+        parsed_files.append(file_path)
+        return original_parse(file_path, rendered_hash)
+
+    rendered = []
+    original_render = github_service.render_markdown
+
+    def counting_render(content):
+        rendered.append(content)
+        return original_render(content)
+
+    monkeypatch.setattr(github_service, "parse_markdown_file", counting_parse)
+    monkeypatch.setattr(github_service, "render_markdown", counting_render)
+    github_service.process_directory(str(tmp_path), sqlite_session)
+    assert parsed_files == []
+
+    # 只修改了文件时间：重新解析但内容哈希相同，只更新文件信息
+    touched = tmp_path / "docs" / "article1.md"
+    stat = touched.stat()
+    os.utime(touched, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    indexed = []
+    monkeypatch.setattr(github_service.search_service.search_index, "index_articles", indexed.extend)
+    github_service.process_directory(str(tmp_path), sqlite_session)
+
+    assert parsed_files == [str(touched)]
+    # 内容哈希与已保存的HTML一致，不重新渲染
+    assert rendered == []
+    assert indexed == []
+    sqlite_session.expire_all()
+    article = sqlite_session.query(Article).filter(Article.source_file == str(touched)).one()
+    assert article.source_mtime == stat.st_mtime_ns + 10 ** 9
+    assert dict(sqlite_session.query(Article.id, Article.update_time).all()) == update_times
+
+
+def test_process_directory_does_not_index_unpublished_articles(sqlite_session, tmp_path, monkeypatch):
+    """未发布的文章内容变化时不写入全文索引，并从索引中删除"""
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    _write_repo(tmp_path, {"docs/draft.md": "# 草稿\n旧内容", "docs/post.md": "# 文章\n旧内容"})
+    github_service.process_directory(str(tmp_path), sqlite_session)
+    draft = sqlite_session.query(Article).filter(Article.title == "草稿").one()
+    draft.is_published = False
+    sqlite_session.commit()
+
+    indexed, removed = [], []
+    monkeypatch.setattr(github_service.search_service.search_index, "index_articles", indexed.extend)
+    monkeypatch.setattr(github_service.search_service.search_index, "remove_articles", removed.extend)
+    _write_repo(tmp_path, {"docs/draft.md": "# 草稿\n新内容", "docs/post.md": "# 文章\n新内容"})
+    github_service.process_directory(str(tmp_path), sqlite_session)
+
+    post = sqlite_session.query(Article).filter(Article.title == "文章").one()
+    assert [article_id for article_id, _, _ in indexed] == [post.id]
+    assert removed == [draft.id]
+
+
+def test_process_directory_backfills_hash_for_legacy_articles(sqlite_session, tmp_path, monkeypatch):
+    """升级前同步的文章没有内容哈希，正文相同时只补写哈希，不更新update_time"""
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    _write_repo(tmp_path, {"docs/a.md": "# 文章A\n内容"})
+    github_service.process_directory(str(tmp_path), sqlite_session)
+    sqlite_session.query(Article).update(
+        {Article.content_hash: None, Article.source_mtime: None, Article.source_size: None},
+        synchronize_session=False
+    )
+    sqlite_session.commit()
+    update_time = sqlite_session.query(Article.update_time).scalar()
+
+    github_service.process_directory(str(tmp_path), sqlite_session)
+
+    sqlite_session.expire_all()
+    article = sqlite_session.query(Article).one()
+    assert article.content_hash is not None
+    assert article.source_size == len("# 文章A\n内容".encode("utf-8"))
+    assert article.update_time == update_time
+
+
+def _commit_files(repo, root, files=None, removed=(), renamed=None, message="更新文章"):
+    """在测试仓库中写入、删除或重命名文件并提交"""
+    import git
+
+    for relative_path, content in (files or {}).items():
+        _write_repo(root, {relative_path: content})
+        repo.index.add([relative_path])
+    for relative_path in removed:
+        repo.index.remove([relative_path], working_tree=True)
+    for old_path, new_path in (renamed or {}).items():
+        (root / new_path).parent.mkdir(parents=True, exist_ok=True)
+        repo.index.move([old_path, new_path])
+    actor = git.Actor("测试", "test@example.com")
+    return repo.index.commit(message, author=actor, committer=actor).hexsha
+
+
+@pytest.fixture
+def origin_repo(tmp_path):
+    """本地的源仓库，作为同步的远程地址"""
+    import git
+
+    root = tmp_path / "origin"
+    root.mkdir()
+    repo = git.Repo.init(root)
+    _commit_files(repo, root, {
+        "python/a.md": "# 文章A\n内容A #python",
+        "python/b.md": "# 文章B\n内容B",
+        "go/c.md": "# 文章C\n内容C",
+    }, message="初始化")
+    return repo, root
+
+
+def test_sync_repository_applies_changes_incrementally(sqlite_session, tmp_path, origin_repo, monkeypatch):
+    """按上次同步的提交计算变更，增量处理新增、修改、删除和重命名"""
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    repo, root = origin_repo
+    target_dir = str(tmp_path / "content")
+
+    github_service.sync_repository(str(root), target_dir, sqlite_session)
+    first_commit = repo.head.commit.hexsha
+    assert github_service.get_sync_status(sqlite_session)["last_synced_commit"] == first_commit
+    articles = {article.title: article for article in sqlite_session.query(Article).all()}
+    assert set(articles) == {"文章A", "文章B", "文章C"}
+    article_a_id = articles["文章A"].id
+    article_b_id = articles["文章B"].id
+
+    head = _commit_files(
+        repo, root,
+        files={"python/a.md": "# 文章A\n新内容A #python", "go/d.md": "# 文章D\n内容D"},
+        removed=["go/c.md"],
+        renamed={"python/b.md": "go/b.md"},
+    )
+
+    # 增量同步不应执行全量扫描
+    def fail_full_scan(*args, **kwargs):
+        raise AssertionError("不应执行全量扫描")
+
+    monkeypatch.setattr(github_service, "process_directory", fail_full_scan)
+    github_service.sync_repository(str(root), target_dir, sqlite_session)
+
+    sqlite_session.expire_all()
+    articles = {article.title: article for article in sqlite_session.query(Article).all()}
+    assert set(articles) == {"文章A", "文章B", "文章D"}
+    assert articles["文章A"].id == article_a_id
+    assert "新内容A" in articles["文章A"].markdown_content
+    # 重命名后仍是同一篇文章，分类随目录变化
+    assert articles["文章B"].id == article_b_id
+    assert articles["文章B"].category.slug == "go"
+    assert articles["文章B"].source_file == os.path.join(target_dir, "go/b.md")
+    assert github_service.get_sync_status(sqlite_session)["last_synced_commit"] == head
+
+    # 没有新的提交时不处理任何文件
+    monkeypatch.setattr(github_service, "ingest_files", fail_full_scan)
+    github_service.sync_repository(str(root), target_dir, sqlite_session)
+    assert github_service.get_sync_status(sqlite_session)["status"] == "completed"
+
+
+def test_sync_repository_title_change_keeps_article(sqlite_session, tmp_path, origin_repo, monkeypatch):
+    """修改标题后slug变化，仍更新同一篇文章而不是新建"""
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    repo, root = origin_repo
+    target_dir = str(tmp_path / "content")
+    github_service.sync_repository(str(root), target_dir, sqlite_session)
+    article_id = sqlite_session.query(Article.id).filter(Article.title == "文章A").scalar()
+
+    _commit_files(repo, root, files={"python/a.md": "# 新标题A\n内容A"})
+    github_service.sync_repository(str(root), target_dir, sqlite_session)
+
+    sqlite_session.expire_all()
+    article = sqlite_session.get(Article, article_id)
+    assert article.title == "新标题A"
+    assert article.slug == "新标题a"
+    assert sqlite_session.query(Article).count() == 3
+
+
+def test_sync_repository_falls_back_to_full_scan(sqlite_session, tmp_path, origin_repo, monkeypatch):
+    """上次同步的提交在本地不存在时执行全量扫描，并删除源文件已不存在的文章"""
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    repo, root = origin_repo
+    target_dir = str(tmp_path / "content")
+    github_service.sync_repository(str(root), target_dir, sqlite_session)
+
+    _commit_files(repo, root, removed=["go/c.md"])
+    status = sqlite_session.query(SyncStatus).order_by(SyncStatus.id.desc()).first()
+    status.last_synced_commit = "0" * 40
+    sqlite_session.commit()
+
+    github_service.sync_repository(str(root), target_dir, sqlite_session)
+
+    titles = {title for (title,) in sqlite_session.query(Article.title).all()}
+    assert titles == {"文章A", "文章B"}
+    assert github_service.get_sync_status(sqlite_session)["last_synced_commit"] == repo.head.commit.hexsha
+
+
+@pytest.fixture
+def shallow_clone_options(monkeypatch, origin_repo):
+    """开启浅克隆、部分克隆和稀疏检出；使用file://地址，本地路径克隆会忽略--depth"""
+    repo, root = origin_repo
+    with repo.config_writer() as config:
+        config.set_value("uploadpack", "allowFilter", "true")
+    monkeypatch.setattr(github_service, "SYNC_EXECUTOR", "serial")
+    monkeypatch.setattr(github_service, "GIT_CLONE_DEPTH", 1)
+    monkeypatch.setattr(github_service, "GIT_CLONE_FILTER", "blob:none")
+    monkeypatch.setattr(github_service, "GIT_SINGLE_BRANCH", True)
+    monkeypatch.setattr(github_service, "GIT_SPARSE_PATHS", ["python"])
+    return root.as_uri()
+
+
+def test_sync_repository_shallow_sparse_clone(sqlite_session, tmp_path, origin_repo, shallow_clone_options, monkeypatch):
+    """浅克隆只包含最新提交，稀疏检出只同步配置的目录，后续拉取仍按提交增量同步"""
+    import git
+
+    repo, root = origin_repo
+    target_dir = str(tmp_path / "content")
+    _commit_files(repo, root, files={"python/a.md": "# 文章A\n第二版 #python"})
+
+    github_service.sync_repository(shallow_clone_options, target_dir, sqlite_session)
+
+    local = git.Repo(target_dir)
+    assert local.git.rev_parse("--is-shallow-repository") == "true"
+    assert len(list(local.iter_commits())) == 1
+    assert not os.path.exists(os.path.join(target_dir, "go"))
+    titles = {title for (title,) in sqlite_session.query(Article.title).all()}
+    assert titles == {"文章A", "文章B"}
+
+    head = _commit_files(repo, root, files={"python/a.md": "# 文章A\n第三版 #python", "go/d.md": "# 文章D\n内容D"})
+
+    def fail_full_scan(*args, **kwargs):
+        raise AssertionError("不应执行全量扫描")
+
+    monkeypatch.setattr(github_service, "process_directory", fail_full_scan)
+    github_service.sync_repository(shallow_clone_options, target_dir, sqlite_session)
+
+    sqlite_session.expire_all()
+    contents = {article.title: article.markdown_content for article in sqlite_session.query(Article).all()}
+    assert set(contents) == {"文章A", "文章B"}
+    assert "第三版" in contents["文章A"]
+    assert local.git.rev_parse("--is-shallow-repository") == "true"
+    assert github_service.get_sync_status(sqlite_session)["last_synced_commit"] == head
+
+
+def test_sync_repository_fetches_missing_commit_after_fresh_clone(
+    sqlite_session, tmp_path, origin_repo, shallow_clone_options, monkeypatch
 ):
-    """测试处理目录功能"""
-    # 模拟目录内容
-    mock_listdir.return_value = ["file1.md", "file2.md", "subdir"]
-    mock_isdir.side_effect = lambda path: "subdir" in path
-    
-    # 模拟分类查询
-    mock_category = MagicMock(spec=Category)
-    mock_category.id = 1
-    mock_query = mock_db_session.query.return_value
-    mock_query.filter.return_value.first.return_value = mock_category
-    
-    # 调用处理目录函数
-    github_service.process_directory("./test_content", mock_db_session)
-    
-    # 验证调用
-    assert mock_process_markdown_file.call_count == 2  # 处理两个markdown文件
-    mock_process_markdown_file.assert_any_call(os.path.join("./test_content", "file1.md"), mock_category.id, mock_db_session)
-    mock_process_markdown_file.assert_any_call(os.path.join("./test_content", "file2.md"), mock_category.id, mock_db_session)
\ No newline at end of file
+    """工作目录丢失后重新浅克隆，单独拉取上次同步的提交用于计算变更，不执行全量扫描"""
+    import shutil
+
+    repo, root = origin_repo
+    target_dir = str(tmp_path / "content")
+    github_service.sync_repository(shallow_clone_options, target_dir, sqlite_session)
+
+    _commit_files(repo, root, files={"python/b.md": "# 文章B\n新内容B"}, removed=["python/a.md"])
+    shutil.rmtree(target_dir)
+
+    def fail_full_scan(*args, **kwargs):
+        raise AssertionError("不应执行全量扫描")
+
+    monkeypatch.setattr(github_service, "process_directory", fail_full_scan)
+    github_service.sync_repository(shallow_clone_options, target_dir, sqlite_session)
+
+    sqlite_session.expire_all()
+    contents = {article.title: article.markdown_content for article in sqlite_session.query(Article).all()}
+    assert set(contents) == {"文章B"}
+    assert "新内容B" in contents["文章B"]
+
+
+def test_sync_repository_full_scan_when_sparse_paths_change(
+    sqlite_session, tmp_path, origin_repo, shallow_clone_options, monkeypatch
+):
+    """稀疏检出的目录变化后执行全量扫描：新加入目录的文章被写入，移出目录的文章被删除"""
+    repo, root = origin_repo
+    target_dir = str(tmp_path / "content")
+    github_service.sync_repository(shallow_clone_options, target_dir, sqlite_session)
+    assert {title for (title,) in sqlite_session.query(Article.title).all()} == {"文章A", "文章B"}
+
+    # 没有新的提交，但稀疏检出加入了go目录
+    monkeypatch.setattr(github_service, "GIT_SPARSE_PATHS", ["python", "go"])
+    github_service.sync_repository(shallow_clone_options, target_dir, sqlite_session)
+    assert {title for (title,) in sqlite_session.query(Article.title).all()} == {"文章A", "文章B", "文章C"}
+
+    monkeypatch.setattr(github_service, "GIT_SPARSE_PATHS", ["go"])
+    github_service.sync_repository(shallow_clone_options, target_dir, sqlite_session)
+    assert {title for (title,) in sqlite_session.query(Article.title).all()} == {"文章C"}
+    assert github_service.get_sync_status(sqlite_session)["last_synced_commit"] == repo.head.commit.hexsha
+
+
+def test_sync_repository_pulls_default_branch_on_detached_head(
+    sqlite_session, tmp_path, origin_repo, shallow_clone_options, monkeypatch
+):
+    """未配置GIT_BRANCH且工作目录的HEAD处于分离状态时，浅克隆拉取远程仓库的默认分支"""
+    import git
+
+    repo, root = origin_repo
+    target_dir = str(tmp_path / "content")
+    github_service.sync_repository(shallow_clone_options, target_dir, sqlite_session)
+    local = git.Repo(target_dir)
+    local.git.checkout("--detach")
+    assert local.head.is_detached
+
+    head = _commit_files(repo, root, files={"python/a.md": "# 文章A\n新内容A"})
+    github_service.sync_repository(shallow_clone_options, target_dir, sqlite_session)
+
+    assert local.head.commit.hexsha == head
+    assert github_service.get_sync_status(sqlite_session)["last_synced_commit"] == head
+
+
+def test_get_default_branch_requires_git_branch_when_unknown():
+    """HEAD处于分离状态且无法确定远程默认分支时，提示设置GIT_BRANCH"""
+    import git
+
+    repo = MagicMock()
+    type(repo).active_branch = PropertyMock(side_effect=TypeError("HEAD is a detached symbolic reference"))
+    repo.git.symbolic_ref.side_effect = git.GitCommandError("symbolic-ref", 128)
+    repo.git.ls_remote.return_value = ""
+
+    with pytest.raises(ValueError, match="GIT_BRANCH"):
+        github_service.get_default_branch(repo)
+
+
+def test_get_changed_files_parses_name_status():
+    """解析--name-status -z输出，包括重命名和中文路径"""
+    repo = MagicMock()
+    repo.git.diff.return_value = "M\x00a.md\x00A\x00新建/文章.md\x00D\x00c.md\x00R087\x00old.md\x00new/old.md\x00"
+
+    changed, deleted = github_service.get_changed_files(repo, "old", "new")
+
+    assert changed == ["a.md", "新建/文章.md", "new/old.md"]
+    assert deleted == ["c.md", "old.md"]
@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ip_set import IPSet, parse_ip
+
+
+def test_exact_addresses_and_normalization():
+    """单个地址按规范化后的值匹配，IPv6的不同写法和IPv4映射地址视为同一地址"""
+    ip_set = IPSet(["1.2.3.4", "2001:db8::1", "", " 10.0.0.1 "])
+
+    assert "1.2.3.4" in ip_set
+    assert "::ffff:1.2.3.4" in ip_set
+    assert "2001:0db8:0000:0000:0000:0000:0000:0001" in ip_set
+    assert " 10.0.0.1" in ip_set
+    assert "1.2.3.5" not in ip_set
+    assert "2001:db8::2" not in ip_set
+    assert len(ip_set) == 3
+
+
+def test_cidr_networks():
+    """IPv4和IPv6网段按前缀匹配，/0匹配同版本的所有地址"""
+    ip_set = IPSet(["192.168.0.0/16", "10.1.2.3/8", "2001:db8::/32", "::ffff:172.16.0.0/108"])
+
+    assert "192.168.255.1" in ip_set
+    assert "192.169.0.1" not in ip_set
+    # 非严格模式：主机位会被清零
+    assert "10.200.0.1" in ip_set
+    assert "2001:db8:ffff::1" in ip_set
+    assert "2001:db9::1" not in ip_set
+    assert "172.16.5.5" in ip_set
+    assert "172.32.0.1" not in ip_set
+
+    everything = IPSet(["0.0.0.0/0"])
+    assert "8.8.8.8" in everything
+    assert "::1" not in everything
+
+
+def test_invalid_entries_and_lookups():
+    """无法解析的条目被忽略，无法解析的客户端IP（如测试客户端的主机名）不匹配"""
+    ip_set = IPSet(["not-an-ip", "300.1.1.1", "10.0.0.0/33", "1.1.1.1"])
+
+    assert len(ip_set) == 1
+    assert ip_set.add("bad") is False
+    assert "testclient" not in ip_set
+    assert "" not in ip_set
+    assert None not in ip_set
+
+
+def test_ttl_entries_expire_in_memory():
+    """设置了过期时间的地址到期后从集合中删除，重新添加时以最新的过期时间为准"""
+    ip_set = IPSet()
+    ip_set.add("1.1.1.1", ttl=0)
+    ip_set.add("2.2.2.2", ttl=60)
+    ip_set.add("3.3.3.3", ttl=0)
+    ip_set.add("3.3.3.3", ttl=60)
+    ip_set.add("4.4.4.4")
+    time.sleep(0.001)
+
+    assert "1.1.1.1" not in ip_set
+    assert "2.2.2.2" in ip_set
+    assert "3.3.3.3" in ip_set
+    assert len(ip_set) == 3
+    assert parse_ip("1.1.1.1") not in ip_set.addresses
+
+    ip_set.discard("4.4.4.4")
+    assert "4.4.4.4" not in ip_set
@@ -0,0 +1,302 @@
+import hashlib
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from redis.commands.core import AsyncScript
+from redis.connection import Encoder
+from redis.exceptions import NoScriptError
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from middlewares import IPMiddleware, RateLimiter
+from middlewares.local_bucket import LocalTokenBucket
+from utils.ip_set import IPSet
+
+
+class FakeRedis:
+    """
+    模拟中间件用到的Redis命令，evalsha按限流脚本的逻辑执行：
+    先检查黑名单，令牌桶按键累计消耗的令牌数，超过burst后拒绝（清空令牌桶）并累加限流计数；
+    每个令牌按1秒恢复，拒绝时需等待1.5秒后重试
+    """
+
+    def __init__(self, burst: int = 3, fail: bool = False):
+        self.burst = burst
+        self.fail = fail
+        self.data = {}
+        self.calls = []
+        self.scripts = set()
+        self.connection_pool = SimpleNamespace(get_encoder=lambda: Encoder("utf-8", "strict", False))
+
+    def register_script(self, script):
+        return AsyncScript(self, script)
+
+    async def script_load(self, script):
+        self.calls.append(("script_load",))
+        sha = hashlib.sha1(script.encode()).hexdigest()
+        self.scripts.add(sha)
+        return sha
+
+    async def evalsha(self, sha, numkeys, key, blacklist_key, auto_blacklist_key, counter_key,
+                      rate, burst, now, requested, threshold, expire, check_only, whitelisted):
+        self.calls.append(("evalsha", key))
+        if self.fail:
+            raise ConnectionError("redis不可用")
+        if sha not in self.scripts:
+            raise NoScriptError("NOSCRIPT No matching script. Please use EVAL.")
+        if not whitelisted and (blacklist_key in self.data or auto_blacklist_key in self.data):
+            return [2, 0, 0, 0, 0]
+        if check_only:
+            return [0, 0, 0, 0, 0]
+        used = self.data.get(key, 0) + requested
+        if used <= self.burst:
+            self.data[key] = used
+            return [0, self.burst - used, 0, 0, used * 1000]
+        self.data[key] = self.burst
+        if whitelisted:
+            return [1, 0, 0, 1500, self.burst * 1000]
+        count = self.data.get(counter_key, 0) + 1
+        self.data[counter_key] = count
+        if count >= threshold:
+            self.data[blacklist_key] = "1"
+            return [3, 0, count, 1500, self.burst * 1000]
+        return [1, 0, count, 1500, self.burst * 1000]
+
+    async def exists(self, key):
+        self.calls.append(("exists", key))
+        if self.fail:
+            raise ConnectionError("redis不可用")
+        return int(key in self.data)
+
+async def hello(request):
+    return JSONResponse({"message": "ok"})
+
+
+async def stream(request):
+    async def chunks():
+        for i in range(3):
+            yield f"chunk{i}\n".encode()
+
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+def build_stack(redis_client, whitelist=None, blacklist=None, threshold=2, **limiter_options):
+    """按main.py中的顺序组装中间件：后添加的RateLimiter在外层，IPMiddleware在内层"""
+    app = Starlette(routes=[Route("/hello", hello), Route("/stream", stream), Route("/docs", hello)])
+    auto_blacklist = IPSet()
+    ip_filter = IPMiddleware(
+        app, whitelist=whitelist, blacklist=blacklist,
+        redis_url="redis://localhost:6379/0", check_auto_blacklist=True, auto_blacklist=auto_blacklist,
+    )
+    limiter = RateLimiter(
+        ip_filter, redis_url="redis://localhost:6379/0", redis_password=None,
+        rate_limit_per_minute=60, burst_limit=3, exempt_paths=["/docs"],
+        auto_blacklist_threshold=threshold, auto_blacklist_expire=60, auto_blacklist=auto_blacklist,
+        whitelist=whitelist, **limiter_options,
+    )
+    limiter.redis_pool = redis_client
+    limiter.limit_script = redis_client.register_script(limiter.LIMIT_SCRIPTS[limiter.algorithm])
+    ip_filter.redis_pool = redis_client
+    return TestClient(limiter), limiter
+
+
+def test_allowed_request_gets_rate_limit_headers():
+    """允许的请求原样返回，并带有速率限制头；流式响应逐块转发"""
+    client, _ = build_stack(FakeRedis())
+
+    response = client.get("/hello", headers={"X-Forwarded-For": "1.2.3.4, 10.0.0.1"})
+    assert response.status_code == 200
+    assert response.json() == {"message": "ok"}
+    assert response.headers["X-RateLimit-Limit"] == "60"
+    assert response.headers["X-RateLimit-Remaining"] == "2"
+    # 恢复满额的时间由脚本返回（消耗1个令牌，1秒后恢复）
+    assert 0 < int(response.headers["X-RateLimit-Reset"]) - time.time() <= 2
+
+    response = client.get("/stream", headers={"X-Forwarded-For": "1.2.3.4"})
+    assert response.text == "chunk0\nchunk1\nchunk2\n"
+    assert response.headers["X-RateLimit-Remaining"] == "1"
+
+
+def test_rate_limited_requests_and_auto_blacklist():
+    """超过限制返回429，触发次数达到阈值后被自动拉黑，返回403"""
+    redis_client = FakeRedis(burst=1)
+    client, limiter = build_stack(redis_client, threshold=2)
+    headers = {"X-Forwarded-For": "5.6.7.8"}
+
+    assert client.get("/hello", headers=headers).status_code == 200
+    response = client.get("/hello", headers=headers)
+    assert response.status_code == 429
+    assert response.json() == {"detail": "请求过于频繁，请稍后再试"}
+    assert response.headers["X-RateLimit-Remaining"] == "0"
+    assert response.headers["Retry-After"] == "2"
+
+    assert client.get("/hello", headers=headers).status_code == 429
+    assert "5.6.7.8" in limiter.auto_blacklist
+    assert redis_client.data["ip_blacklist:5.6.7.8"] == "1"
+
+    response = client.get("/hello", headers=headers)
+    assert response.status_code == 403
+    assert response.json() == {"detail": "您的IP已被临时禁止访问此服务，请稍后再试"}
+    # 其他IP不受影响
+    assert client.get("/hello", headers={"X-Forwarded-For": "9.9.9.9"}).status_code == 200
+
+
+def test_static_blacklist_whitelist_and_exempt_paths():
+    """静态黑名单返回403，白名单和豁免路径不经过速率限制"""
+    redis_client = FakeRedis()
+    client, _ = build_stack(redis_client, whitelist=["10.0.0.1"], blacklist=["6.6.6.6", "203.0.113.0/24"])
+
+    for ip in ("6.6.6.6", "203.0.113.77"):
+        response = client.get("/hello", headers={"X-Forwarded-For": ip})
+        assert response.status_code == 403
+        assert response.json() == {"detail": "您的IP已被禁止访问此服务"}
+
+    response = client.get("/docs", headers={"X-Forwarded-For": "1.1.1.1"})
+    assert response.status_code == 200
+    assert "X-RateLimit-Limit" not in response.headers
+    # 豁免路径只检查黑名单，不消耗令牌
+    assert "rate_limit:1.1.1.1" not in redis_client.data
+
+
+def test_whitelisted_ip_bypasses_blacklists_but_is_rate_limited():
+    """白名单中的IP不因Redis中的自动黑名单被拒绝，超过限制时返回429但不会被加入黑名单"""
+    redis_client = FakeRedis(burst=1)
+    client, limiter = build_stack(redis_client, whitelist=["10.0.0.0/8"], threshold=1)
+    redis_client.data["auto_blacklist:10.0.0.1"] = "1"
+    headers = {"X-Forwarded-For": "10.0.0.1"}
+
+    assert client.get("/docs", headers=headers).status_code == 200
+    assert client.get("/hello", headers=headers).status_code == 200
+    for _ in range(3):
+        assert client.get("/hello", headers=headers).status_code == 429
+    assert "10.0.0.1" not in limiter.auto_blacklist
+    assert "ip_blacklist:10.0.0.1" not in redis_client.data
+
+
+def test_redis_failure_falls_back_to_local_bucket():
+    """Redis不可用时只使用本地令牌桶限流，sync_interval内不再访问Redis"""
+    redis_client = FakeRedis(fail=True)
+    client, _ = build_stack(redis_client, sync_interval=60)
+
+    statuses = [client.get("/hello").status_code for _ in range(4)]
+    assert statuses == [200, 200, 200, 429]
+    assert len(redis_client.calls) == 1
+
+
+def test_redis_failure_on_exempt_path_skips_auto_blacklist_lookup():
+    """豁免路径执行脚本失败时，IPMiddleware不再单独查询Redis中的自动黑名单"""
+    redis_client = FakeRedis(fail=True)
+    client, _ = build_stack(redis_client)
+
+    assert client.get("/docs", headers={"X-Forwarded-For": "1.2.3.4"}).status_code == 200
+    assert [call[0] for call in redis_client.calls] == ["evalsha"]
+
+
+def test_redis_failure_fallback_strictness():
+    """fallback_factor按比例缩小Redis不可用时的本地限额，fallback为open时不限流"""
+    client, _ = build_stack(FakeRedis(fail=True), sync_interval=60, fallback_factor=0.5)
+    # 第一个请求在发现Redis不可用前已按完整限额消耗了本地令牌
+    statuses = [client.get("/hello").status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+
+    client, _ = build_stack(FakeRedis(fail=True), fallback="open")
+    for _ in range(5):
+        response = client.get("/hello")
+        assert response.status_code == 200
+        assert "X-RateLimit-Limit" not in response.headers
+
+
+def test_local_bucket_syncs_consumption_in_batches():
+    """本地有令牌时不访问Redis，消耗累计到sync_batch后批量同步"""
+    redis_client = FakeRedis(burst=3)
+    client, limiter = build_stack(redis_client, sync_batch=2, sync_interval=60)
+    redis_client.scripts.add(limiter.limit_script.sha)
+    headers = {"X-Forwarded-For": "1.2.3.4"}
+
+    # 第一个请求总是同步（检查黑名单），之后每2个请求同步一次
+    statuses = [client.get("/hello", headers=headers).status_code for _ in range(3)]
+    assert statuses == [200, 200, 200]
+    assert [call[0] for call in redis_client.calls] == ["evalsha", "evalsha"]
+    assert redis_client.data["rate_limit:1.2.3.4"] == 3
+
+    # 本地令牌耗尽后由Redis判定
+    response = client.get("/hello", headers=headers)
+    assert response.status_code == 429
+    assert len(redis_client.calls) == 3
+
+
+def test_local_bucket_lru_eviction():
+    """本地令牌桶超过max_keys时淘汰最久未访问的键"""
+    buckets = LocalTokenBucket(max_keys=2)
+    buckets.consume("a", 0.0, 60, 3)
+    buckets.consume("b", 0.0, 60, 3)
+    buckets.consume("a", 1.0, 60, 3)
+    buckets.consume("c", 1.0, 60, 3)
+
+    assert len(buckets) == 2
+    assert buckets.get("b") is None
+    # 按速率填充：1秒填充1个令牌，不超过容量
+    assert buckets.get("a").tokens == 2
+    assert buckets.get("a").pending == 2
+
+
+def test_single_redis_round_trip_per_request():
+    """脚本已加载时每个请求只调用一次evalsha，IPMiddleware不再单独查询自动黑名单"""
+    redis_client = FakeRedis()
+    client, limiter = build_stack(redis_client)
+    redis_client.scripts.add(limiter.limit_script.sha)
+
+    for path in ("/docs", "/hello"):
+        redis_client.calls.clear()
+        assert client.get(path, headers={"X-Forwarded-For": "1.2.3.4"}).status_code == 200
+        assert [call[0] for call in redis_client.calls] == ["evalsha"]
+
+
+def test_script_reloaded_after_noscript():
+    """Redis丢失脚本缓存（如重启）后自动重新加载脚本，请求正常处理"""
+    redis_client = FakeRedis()
+    client, limiter = build_stack(redis_client)
+
+    response = client.get("/hello", headers={"X-Forwarded-For": "1.2.3.4"})
+    assert response.status_code == 200
+    assert response.headers["X-RateLimit-Remaining"] == "2"
+    assert [call[0] for call in redis_client.calls] == ["evalsha", "script_load", "evalsha"]
+
+    redis_client.scripts.clear()
+    redis_client.calls.clear()
+    assert client.get("/hello", headers={"X-Forwarded-For": "1.2.3.4"}).status_code == 200
+    assert ("script_load",) in redis_client.calls
+
+
+def test_algorithm_selects_limit_script():
+    """按algorithm选择限流脚本，不支持的算法在初始化时报错"""
+    limiter = RateLimiter(None, redis_url="redis://localhost:6379/0", redis_password=None, algorithm="gcra")
+    assert "redis.pcall('get', key)" in limiter.LIMIT_SCRIPTS[limiter.algorithm]
+    with pytest.raises(ValueError):
+        RateLimiter(None, redis_url="redis://localhost:6379/0", redis_password=None, algorithm="fixed_window")
+
+
+def test_shared_auto_blacklist_skips_redis():
+    """自动黑名单在两个中间件间共享，命中内存中的条目时不访问Redis，过期后恢复"""
+    redis_client = FakeRedis()
+    client, limiter = build_stack(redis_client)
+    limiter.add_to_blacklist("7.7.7.7")
+
+    response = client.get("/hello", headers={"X-Forwarded-For": "7.7.7.7"})
+    assert response.status_code == 403
+    assert redis_client.calls == []
+
+    # 两个中间件持有同一个集合
+    ip_filter = limiter.app
+    assert ip_filter.auto_blacklist is limiter.auto_blacklist
+
+    limiter.auto_blacklist.add("7.7.7.7", ttl=0)
+    assert client.get("/hello", headers={"X-Forwarded-For": "7.7.7.7"}).status_code == 200
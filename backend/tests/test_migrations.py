@@ -0,0 +1,134 @@
+import pytest
+import os
+import re
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from migrations import drop_obsolete_indexes, ensure_columns, ensure_indexes
+from services import article_service
+
+COMPOSITE_INDEXES = {
+    "ix_articles_published_create_time",
+    "ix_articles_published_view_count",
+    "ix_articles_published_comment_count",
+    "ix_articles_category_published_create_time",
+}
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+def test_ensure_indexes_adds_missing_indexes(engine):
+    """已有数据库缺少组合索引时，升级过程会补齐"""
+    # 模拟旧版本数据库：表已存在但没有组合索引
+    with engine.begin() as conn:
+        for name in COMPOSITE_INDEXES:
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+
+    created = ensure_indexes(engine)
+
+    assert set(created) == COMPOSITE_INDEXES
+    existing = {index["name"] for index in inspect(engine).get_indexes("articles")}
+    assert COMPOSITE_INDEXES <= existing
+
+    # 再次执行不会重复创建
+    assert ensure_indexes(engine) == []
+
+
+def test_ensure_columns_adds_missing_nullable_columns(engine):
+    """已有数据库缺少新增的列时，升级过程会以可空列补齐"""
+    # 模拟旧版本数据库：articles表没有变更检测相关的列
+    with engine.begin() as conn:
+        for column in ("content_hash", "source_mtime", "source_size"):
+            conn.exec_driver_sql(f"ALTER TABLE articles DROP COLUMN {column}")
+
+    added = ensure_columns(engine)
+
+    assert set(added) == {"articles.content_hash", "articles.source_mtime", "articles.source_size"}
+    columns = {column["name"]: column for column in inspect(engine).get_columns("articles")}
+    assert columns["content_hash"]["nullable"]
+    assert ensure_columns(engine) == []
+
+
+@pytest.mark.parametrize("category_id", [None, "1"])
+@pytest.mark.parametrize("sort_by", list(article_service.ARTICLE_SORT_OPTIONS))
+def test_list_queries_use_composite_indexes(engine, sort_by, category_id):
+    """文章列表查询通过组合索引完成筛选和排序，不产生额外排序（filesort）"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    session = sessionmaker(bind=engine)()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        article_service.get_article_list(session, category_id=category_id, sort_by=sort_by)
+        article_service.get_article_list_by_cursor(session, category_id=category_id, sort_by=sort_by)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        session.close()
+
+    assert statements
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            plan = " | ".join(
+                row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            )
+            assert re.search(r"USING (COVERING )?INDEX ix_articles_", plan), plan
+            assert "TEMP B-TREE" not in plan, plan
+
+
+def test_drop_obsolete_indexes(engine):
+    """升级时删除已被取代的评论索引，再次执行不会重复删除"""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE INDEX ix_comments_article_approved_create_time ON comments (article_id, is_approved, create_time)"
+        )
+
+    assert drop_obsolete_indexes(engine) == ["ix_comments_article_approved_create_time"]
+    existing = {index["name"] for index in inspect(engine).get_indexes("comments")}
+    assert existing >= {"ix_comments_article_approved_id"}
+    assert "ix_comments_article_approved_create_time" not in existing
+    assert drop_obsolete_indexes(engine) == []
+
+
+def test_comment_query_uses_composite_index(engine):
+    """评论树查询通过组合索引完成筛选和按ID排序，不产生额外排序"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    session = sessionmaker(bind=engine)()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        article_service.get_article_comments(session, article_id=1)
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+        session.close()
+
+    assert len(statements) == 1
+    statement, parameters = statements[0]
+    with engine.connect() as conn:
+        plan = " | ".join(
+            row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        )
+    assert "USING INDEX ix_comments_article_approved_id" in plan, plan
+    assert "TEMP B-TREE" not in plan, plan
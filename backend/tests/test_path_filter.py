@@ -0,0 +1,80 @@
+import os
+import re
+import sys
+
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.path_filter import BlacklistMatcher, glob_to_regex
+
+
+@pytest.mark.parametrize("glob, path, expected", [
+    ("*.md", "a.md", True),
+    ("*.md", "dir/a.md", False),
+    ("secret?", "secret1", True),
+    ("draft[0-9]", "draft7", True),
+    ("draft[!0-9]", "draft7", False),
+    ("**/tmp", "a/b/tmp", True),
+    ("**/tmp", "tmp", True),
+    ("notes/**", "notes/a/b.md", True),
+    ("a/**/b", "a/x/y/b", True),
+    ("a/**/b", "a/b", True),
+    ("a+b.md", "a+b.md", True),
+])
+def test_glob_to_regex(glob, path, expected):
+    """通配符转换：*不跨目录，**跨任意层目录，字符集合支持取反，其余字符按字面匹配"""
+    assert bool(re.fullmatch(glob_to_regex(glob), path)) is expected
+
+
+def test_blacklist_matcher_keeps_regex_semantics():
+    """不带前缀的条目仍按正则表达式匹配：目录条目搜索完整路径，文件条目搜索文件名"""
+    matcher = BlacklistMatcher(["private", r"temp\d+"], [r"password\.md", "secret.*"])
+
+    assert matcher.match_path("/repo/private/a.md")
+    assert matcher.match_path("/repo/notes/temp12")
+    assert matcher.match_path("/repo/notes/password.md")
+    assert matcher.match_path("/repo/notes/my-secret.md")
+    assert matcher.match_path("/repo/notes/a.md") is None
+    # 文件条目只匹配文件名
+    assert matcher.match_path("/repo/password.md/a.md") is None
+
+
+def test_blacklist_matcher_inline_flags_backreferences_and_invalid_entries():
+    """带全局标志和反向引用的条目与逐条re.search的结果一致，无效的条目被跳过而不是报错"""
+    matcher = BlacklistMatcher(["private"], ["password.md", "(?i)secret", r"(\w)\1\.md", "[unclosed"], [])
+
+    assert matcher.match_path("/repo/notes/SECRET.md")
+    assert matcher.match_path("/repo/notes/password.md")
+    assert matcher.match_path("/repo/notes/aa.md")
+    assert matcher.match_path("/repo/notes/ab.md") is None
+    # (?i)只作用于自身条目
+    assert matcher.match_path("/repo/notes/PASSWORD.md") is None
+    assert matcher.match_path("/repo/Private/a.md") is None
+
+
+def test_blacklist_matcher_glob_patterns():
+    """glob:前缀的条目按通配符匹配完整的路径段"""
+    matcher = BlacklistMatcher(["glob:drafts", "glob:archive/20*"], ["glob:*.tmp.md", "glob:docs/*/index.md"])
+
+    assert matcher.match_path("/repo/drafts")
+    assert matcher.match_path("/repo/drafts/a.md")
+    assert matcher.match_path("/repo/my-drafts/a.md") is None
+    assert matcher.match_path("/repo/archive/2019/a.md")
+    assert matcher.match_path("/repo/archive/1999/a.md") is None
+    assert matcher.match_path("/repo/notes/a.tmp.md")
+    assert matcher.match_path("/repo/notes/a.md") is None
+    assert matcher.match_path("/repo/docs/api/index.md")
+    assert matcher.match_path("/repo/docs/index.md") is None
+
+
+def test_blacklist_matcher_keywords():
+    """关键词按字面值匹配，忽略大小写"""
+    matcher = BlacklistMatcher(keywords=["TODO: private", "a.b"])
+
+    assert matcher.match_content("# 标题\ntodo: PRIVATE 内容") == "todo: PRIVATE"
+    assert matcher.match_content("axb") is None
+    assert matcher.match_content("") is None
+    assert BlacklistMatcher().match_content("任何内容") is None
+    assert BlacklistMatcher().match_path("/repo/a.md") is None
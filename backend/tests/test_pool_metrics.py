@@ -0,0 +1,82 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pool_metrics import PoolMetrics, instrumented_pool_class, pool_metrics, render_prometheus
+
+
+@pytest.fixture
+def metered_engine(tmp_path):
+    """容量为1、不允许溢出的受监控连接池"""
+    metrics = PoolMetrics("test")
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=instrumented_pool_class(QueuePool, metrics),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    metrics.attach(engine)
+    pool_metrics["test"] = metrics
+    try:
+        yield engine, metrics
+    finally:
+        pool_metrics.pop("test", None)
+        engine.dispose()
+
+
+def test_pool_metrics_counts_checkouts_and_timeouts(metered_engine):
+    """连接池事件累加取出/归还次数，连接耗尽时记录超时和等待时间"""
+    engine, metrics = metered_engine
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        snapshot = metrics.snapshot()
+        assert snapshot["checked_out"] == 1
+        assert snapshot["size"] == 1
+
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["connects"] == 1
+    assert snapshot["checkouts"] == 1
+    assert snapshot["checkins"] == 1
+    assert snapshot["timeouts"] == 1
+    assert snapshot["wait_count"] == 2
+    assert snapshot["wait_max"] >= 0.05
+    assert snapshot["checked_out"] == 0
+
+
+def test_pool_metrics_survive_dispose(metered_engine):
+    """引擎dispose重建连接池后，监控仍然生效"""
+    engine, metrics = metered_engine
+    engine.dispose()
+
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    snapshot = metrics.snapshot()
+    assert snapshot["checkouts"] == 1
+    assert snapshot["wait_count"] == 1
+    assert snapshot["checked_in"] == 1
+
+
+def test_render_prometheus(metered_engine):
+    """导出Prometheus文本格式，直方图的累计计数与总数一致"""
+    engine, _ = metered_engine
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+    output = render_prometheus()
+    assert "# TYPE db_pool_checkouts_total counter" in output
+    assert f'db_pool_checkouts_total{{engine="test",pid="{os.getpid()}"}} 1' in output
+    assert f'db_pool_wait_seconds_bucket{{engine="test",pid="{os.getpid()}",le="+Inf"}} 1' in output
+    assert f'db_pool_wait_seconds_count{{engine="test",pid="{os.getpid()}"}} 1' in output
@@ -0,0 +1,150 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from middlewares.rate_limiter import (
+    ALGORITHM_GCRA, ALGORITHM_TOKEN_BUCKET, RateLimiter,
+    VERDICT_ALLOWED, VERDICT_BLACKLISTED, VERDICT_LIMITED, VERDICT_LIMITED_AND_BLACKLISTED,
+)
+
+# 设置TEST_REDIS_URL时在真实Redis中执行脚本，否则使用fakeredis[lua]，两者都不可用时跳过
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL")
+
+
+@pytest.fixture(scope="module")
+def redis_client():
+    """执行Lua脚本的Redis客户端"""
+    if TEST_REDIS_URL:
+        import redis
+
+        client = redis.Redis.from_url(TEST_REDIS_URL, decode_responses=True)
+        yield client
+        client.close()
+        return
+
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa", reason="fakeredis执行Lua脚本需要lupa（pip install fakeredis[lua]）")
+    yield fakeredis.FakeRedis(decode_responses=True)
+
+
+class ScriptRunner:
+    """按RateLimiter.run_limit_script的参数顺序执行限流脚本，每个实例使用独立的键"""
+
+    def __init__(self, redis_client, algorithm: str, rate: int = 60, burst: int = 3, threshold: int = 10):
+        self.redis_client = redis_client
+        self.script = redis_client.register_script(RateLimiter.LIMIT_SCRIPTS[algorithm])
+        self.rate = rate
+        self.burst = burst
+        self.threshold = threshold
+        prefix = f"test_rate_limit:{uuid.uuid4().hex}"
+        self.keys = [prefix, f"{prefix}:blacklist", f"{prefix}:auto_blacklist", f"{prefix}:counter"]
+
+    def __call__(self, now: int, requested: int = 1, check_only: bool = False, whitelisted: bool = False):
+        return self.script(
+            keys=self.keys,
+            args=[self.rate, self.burst, now, requested, self.threshold, 60,
+                  1 if check_only else 0, 1 if whitelisted else 0],
+        )
+
+    def cleanup(self):
+        self.redis_client.delete(*self.keys)
+
+
+@pytest.fixture(params=[ALGORITHM_TOKEN_BUCKET, ALGORITHM_GCRA])
+def run(request, redis_client):
+    runners = []
+
+    def factory(**options):
+        runner = ScriptRunner(redis_client, request.param, **options)
+        runners.append(runner)
+        return runner
+
+    yield factory
+    for runner in runners:
+        runner.cleanup()
+
+
+NOW = 1_700_000_000_000
+
+
+def test_burst_then_limited_with_retry_after(run):
+    """突发容量内的请求放行，剩余令牌递减；超出后拒绝，重试等待时间精确到毫秒"""
+    limit = run(rate=60, burst=3)
+
+    assert [limit(NOW)[:2] for _ in range(3)] == [[VERDICT_ALLOWED, 2], [VERDICT_ALLOWED, 1], [VERDICT_ALLOWED, 0]]
+    verdict, remaining, count, retry_after, reset_after = limit(NOW)
+    assert (verdict, remaining, count) == (VERDICT_LIMITED, 0, 1)
+    # 每分钟60个请求，每个令牌1000毫秒
+    assert retry_after == 1000
+    assert reset_after == 3000
+
+
+def test_tokens_refill_by_millisecond(run):
+    """令牌按毫秒连续恢复，不受整秒边界影响"""
+    limit = run(rate=120, burst=1)
+
+    assert limit(NOW)[0] == VERDICT_ALLOWED
+    verdict, _, _, retry_after, _ = limit(NOW + 200)
+    assert verdict == VERDICT_LIMITED
+    assert retry_after == 300
+    assert limit(NOW + 499)[0] == VERDICT_LIMITED
+    assert limit(NOW + 500)[0] == VERDICT_ALLOWED
+
+
+def test_batched_sync_drains_bucket(run):
+    """批量同步的消耗超过剩余容量时判定为限流并清空容量，之后按速率重新恢复"""
+    limit = run(rate=60, burst=3)
+
+    assert limit(NOW, requested=2)[:2] == [VERDICT_ALLOWED, 1]
+    verdict, remaining, _, retry_after, reset_after = limit(NOW, requested=5)
+    assert (verdict, remaining) == (VERDICT_LIMITED, 0)
+    assert retry_after == 1000
+    assert reset_after == 3000
+    assert limit(NOW + 999)[0] == VERDICT_LIMITED
+    assert limit(NOW + 2000)[0] == VERDICT_ALLOWED
+
+
+def test_violation_threshold_blacklists(run, redis_client):
+    """限流次数达到阈值时加入黑名单，之后的请求（包括只检查黑名单的豁免路径）都被拒绝"""
+    limit = run(rate=60, burst=1, threshold=2)
+
+    assert limit(NOW)[0] == VERDICT_ALLOWED
+    assert limit(NOW)[:3] == [VERDICT_LIMITED, 0, 1]
+    assert limit(NOW)[:3] == [VERDICT_LIMITED_AND_BLACKLISTED, 0, 2]
+    assert redis_client.get(limit.keys[1]) == "1"
+    assert 0 < redis_client.ttl(limit.keys[1]) <= 60
+    assert limit(NOW + 60000)[0] == VERDICT_BLACKLISTED
+    assert limit(NOW, requested=0, check_only=True)[0] == VERDICT_BLACKLISTED
+
+
+def test_check_only_and_whitelist(run, redis_client):
+    """只检查黑名单时不消耗令牌；白名单IP不检查黑名单，触发限流时不计数"""
+    limit = run(rate=60, burst=1, threshold=1)
+
+    assert limit(NOW, requested=0, check_only=True) == [VERDICT_ALLOWED, 0, 0, 0, 0]
+    assert limit(NOW)[0] == VERDICT_ALLOWED
+
+    redis_client.set(limit.keys[2], "1")
+    assert limit(NOW, whitelisted=True)[:3] == [VERDICT_LIMITED, 0, 0]
+    assert not redis_client.exists(limit.keys[1], limit.keys[3])
+    assert limit(NOW, requested=0, check_only=True)[0] == VERDICT_BLACKLISTED
+
+
+def test_switching_algorithm_resets_old_keys(redis_client):
+    """切换限流算法后旧算法留下的键类型不同，脚本删除后按满额处理而不是报WRONGTYPE"""
+    for old, new in ((ALGORITHM_TOKEN_BUCKET, ALGORITHM_GCRA), (ALGORITHM_GCRA, ALGORITHM_TOKEN_BUCKET)):
+        old_runner = ScriptRunner(redis_client, old, rate=60, burst=2)
+        new_runner = ScriptRunner(redis_client, new, rate=60, burst=2)
+        new_runner.keys = old_runner.keys
+        try:
+            assert old_runner(NOW)[0] == VERDICT_ALLOWED
+            assert new_runner(NOW)[:2] == [VERDICT_ALLOWED, 1]
+            assert new_runner(NOW)[:2] == [VERDICT_ALLOWED, 0]
+            assert new_runner(NOW)[0] == VERDICT_LIMITED
+        finally:
+            old_runner.cleanup()
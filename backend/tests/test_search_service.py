@@ -0,0 +1,180 @@
+import pytest
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from models import Article, Category
+from services import article_service, search_service
+from services.search_service import SearchIndex, tokenize, build_match_query
+
+
+@pytest.fixture
+def index():
+    """独立的内存全文索引"""
+    index = SearchIndex(":memory:")
+    yield index
+    index.close()
+
+
+@pytest.fixture
+def db_session():
+    engine = create_engine(
+        "sqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+
+
+def test_tokenize_cjk_bigrams_and_words():
+    """中文按二元组切分，英文按单词切分并转小写"""
+    assert tokenize("全文检索") == ["全文", "文检", "检索", "索"]
+    assert tokenize("使用FastAPI构建API") == ["使用", "用", "fastapi", "构建", "建", "api"]
+    assert tokenize("") == []
+
+
+def test_build_match_query():
+    """关键词转换为FTS5查询表达式"""
+    assert build_match_query("全文检索") == '"全文 文检 检索"'
+    assert build_match_query("检") == '"检"*'
+    assert build_match_query("Fast API") == '"fast"* AND "api"*'
+    # 引号等特殊字符不会进入查询表达式
+    assert build_match_query('"; DROP') == '"drop"*'
+    assert build_match_query("!!!") is None
+
+
+def test_search_cjk_phrase_and_single_char(index):
+    """中文短语需要相邻匹配，单字通过前缀匹配"""
+    index.index_articles([
+        (1, "全文检索入门", "介绍倒排索引"),
+        (2, "检查清单", "上线前的全面检查"),
+        (3, "全面文档", "文字检索以外的内容"),
+    ])
+
+    assert index.search("全文检索") == ([1], 1)
+    ids, total = index.search("检")
+    assert total == 3
+    assert set(ids) == {1, 2, 3}
+
+
+def test_search_prefix_and_ranking(index):
+    """英文前缀匹配，标题命中的文章排在前面"""
+    index.index_articles([
+        (1, "数据库笔记", "这里顺带提到了 postgresql 的用法"),
+        (2, "PostgreSQL 性能调优", "索引与执行计划"),
+    ])
+
+    ids, total = index.search("postgres")
+    assert total == 2
+    assert ids == [2, 1]
+
+
+def test_search_pagination_update_and_remove(index):
+    """分页、更新和删除索引"""
+    index.index_articles([(i, f"文章{i}", "共同的内容") for i in range(1, 6)])
+
+    ids, total = index.search("内容", limit=2, offset=4)
+    assert total == 5
+    assert len(ids) == 1
+
+    index.index_article(1, "文章1", "已经修改")
+    index.remove_articles([2])
+    assert index.search("内容")[1] == 3
+    assert index.search("修改") == ([1], 1)
+    assert index.document_count() == 4
+
+
+def test_search_cache_invalidated_by_other_process(tmp_path):
+    """其它worker写入同一个索引文件后，本进程缓存的搜索结果失效"""
+    path = str(tmp_path / "search_index.db")
+    reader, writer = SearchIndex(path), SearchIndex(path)
+    try:
+        writer.index_articles([(1, "文章1", "共同的内容")])
+        assert reader.search("内容") == ([1], 1)
+
+        writer.index_articles([(2, "文章2", "共同的内容")])
+        writer.remove_articles([1])
+        assert reader.search("内容") == ([2], 1)
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_search_does_not_cache_result_overtaken_by_write(index, monkeypatch):
+    """查询期间本进程写入了索引时，查询结果只返回不缓存，之后的查询能看到新写入的文章"""
+    index.index_articles([(1, "文章1", "共同的内容")])
+    original_ranked = index._ranked
+
+    def ranked_then_write(match, limit, offset):
+        result = original_ranked(match, limit, offset)
+        index.index_articles([(2, "文章2", "共同的内容")])
+        return result
+
+    monkeypatch.setattr(index, "_ranked", ranked_then_write)
+    assert index.search("内容") == ([1], 1)
+    monkeypatch.setattr(index, "_ranked", original_ranked)
+    assert index.search("内容")[1] == 2
+
+
+def test_search_articles_uses_index(db_session, index, monkeypatch):
+    """索引就绪时搜索按索引相关度返回文章，并过滤未发布的文章"""
+    category = Category(name="数据库", slug="database")
+    db_session.add(category)
+    db_session.flush()
+    db_session.add_all([
+        Article(title="索引原理", slug="a1", markdown_content="B+树索引原理", html_content="",
+                preview="B+树", category_id=category.id),
+        Article(title="随笔", slug="a2", markdown_content="顺便聊聊索引", html_content="",
+                preview="随笔", category_id=category.id),
+        Article(title="索引草稿", slug="a3", markdown_content="未发布的索引草稿", html_content="",
+                preview="草稿", is_published=False),
+    ])
+    db_session.commit()
+
+    assert index.rebuild(db_session) == 2
+
+    monkeypatch.setattr(search_service, "search_index", index)
+    monkeypatch.setattr(search_service, "is_ready", lambda: True)
+
+    articles, total, total_pages = article_service.search_articles(db_session, keyword="索引")
+
+    assert total == 2
+    assert total_pages == 1
+    assert [article["title"] for article in articles] == ["索引原理", "随笔"]
+    assert articles[0]["category"]["name"] == "数据库"
+
+
+def test_search_articles_drops_stale_index_entries(db_session, index, monkeypatch):
+    """索引中已取消发布的文章不返回，并从索引中删除，总数与返回结果一致"""
+    db_session.add_all([
+        Article(title="索引原理", slug="a1", markdown_content="B+树索引原理", html_content="", preview="B+树"),
+        Article(title="索引调优", slug="a2", markdown_content="索引调优", html_content="", preview="调优"),
+    ])
+    db_session.commit()
+    assert index.rebuild(db_session) == 2
+
+    draft = db_session.query(Article).filter(Article.slug == "a2").one()
+    draft.is_published = False
+    db_session.commit()
+
+    monkeypatch.setattr(search_service, "search_index", index)
+    monkeypatch.setattr(search_service, "is_ready", lambda: True)
+
+    articles, total, total_pages = article_service.search_articles(db_session, keyword="索引")
+    assert [article["title"] for article in articles] == ["索引原理"]
+    assert (total, total_pages) == (1, 1)
+    assert index.document_count() == 1
@@ -0,0 +1,100 @@
+# HTTP条件请求工具
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import Request, Response
+
+# 不参与ETag计算的易变字段：阅读数随每次访问变化，但不代表内容变化
+VOLATILE_FIELDS = ("viewCount",)
+
+
+def _strip_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _strip_volatile(item) for key, item in value.items() if key not in VOLATILE_FIELDS}
+    if isinstance(value, list):
+        return [_strip_volatile(item) for item in value]
+    return value
+
+
+def compute_etag(payload: Any) -> str:
+    """
+    根据响应内容计算强ETag，忽略阅读数等易变字段
+    """
+    canonical = json.dumps(_strip_volatile(payload), sort_keys=True, ensure_ascii=False, default=str)
+    return '"' + hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def latest_time(values: Iterable[Optional[str]]) -> Optional[datetime]:
+    """
+    返回ISO格式时间字符串中最晚的一个
+    """
+    parsed = [datetime.fromisoformat(value) for value in values if value]
+    return max(parsed) if parsed else None
+
+
+def build_validators(payload: Any, last_modified: Optional[datetime] = None) -> Dict[str, Optional[str]]:
+    """
+    生成响应的校验信息：ETag和Last-Modified（HTTP日期格式）
+    """
+    http_date = None
+    if last_modified is not None:
+        # 数据库中保存的是本地时间，转换为GMT
+        http_date = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+    return {"etag": compute_etag(payload), "lastModified": http_date}
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match使用弱比较，忽略W/前缀
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, validators: Dict[str, Optional[str]]) -> bool:
+    """
+    判断条件请求是否可以返回304
+    同时携带If-None-Match和If-Modified-Since时，以If-None-Match为准
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return _etag_matches(if_none_match, validators["etag"])
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.get("lastModified"):
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+            modified = parsedate_to_datetime(validators["lastModified"])
+            return modified <= since
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def apply_validators(response: Response, validators: Dict[str, Optional[str]]) -> None:
+    """
+    将校验信息写入响应头，并要求客户端和代理每次使用前重新校验
+    """
+    response.headers["ETag"] = validators["etag"]
+    if validators.get("lastModified"):
+        response.headers["Last-Modified"] = validators["lastModified"]
+    response.headers["Cache-Control"] = "no-cache"
+
+
+def not_modified_response(validators: Dict[str, Optional[str]]) -> Response:
+    """
+    构造不含响应体的304响应
+    """
+    response = Response(status_code=304)
+    apply_validators(response, validators)
+    return response
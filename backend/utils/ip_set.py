@@ -0,0 +1,136 @@
+# IP地址集合
+import heapq
+import ipaddress
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+if os.getenv("DEBUG_MODE") == "false":
+    logger.setLevel(logging.WARNING)
+
+# (IP版本, 地址的整数值)
+IPKey = Tuple[int, int]
+
+
+def parse_ip(ip: str) -> Optional[IPKey]:
+    """
+    将IP地址字符串解析为(版本, 整数值)，IPv4映射的IPv6地址（::ffff:a.b.c.d）按IPv4处理；
+    无法解析时返回None
+    """
+    try:
+        address = ipaddress.ip_address(ip.strip())
+    except ValueError:
+        return None
+    if address.version == 6 and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.version, int(address)
+
+
+class IPSet:
+    """
+    IP地址和CIDR网段的集合
+    单个地址保存在字典中按哈希查找，网段保存在按位的前缀树中（IPv4和IPv6各一棵），
+    查找耗时与集合大小无关，最多比较32/128位；
+    单个地址可以设置过期时间（秒），过期的地址在下次访问集合时从内存中删除
+    """
+
+    def __init__(self, entries: Iterable[str] = None):
+        # 地址 -> 过期时间（time.monotonic），None表示永不过期
+        self.addresses: Dict[IPKey, Optional[float]] = {}
+        # 前缀树节点为[0分支, 1分支, 是否为网段终点]
+        self.tries = {4: [None, None, False], 6: [None, None, False]}
+        self.networks: List[str] = []
+        # 过期时间的最小堆，元素为(过期时间, 地址)
+        self.expirations: List[Tuple[float, IPKey]] = []
+        for entry in entries or []:
+            if entry and entry.strip():
+                self.add(entry)
+
+    def add(self, entry: str, ttl: Optional[float] = None) -> bool:
+        """
+        添加IP地址或CIDR网段（如192.168.0.0/16、2001:db8::/32），ttl只对单个地址有效
+        条目无法解析时记录警告并返回False
+        """
+        entry = entry.strip()
+        if "/" not in entry:
+            key = parse_ip(entry)
+            if key is None:
+                logger.warning(f"忽略无法解析的IP地址: {entry}")
+                return False
+            if ttl is None:
+                self.addresses[key] = None
+            else:
+                expire_at = time.monotonic() + ttl
+                self.addresses[key] = expire_at
+                heapq.heappush(self.expirations, (expire_at, key))
+            return True
+
+        try:
+            network = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            logger.warning(f"忽略无法解析的IP网段: {entry}")
+            return False
+        if network.version == 6 and network.network_address.ipv4_mapped is not None and network.prefixlen >= 96:
+            network = ipaddress.ip_network(f"{network.network_address.ipv4_mapped}/{network.prefixlen - 96}")
+        node = self.tries[network.version]
+        value = int(network.network_address)
+        for bit_index in range(network.max_prefixlen - 1, network.max_prefixlen - 1 - network.prefixlen, -1):
+            bit = (value >> bit_index) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, False]
+            node = node[bit]
+        if not node[2]:
+            node[2] = True
+            self.networks.append(str(network))
+        return True
+
+    def discard(self, ip: str) -> None:
+        """
+        删除单个地址，不存在时忽略
+        """
+        key = parse_ip(ip)
+        if key is not None:
+            self.addresses.pop(key, None)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self.expirations and self.expirations[0][0] <= now:
+            expire_at, key = heapq.heappop(self.expirations)
+            # 地址重新添加过时堆中会有旧的过期时间，以字典中的为准
+            if self.addresses.get(key) == expire_at:
+                del self.addresses[key]
+
+    def __contains__(self, ip: str) -> bool:
+        if self.expirations:
+            self._expire()
+        key = parse_ip(ip) if ip else None
+        if key is None:
+            return False
+        if key in self.addresses:
+            return True
+        if not self.networks:
+            return False
+        version, value = key
+        node = self.tries[version]
+        max_prefixlen = 32 if version == 4 else 128
+        if node[2]:
+            return True
+        for bit_index in range(max_prefixlen - 1, -1, -1):
+            node = node[(value >> bit_index) & 1]
+            if node is None:
+                return False
+            if node[2]:
+                return True
+        return False
+
+    def __len__(self) -> int:
+        if self.expirations:
+            self._expire()
+        return len(self.addresses) + len(self.networks)
+
+    def __repr__(self) -> str:
+        address_types = {4: ipaddress.IPv4Address, 6: ipaddress.IPv6Address}
+        items = [str(address_types[version](value)) for version, value in self.addresses] + self.networks
+        return f"IPSet({items})"
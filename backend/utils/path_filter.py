@@ -0,0 +1,171 @@
+# 同步黑名单匹配
+import logging
+import os
+import re
+from typing import Iterable, List, Match, Optional, Pattern
+
+logger = logging.getLogger(__name__)
+if os.getenv("DEBUG_MODE") == "false":
+    logger.setLevel(logging.WARNING)
+
+# 以该前缀开头的黑名单条目按gitignore风格的通配符解释，其余条目仍按正则表达式解释
+GLOB_PREFIX = "glob:"
+
+
+def glob_to_regex(pattern: str) -> str:
+    """
+    将gitignore风格的通配符转换为正则表达式（不含锚点）
+    *匹配路径中一层内的任意字符，?匹配一个字符，**匹配任意层目录，[...]为字符集合（[!...]表示取反）
+    """
+    result = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            result.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            result.append("(?:/.*)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            result.append(".*")
+            i += 2
+        elif char == "*":
+            result.append("[^/]*")
+            i += 1
+        elif char == "?":
+            result.append("[^/]")
+            i += 1
+        elif char == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                result.append(re.escape(char))
+                i += 1
+                continue
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            result.append("[" + body.replace("\\", "\\\\") + "]")
+            i = end + 1
+        else:
+            result.append(re.escape(char))
+            i += 1
+    return "".join(result)
+
+
+# 条目开头的全局标志，如(?i)
+_GLOBAL_FLAGS_RE = re.compile(r"^\(\?([aimsux]+)\)")
+
+
+class CombinedPattern:
+    """
+    合并编译的多个正则表达式
+    不含分组的条目合并为一个分支表达式，开头的全局标志改写为只作用于该条目的(?i:...)；
+    含分组的条目（合并后反向引用\1等的编号会变化）单独编译，逐个匹配
+    """
+
+    def __init__(self, combined: Optional[Pattern], separate: List[Pattern]):
+        self.combined = combined
+        self.separate = separate
+
+    def search(self, text: str) -> Optional[Match]:
+        if self.combined is not None:
+            match = self.combined.search(text)
+            if match:
+                return match
+        for pattern in self.separate:
+            match = pattern.search(text)
+            if match:
+                return match
+        return None
+
+
+def _combine(patterns: List[str], flags: int = 0) -> Optional[CombinedPattern]:
+    """
+    逐条编译校验后合并，无效的条目记录警告并跳过，不影响其它条目
+    """
+    joinable, separate = [], []
+    for pattern in patterns:
+        try:
+            compiled = re.compile(pattern, flags)
+        except re.error as e:
+            logger.warning(f"忽略无效的黑名单正则表达式 {pattern}: {str(e)}")
+            continue
+        if compiled.groups:
+            separate.append(compiled)
+            continue
+        scoped = pattern
+        match = _GLOBAL_FLAGS_RE.match(pattern)
+        if match:
+            # 详细模式下条目末尾的注释会吞掉右括号，在括号前换行
+            suffix = "\n" if "x" in match.group(1) else ""
+            scoped = f"(?{match.group(1)}:{pattern[match.end():]}{suffix})"
+        try:
+            re.compile(scoped, flags)
+        except re.error:
+            separate.append(compiled)
+            continue
+        joinable.append(scoped)
+    
+    if not joinable and not separate:
+        return None
+    combined = re.compile("|".join(f"(?:{pattern})" for pattern in joinable), flags) if joinable else None
+    return CombinedPattern(combined, separate)
+
+
+class BlacklistMatcher:
+    """
+    同步时使用的黑名单匹配器，所有条目在创建时合并编译为少数几个正则表达式，
+    每个路径只需执行一次匹配，而不是逐条调用re.search
+
+    - 目录条目：正则表达式在完整路径中搜索（与原有行为一致）；通配符匹配路径中任意深度的一段或多段目录
+    - 文件条目：正则表达式在文件名中搜索；不含/的通配符匹配整个文件名，含/的通配符匹配路径结尾
+    - 关键词：按字面值在文件内容中查找，忽略大小写
+    通配符不支持gitignore的根目录锚定，开头的/会被忽略
+    """
+
+    def __init__(self, dir_patterns: Iterable[str] = (), file_patterns: Iterable[str] = (), keywords: Iterable[str] = ()):
+        path_patterns, name_patterns = [], []
+        for pattern in dir_patterns:
+            if pattern.startswith(GLOB_PREFIX):
+                glob = pattern[len(GLOB_PREFIX):].strip("/")
+                path_patterns.append(f"(?:^|/){glob_to_regex(glob)}(?:/|$)")
+            else:
+                path_patterns.append(pattern)
+        for pattern in file_patterns:
+            if pattern.startswith(GLOB_PREFIX):
+                glob = pattern[len(GLOB_PREFIX):].lstrip("/")
+                if "/" in glob:
+                    path_patterns.append(f"(?:^|/){glob_to_regex(glob)}$")
+                else:
+                    name_patterns.append(f"^{glob_to_regex(glob)}$")
+            else:
+                name_patterns.append(pattern)
+        self.path_regex = _combine(path_patterns)
+        self.name_regex = _combine(name_patterns)
+        self.keyword_regex = _combine([re.escape(keyword) for keyword in keywords], re.IGNORECASE)
+
+    def match_path(self, path: str) -> Optional[str]:
+        """
+        检查目录或文件路径，命中黑名单时返回匹配到的文本，否则返回None
+        """
+        if os.sep != "/":
+            path = path.replace(os.sep, "/")
+        if self.path_regex is not None:
+            match = self.path_regex.search(path)
+            if match:
+                return match.group(0) or path
+        if self.name_regex is not None:
+            match = self.name_regex.search(path.rstrip("/").rsplit("/", 1)[-1])
+            if match:
+                return match.group(0) or path
+        return None
+
+    def match_content(self, content: str) -> Optional[str]:
+        """
+        检查文件内容是否包含黑名单关键词，返回命中的关键词
+        """
+        if self.keyword_regex is None or not content:
+            return None
+        match = self.keyword_regex.search(content)
+        return match.group(0) if match else None
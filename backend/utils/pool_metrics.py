@@ -0,0 +1,178 @@
+# 数据库连接池监控
+import os
+import threading
+import time
+from typing import Dict, List
+
+from sqlalchemy import event, exc
+
+# 获取连接等待时间的直方图分桶（秒）
+WAIT_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+class PoolMetrics:
+    """
+    单个引擎连接池的统计信息
+    计数由连接池事件（connect/checkout/checkin/invalidate）累加，
+    获取连接的等待时间和超时次数由InstrumentedPool记录，占用数和溢出数在导出时从连接池读取
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * len(WAIT_TIME_BUCKETS)
+        self._lock = threading.Lock()
+
+    def attach(self, engine) -> None:
+        """
+        监听引擎连接池的事件；连接池重建（dispose）后事件监听会自动保留
+        """
+        self.pool = engine.pool
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        event.listen(engine, "engine_disposed", self._on_disposed)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def _on_disposed(self, engine):
+        self.pool = engine.pool
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            for i, bound in enumerate(WAIT_TIME_BUCKETS):
+                if seconds <= bound:
+                    self.wait_buckets[i] += 1
+                    break
+
+    def record_timeout(self, seconds: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+        self.record_wait(seconds)
+
+    def snapshot(self) -> Dict:
+        """
+        返回当前统计信息的副本
+        """
+        with self._lock:
+            data = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_count": self.wait_count,
+                "wait_sum": self.wait_sum,
+                "wait_max": self.wait_max,
+                "wait_buckets": list(self.wait_buckets),
+            }
+        # QueuePool才有容量和溢出信息，SQLite测试使用的连接池没有
+        pool = self.pool
+        if pool is not None and hasattr(pool, "overflow"):
+            data["size"] = pool.size()
+            data["checked_out"] = pool.checkedout()
+            data["checked_in"] = pool.checkedin()
+            data["overflow"] = max(pool.overflow(), 0)
+        return data
+
+
+def instrumented_pool_class(base, metrics: PoolMetrics):
+    """
+    基于QueuePool/AsyncAdaptedQueuePool创建记录获取连接等待时间和超时的连接池类
+    SQLAlchemy没有“开始获取连接”的事件，因此通过包装_do_get计时
+    """
+
+    class InstrumentedPool(base):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                metrics.record_timeout(time.perf_counter() - start)
+                raise
+            metrics.record_wait(time.perf_counter() - start)
+            return connection
+
+    InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+# 进程内所有被监控的连接池，键为引擎名称
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+def register_pool_metrics(name: str) -> PoolMetrics:
+    metrics = PoolMetrics(name)
+    pool_metrics[name] = metrics
+    return metrics
+
+
+def render_prometheus() -> str:
+    """
+    以Prometheus文本格式导出连接池统计信息
+    每个uvicorn worker拥有独立的连接池，通过pid标签区分
+    """
+    pid = str(os.getpid())
+    snapshots = {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
+    lines: List[str] = []
+
+    def labels(name: str, **extra) -> str:
+        pairs = [("engine", name), ("pid", pid)] + list(extra.items())
+        return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+    def metric(metric_name: str, metric_type: str, help_text: str, key: str):
+        lines.append(f"# HELP {metric_name} {help_text}")
+        lines.append(f"# TYPE {metric_name} {metric_type}")
+        for name, data in snapshots.items():
+            if key in data:
+                lines.append(f"{metric_name}{labels(name)} {data[key]}")
+
+    metric("db_pool_connections_opened_total", "counter", "新建的数据库连接数", "connects")
+    metric("db_pool_checkouts_total", "counter", "从连接池取出连接的次数", "checkouts")
+    metric("db_pool_checkins_total", "counter", "归还连接池的次数", "checkins")
+    metric("db_pool_invalidations_total", "counter", "失效的连接数", "invalidations")
+    metric("db_pool_timeouts_total", "counter", "等待连接超时的次数", "timeouts")
+    metric("db_pool_size", "gauge", "连接池常驻连接数上限", "size")
+    metric("db_pool_checked_out", "gauge", "当前被占用的连接数", "checked_out")
+    metric("db_pool_checked_in", "gauge", "当前空闲的连接数", "checked_in")
+    metric("db_pool_overflow", "gauge", "当前超出常驻数量的溢出连接数", "overflow")
+    metric("db_pool_wait_seconds_max", "gauge", "获取连接的最长等待时间", "wait_max")
+
+    lines.append("# HELP db_pool_wait_seconds 获取连接的等待时间（含新建连接的耗时）")
+    lines.append("# TYPE db_pool_wait_seconds histogram")
+    for name, data in snapshots.items():
+        cumulative = 0
+        for bound, count in zip(WAIT_TIME_BUCKETS, data["wait_buckets"]):
+            cumulative += count
+            lines.append(f"db_pool_wait_seconds_bucket{labels(name, le=bound)} {cumulative}")
+        lines.append(f'db_pool_wait_seconds_bucket{labels(name, le="+Inf")} {data["wait_count"]}')
+        lines.append(f"db_pool_wait_seconds_sum{labels(name)} {data['wait_sum']}")
+        lines.append(f"db_pool_wait_seconds_count{labels(name)} {data['wait_count']}")
+
+    return "\n".join(lines) + "\n"